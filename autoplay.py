@@ -0,0 +1,87 @@
+"""
+autoplay.py
+
+Stop conditions for a series of automatic spins.
+
+An AutoPlay watches one SlotEngine from the moment the series starts. It stops after `spins`
+spins, before a spin that would take the net loss past loss_limit credits, after a single win
+of at least win_trigger credits, or when the credits no longer cover the bet. Conditions left
+as None never stop it. The caller asks should_spin() before each spin and reports every
+finished spin with record(win); why the series ended is kept in stop_reason.
+
+While a series runs the game commits the session journal every COMMIT_INTERVAL_SECONDS rather
+than every few milliseconds, so a crash can lose the last fraction of a second of spins.
+"""
+
+import configparser
+
+# Load auto-play settings from RPC.conf (all optional, 0 turns a condition off)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+SPINS = config.getint('autoplay', 'spins', fallback=100) or None
+LOSS_LIMIT = config.getint('autoplay', 'loss_limit', fallback=0) or None
+WIN_TRIGGER = config.getint('autoplay', 'win_trigger', fallback=0) or None
+COMMIT_INTERVAL_SECONDS = config.getfloat('autoplay', 'commit_interval_ms', fallback=500) / 1000
+
+class AutoPlay:
+    def __init__(self, engine, spins=SPINS, loss_limit=LOSS_LIMIT, win_trigger=WIN_TRIGGER):
+        self.engine = engine
+        self.spins = spins
+        self.loss_limit = loss_limit
+        self.win_trigger = win_trigger
+        self.start_credits = engine.credits
+        self.spins_played = 0
+        self.total_won = 0
+        self.stop_reason = None
+
+    @property
+    def active(self):
+        return self.stop_reason is None
+
+    def net_loss(self):
+        return self.start_credits - self.engine.credits
+
+    def stop(self, reason="stopped by player"):
+        if self.stop_reason is None:
+            self.stop_reason = reason
+            print(f"Auto-play stopped after {self.spins_played} spins: {reason}")
+
+    def should_spin(self):
+        """True if the next spin may start; otherwise stops with the reason."""
+        if not self.active:
+            return False
+        bet = self.engine.bet_amount
+        if self.spins is not None and self.spins_played >= self.spins:
+            self.stop(f"{self.spins} spins played")
+        elif self.engine.credits < bet:
+            self.stop("credits below bet")
+        elif self.loss_limit is not None and self.net_loss() + bet > self.loss_limit:
+            self.stop(f"loss limit of {self.loss_limit} reached")
+        return self.active
+
+    def record(self, win):
+        self.spins_played += 1
+        self.total_won += win
+        if self.win_trigger is not None and win >= self.win_trigger:
+            self.stop(f"won {win}")
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import random
+
+    import slot_engine
+
+    def random_spin():
+        return {'icons': [f"reel_icon_{random.randint(1, 9)}.png" for _ in range(5)]}
+
+    engine = slot_engine.SlotEngine(spin_source=random_spin, send_buy_in=lambda address, amount: 'txid', verbose=False)
+    engine.buy_in('D-player', 300)
+    autoplay = AutoPlay(engine, spins=500, loss_limit=100, win_trigger=200)
+    # calculate_win prints every spin
+    with contextlib.redirect_stdout(io.StringIO()):
+        while autoplay.should_spin():
+            autoplay.record(engine.spin())
+    print(f"Auto-play stopped after {autoplay.spins_played} spins: {autoplay.stop_reason}")
+    print(f"Credits {engine.credits}, net loss {autoplay.net_loss()}, won {autoplay.total_won}")
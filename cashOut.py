@@ -7,13 +7,16 @@ This script signs and sends a Dogecoin transaction from a specified address usin
 without importing the address into the Dogecoin Core wallet.
 """
 
-from decimal import Decimal
-from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
-from ecdsa import SigningKey, SECP256k1, util
-import hashlib
-import struct
-import base58
+from bitcoinrpc.authproxy import JSONRPCException
 import configparser
+import threading
+import dev_fee_ledger
+import fee_calculator
+import rpc_router
+import tx_tracker
+from secp256k1_signer import get_signer
+from tx_codec import TxIn, TxOut, Transaction, public_key_to_address
+from tx_signing import sign_transaction
 
 # Load RPC configuration from RPC.conf
 config = configparser.ConfigParser()
@@ -23,6 +26,7 @@ rpc_user = config['rpcconfig']['rpcuser']
 rpc_password = config['rpcconfig']['rpcpassword']
 rpc_host = config['rpcconfig']['rpchost']
 rpc_port = int(config['rpcconfig']['rpcport'])
+rpc_url = f"http://{rpc_user}:{rpc_password}@{rpc_host}:{rpc_port}"
 
 # Wallet information
 from_address = "<pool_address>"
@@ -37,37 +41,30 @@ dev_fee_1_percent = 0.01  # 1%
 dev_fee_2_percent = 0.00  # 0.5%
 dev_fee_3_percent = 0.00  # 0.3%
 
+# Node error for a transaction it has never seen
+RPC_INVALID_ADDRESS_OR_KEY = -5
+
 # At the top of the file, with other global variables
 global win_differential
 win_differential = 0
 
-def varint(n):
-    if n < 0xfd:
-        return struct.pack('<B', n)
-    elif n <= 0xffff:
-        return b'\xfd' + struct.pack('<H', n)
-    elif n <= 0xffffffff:
-        return b'\xfe' + struct.pack('<I', n)
-    else:
-        return b'\xff' + struct.pack('<Q', n)
+# Outpoints spent by transactions built in this process that listunspent may still report.
+# Held under utxo_lock from coin selection until they drop out of listunspent.
+reserved_outpoints = set()
+utxo_lock = threading.RLock()
 
 def get_utxos(address):
     """
     Retrieve UTXOs for the given address using Dogecoin Core RPC.
     """
-    rpc_connection = AuthServiceProxy(f"http://{rpc_user}:{rpc_password}@{rpc_host}:{rpc_port}")
+    rpc_connection = rpc_router.get_router(rpc_url)
     utxos = []
 
     try:
         # Get the list of unspent transaction outputs for the address
         utxos_list = rpc_connection.listunspent(1, 9999999, [address])
         for utxo in utxos_list:
-            utxo_info = {
-                'transaction_hash': utxo['txid'],
-                'index': utxo['vout'],
-                'value': int(Decimal(str(utxo['amount'])) * Decimal('1e8')),  # Convert DOGE to satoshis
-                'scriptPubKey': utxo['scriptPubKey'],
-            }
+            utxo_info = TxIn.from_utxo(utxo)
             utxos.append(utxo_info)
             print(f"UTXO: {utxo_info}")  # Print UTXO details
     except JSONRPCException as e:
@@ -75,237 +72,178 @@ def get_utxos(address):
 
     return utxos
 
-def create_script_pubkey(address):
-    # Decode the address (assuming it's a base58check encoded address)
-    address_bytes = base58.b58decode_check(address)
-    # The first byte is the version, the rest is the pubkey hash
-    pubkey_hash = address_bytes[1:]
-    # Build the scriptPubKey
-    script_pubkey = (
-        b'\x76' +  # OP_DUP
-        b'\xa9' +  # OP_HASH160
-        bytes([len(pubkey_hash)]) +
-        pubkey_hash +
-        b'\x88' +  # OP_EQUALVERIFY
-        b'\xac'    # OP_CHECKSIG
-    )
-    return script_pubkey.hex()
-
-def create_raw_transaction(utxos, to_address, amount_satoshis, fee_satoshis, win_differential_satoshis):
-    inputs = []
-    outputs = []
-    total_input = 0
+def get_spendable_utxos(address):
+    """
+    get_utxos without the outpoints reserved by transactions already built in this process.
+    Reservations whose outputs no longer show up in listunspent have been spent and are dropped.
+    """
+    utxos = get_utxos(address)
+    with utxo_lock:
+        if utxos:
+            reserved_outpoints.intersection_update(utxo.outpoint for utxo in utxos)
+        return [utxo for utxo in utxos if utxo.outpoint not in reserved_outpoints]
+
+def reserve_utxos(utxos):
+    with utxo_lock:
+        reserved_outpoints.update(utxo.outpoint for utxo in utxos)
+
+def release_utxos(utxos):
+    with utxo_lock:
+        reserved_outpoints.difference_update(utxo.outpoint for utxo in utxos)
 
+def calculate_dev_fees(win_differential_satoshis):
     # Calculate dev fees based on win_differential
     dev_fees = [
         (dev_fee_1_address, int(win_differential_satoshis * dev_fee_1_percent)),
         (dev_fee_2_address, int(win_differential_satoshis * dev_fee_2_percent)),
         (dev_fee_3_address, int(win_differential_satoshis * dev_fee_3_percent))
     ]
-    
+
     # Filter out dev fees that are 0
-    dev_fees = [(address, amount) for address, amount in dev_fees if amount > 0]
-    
-    # Total amount needed (send amount + dev fees + transaction fee)
-    total_needed = amount_satoshis + sum(amount for _, amount in dev_fees) + fee_satoshis
+    return [(address, amount) for address, amount in dev_fees if amount > 0]
+
+def accrue_dev_fees(win_differential_satoshis, payout_txid=None):
+    """Record the dev fees of a cash-out in the ledger and sweep them if one is due."""
+    ledger = dev_fee_ledger.default_ledger()
+    ledger.accrue(calculate_dev_fees(win_differential_satoshis), payout_txid)
+    ledger.maybe_sweep(send_payouts)
+
+def create_payout_transaction(utxos, payouts, feerate_per_kb):
+    """
+    Build one transaction paying every (address, amount_satoshis) in payouts,
+    with a single change output back to the pool.
+    """
+    # Total amount sent, the transaction fee follows from the size
+    total_sent = sum(amount for _, amount in payouts)
 
-    print(f"Total needed: {total_needed} satoshis")
+    print(f"Total sent: {total_sent} satoshis in {len(payouts)} outputs")
     print(f"Available UTXOs: {utxos}")
     
-    # Select UTXOs to cover the total amount needed
-    for utxo in utxos:
-        inputs.append({
-            'txid': utxo['transaction_hash'],
-            'vout': utxo['index'],
-            'scriptPubKey': utxo['scriptPubKey'],  # Needed for signing
-            'amount': utxo['value'],  # in satoshis
-        })
-        total_input += utxo['value']
-        print(f"Running total: {total_input} satoshis")
-        if total_input >= total_needed:
-            break
-
-    if total_input < total_needed:
-        print(f"Insufficient funds. Total input: {total_input}, Total needed: {total_needed}")
+    # Select UTXOs to cover the total sent plus the fee for the resulting transaction size
+    selection = fee_calculator.select_coins(utxos, total_sent, len(payouts), feerate_per_kb)
+    if selection is None:
+        total_input = sum(utxo.amount for utxo in utxos)
+        print(f"Insufficient funds. Total input: {total_input}, Total sent: {total_sent}")
         raise Exception("Insufficient funds")
 
+    selected_utxos, fee_satoshis, change_satoshis = selection
+    print(f"Selected {len(selected_utxos)} UTXOs, fee: {fee_satoshis} satoshis")
+
     # Outputs
-    # Recipient output (full amount)
-    outputs.append({
-        'address': to_address,
-        'amount': amount_satoshis,
-    })
-
-    # Dev fee outputs (only for non-zero fees)
-    for address, amount in dev_fees:
-        outputs.append({
-            'address': address,
-            'amount': amount,
-        })
+    outputs = [TxOut.to_address(address, amount) for address, amount in payouts]
 
     # Change output (if any)
-    change_satoshis = total_input - total_needed
     if change_satoshis > 0:
-        outputs.append({
-            'address': from_address,
-            'amount': change_satoshis,
-        })
+        outputs.append(TxOut.to_address(from_address, change_satoshis))
 
     # Build the transaction object
-    tx = {
-        'version': 1,
-        'locktime': 0,
-        'inputs': inputs,
-        'outputs': outputs,
-    }
-
-    return tx
-
-def serialize_transaction(tx, for_signing=False, input_index=None, script_code=None):
-    # Start with the version
-    result = struct.pack("<I", tx['version'])  # version
-
-    # Serialize inputs
-    result += varint(len(tx['inputs']))  # Number of inputs
-
-    for i, txin in enumerate(tx['inputs']):
-        result += bytes.fromhex(txin['txid'])[::-1]  # txid (little-endian)
-        result += struct.pack("<I", txin['vout'])  # vout
-
-        if for_signing:
-            if i == input_index:
-                # Use script_code for the input being signed
-                script_sig = bytes.fromhex(script_code)
-                result += varint(len(script_sig)) + script_sig
-            else:
-                # Empty scriptSig
-                result += varint(0)
-        else:
-            # Include scriptSig
-            script_sig = bytes.fromhex(txin.get('scriptSig', ''))
-            result += varint(len(script_sig)) + script_sig
-
-        result += struct.pack("<I", 0xffffffff)  # sequence
-
-    # Serialize outputs
-    result += varint(len(tx['outputs']))  # Number of outputs
-    for txout in tx['outputs']:
-        result += struct.pack("<Q", txout['amount'])  # amount in satoshis
-        script_pubkey = bytes.fromhex(create_script_pubkey(txout['address']))
-        result += varint(len(script_pubkey)) + script_pubkey
-
-    # Locktime
-    result += struct.pack("<I", tx['locktime'])  # locktime
-
-    return result
-
-def sign_transaction(tx, privkey_hex):
-    # Get the private key in bytes
-    privkey_bytes = bytes.fromhex(privkey_hex)
-    privkey = SigningKey.from_string(privkey_bytes, curve=SECP256k1)
-    vk = privkey.get_verifying_key()
-    public_key_bytes = vk.to_string("compressed")  # Compressed public key
-
-    # Sign each input
-    for index, txin in enumerate(tx['inputs']):
-        # Get the scriptPubKey of the UTXO being spent
-        script_pubkey = txin['scriptPubKey']
-        # For P2PKH, the script code is the scriptPubKey
-        script_code = script_pubkey
-        # Create the serialization of the transaction for signing
-        tx_serialized = serialize_transaction(tx, for_signing=True, input_index=index, script_code=script_code)
-        # Append SIGHASH_ALL
-        tx_serialized += struct.pack("<I", 1)  # SIGHASH_ALL
-
-        # Compute the double SHA256 hash
-        message_hash = hashlib.sha256(hashlib.sha256(tx_serialized).digest()).digest()
-
-        # Sign the hash
-        signature = privkey.sign_digest(message_hash, sigencode=util.sigencode_der_canonize)
-        signature += b'\x01'  # Append SIGHASH_ALL
-
-        # Build the scriptSig
-        script_sig = (
-            varint(len(signature)) + signature +
-            varint(len(public_key_bytes)) + public_key_bytes
-        )
-
-        # Update the transaction input's scriptSig
-        txin['scriptSig'] = script_sig.hex()
-
-    return tx
-
-def broadcast_transaction(raw_tx_hex):
+    return Transaction(selected_utxos, outputs, fee=fee_satoshis)
+
+def broadcast_transaction(raw_tx_hex, label='cash-out'):
     """
     Broadcast the transaction to the network via Dogecoin Core RPC.
+    The txid is handed to the transaction tracker under the given label.
     """
-    rpc_connection = AuthServiceProxy(f"http://{rpc_user}:{rpc_password}@{rpc_host}:{rpc_port}")
+    rpc_connection = rpc_router.get_router(rpc_url)
 
     try:
         txid = rpc_connection.sendrawtransaction(raw_tx_hex)
         print(f"Transaction broadcasted successfully. TXID: {txid}")
+        tx_tracker.record_broadcast(txid, label)
         return txid
     except JSONRPCException as e:
         print(f"An error occurred: {e.error['message']}")
         return None
 
-def send_doge(to_address, amount_doge, win_differential):
-    amount_satoshis = int(amount_doge * 1e8)
-    win_differential_satoshis = int(win_differential * 1e8)
-    fee_doge = 0.0225  # Define the transaction fee in DOGE (adjust as needed)
-    fee_satoshis = int(fee_doge * 1e8)  # Convert fee to satoshis
+def transaction_known(rpc_connection, txid):
+    """
+    True if the node has the transaction in its mempool, chain or wallet, False only if both
+    lookups answer that it does not. Any other error is raised: it says nothing about the tx.
+    """
+    for lookup in (rpc_connection.getrawtransaction, rpc_connection.gettransaction):
+        try:
+            lookup(txid)
+            return True
+        except JSONRPCException as e:
+            if e.code != RPC_INVALID_ADDRESS_OR_KEY:
+                raise
+    return False
+
+def check_broadcast(txid):
+    """transaction_known against the configured nodes."""
+    return transaction_known(rpc_router.get_router(rpc_url), txid)
+
+def send_payouts(payouts, on_signed=None):
+    """
+    Build, sign and broadcast one transaction for a list of (address, amount_satoshis) payouts.
+    on_signed(tx), if given, is called with the signed transaction before it is broadcast.
+    Returns the txid, or None if the broadcast failed.
+    """
+    rpc_connection = rpc_router.get_router(rpc_url)
+    feerate_per_kb = fee_calculator.get_feerate(rpc_connection)
+
+    with utxo_lock:
+        utxos = get_spendable_utxos(from_address)
+
+        # Create the raw transaction and keep its inputs away from other transactions
+        tx = create_payout_transaction(utxos, payouts, feerate_per_kb)
+        reserve_utxos(tx.inputs)
 
-    utxos = get_utxos(from_address)
+    try:
+        # Sign the transaction
+        tx_signed = sign_transaction(tx, privkey_hex)
+
+        if on_signed:
+            on_signed(tx_signed)
+
+        # Serialize the signed transaction
+        raw_tx_hex = tx_signed.hex()
+
+        # Print the raw transaction hex
+        print(f"Raw transaction hex: {raw_tx_hex}")
 
-    # Create the raw transaction
-    tx = create_raw_transaction(utxos, to_address, amount_satoshis, fee_satoshis, win_differential_satoshis)
+        # Broadcast the transaction
+        txid = broadcast_transaction(raw_tx_hex)
+    except Exception:
+        release_utxos(tx.inputs)
+        raise
 
-    # Sign the transaction
-    tx_signed = sign_transaction(tx, privkey_hex)
+    if not txid:
+        release_utxos(tx.inputs)
+    return txid
 
-    # Serialize the signed transaction
-    raw_tx = serialize_transaction(tx_signed)
-    raw_tx_hex = raw_tx.hex()
+def send_doge(to_address, amount_doge, win_differential, on_signed=None):
+    amount_satoshis = int(amount_doge * 1e8)
+    win_differential_satoshis = int(win_differential * 1e8)
 
-    # Print the raw transaction hex
-    print(f"Raw transaction hex: {raw_tx_hex}")
+    # Recipient output (full amount), dev fees are accrued and swept separately
+    payouts = [(to_address, amount_satoshis)]
 
     # Print win differential
     print(f"Win Differential: {win_differential} DOGE")
 
-    # Broadcast the transaction
-    txid = broadcast_transaction(raw_tx_hex)
+    # Build, sign and broadcast the transaction
+    txid = send_payouts(payouts, on_signed)
     
     if txid:
         print(f"Transaction successful. TXID: {txid}")
         print(f"Amount sent: {amount_doge} DOGE")
         print(f"Win Differential: {win_differential} DOGE")
+        # The payout is broadcast; a ledger problem must not turn it into a failed cash-out
+        try:
+            accrue_dev_fees(win_differential_satoshis, txid)
+        except Exception as e:
+            print(f"Dev fee accrual failed for payout {txid}: {e}")
     else:
         print("Transaction failed.")
 
     return txid
 
-def public_key_to_address(public_key_bytes):
-    # Perform SHA256 hashing on the public key
-    sha256 = hashlib.sha256(public_key_bytes).digest()
-    # Perform RIPEMD-160 hashing on the result
-    ripemd160 = hashlib.new('ripemd160', sha256).digest()
-    # Add version byte (0x1E for Dogecoin mainnet)
-    versioned_payload = b'\x1E' + ripemd160
-    # Perform double SHA256 hashing on the versioned payload
-    checksum = hashlib.sha256(hashlib.sha256(versioned_payload).digest()).digest()[:4]
-    # Concatenate versioned payload and checksum
-    address_bytes = versioned_payload + checksum
-    # Convert to Base58Check format
-    return base58.b58encode(address_bytes).decode('utf-8')
-
 # Verify the derived address matches the expected address
 if __name__ == "__main__":
     # Use the public key from the private key
     privkey_bytes = bytes.fromhex(privkey_hex)
-    privkey = SigningKey.from_string(privkey_bytes, curve=SECP256k1)
-    vk = privkey.get_verifying_key()
-    public_key_bytes = vk.to_string("compressed")  # Compressed public key
+    public_key_bytes = get_signer(privkey_bytes).public_key()  # Compressed public key
 
     # Generate the address from the public key
     derived_address = public_key_to_address(public_key_bytes)
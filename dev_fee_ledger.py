@@ -0,0 +1,162 @@
+"""
+dev_fee_ledger.py
+
+Local ledger of dev fees owed by the pool.
+
+Instead of adding dev fee outputs to every cash-out, fees are accrued here and paid out
+in one sweep transaction once the owed total reaches a threshold or the sweep interval has
+passed. The ledger is an append-only file of JSON lines in satoshis, so the amount owed to
+each address is always the exact sum of its accruals minus its sweeps.
+"""
+
+import configparser
+import json
+import os
+import threading
+import time
+
+# Load ledger settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+LEDGER_PATH = config.get('devfees', 'ledger_path', fallback='dev_fee_ledger.jsonl')
+SWEEP_THRESHOLD = int(config.getfloat('devfees', 'sweep_threshold', fallback=100) * 1e8)  # satoshis
+SWEEP_INTERVAL_SECONDS = config.getfloat('devfees', 'sweep_interval_hours', fallback=24) * 3600
+
+# Balances below this are carried over to the next sweep (Dogecoin soft dust limit)
+MIN_SWEEP_OUTPUT = 1000000  # 0.01 DOGE
+
+class DevFeeLedger:
+    def __init__(self, path=LEDGER_PATH, sweep_threshold=SWEEP_THRESHOLD, sweep_interval=SWEEP_INTERVAL_SECONDS):
+        self.path = path
+        self.sweep_threshold = sweep_threshold
+        self.sweep_interval = sweep_interval
+        self.accrued = {}
+        self.swept = {}
+        self.last_sweep = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    self._apply(json.loads(line))
+
+    def _apply(self, entry):
+        if entry['type'] == 'accrue':
+            for address, amount in entry['fees'].items():
+                self.accrued[address] = self.accrued.get(address, 0) + amount
+            if self.last_sweep is None:
+                # Start the sweep interval at the first accrual, also when it is replayed after a restart
+                self.last_sweep = entry['time']
+        elif entry['type'] == 'sweep':
+            for address, amount in entry['payouts'].items():
+                self.swept[address] = self.swept.get(address, 0) + amount
+            self.last_sweep = entry['time']
+        elif entry['type'] == 'void':
+            # The sweep was never broadcast, its amounts are owed again
+            for address, amount in entry['payouts'].items():
+                self.swept[address] -= amount
+
+    def _append(self, entry):
+        entry['time'] = time.time()
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(entry, sort_keys=True) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self._apply(entry)
+
+    def accrue(self, dev_fees, payout_txid=None):
+        """Record the (address, amount_satoshis) dev fees of a cash-out."""
+        fees = {}
+        for address, amount in dev_fees:
+            if amount > 0:
+                fees[address] = fees.get(address, 0) + amount
+        if not fees:
+            return
+        with self._lock:
+            self._append({'type': 'accrue', 'fees': fees, 'txid': payout_txid})
+
+    def balances(self):
+        """Satoshis owed to each address."""
+        with self._lock:
+            return {address: amount - self.swept.get(address, 0) for address, amount in self.accrued.items()}
+
+    def total_owed(self):
+        return sum(self.balances().values())
+
+    def reconcile(self):
+        """Return (accrued, swept, owed) totals, checking that no address was overpaid."""
+        with self._lock:
+            for address, amount in self.swept.items():
+                if amount > self.accrued.get(address, 0):
+                    raise ValueError(f"Dev fee ledger overpaid {address}: swept {amount}, accrued {self.accrued.get(address, 0)}")
+            accrued = sum(self.accrued.values())
+            swept = sum(self.swept.values())
+            return accrued, swept, accrued - swept
+
+    def sweep_due(self):
+        total = self.total_owed()
+        if total >= self.sweep_threshold:
+            return True
+        return total >= MIN_SWEEP_OUTPUT and self.last_sweep is not None and time.time() - self.last_sweep >= self.sweep_interval
+
+    def sweep(self, send_payouts):
+        """
+        Pay every balance of at least MIN_SWEEP_OUTPUT in one transaction.
+
+        send_payouts(payouts, on_signed) must call on_signed(tx) before broadcasting. The sweep
+        is recorded under the signed txid at that point, so a crash during the broadcast
+        cannot lead to paying the same fees twice. Returns the txid, or None.
+        """
+        with self._lock:
+            payouts = {address: amount for address, amount in self.balances().items() if amount >= MIN_SWEEP_OUTPUT}
+            if not payouts:
+                return None
+
+            signed_txids = []
+
+            def record_sweep(tx):
+                signed_txids.append(tx.txid())
+                self._append({'type': 'sweep', 'payouts': payouts, 'txid': signed_txids[-1]})
+
+            try:
+                txid = send_payouts(list(payouts.items()), on_signed=record_sweep)
+            except Exception as e:
+                if signed_txids:
+                    # The broadcast may or may not have reached the node, keep the sweep on record
+                    print(f"Dev fee sweep {signed_txids[-1]} may not have been broadcast, check the node: {e}")
+                else:
+                    print(f"Dev fee sweep failed: {e}")
+                return None
+
+            if txid:
+                print(f"Dev fees swept. TXID: {txid}")
+            elif signed_txids:
+                # The node rejected the transaction, the fees are owed again
+                self._append({'type': 'void', 'payouts': payouts, 'txid': signed_txids[-1]})
+            return txid
+
+    def maybe_sweep(self, send_payouts):
+        if self.sweep_due():
+            return self.sweep(send_payouts)
+        return None
+
+_default_ledger = None
+
+def default_ledger():
+    global _default_ledger
+    if _default_ledger is None:
+        _default_ledger = DevFeeLedger()
+    return _default_ledger
+
+# Print the ledger state
+if __name__ == "__main__":
+    ledger = default_ledger()
+    accrued, swept, owed = ledger.reconcile()
+    print(f"Accrued: {accrued / 1e8} DOGE, swept: {swept / 1e8} DOGE, owed: {owed / 1e8} DOGE")
+    for address, amount in ledger.balances().items():
+        print(f"{address}: {amount / 1e8} DOGE")
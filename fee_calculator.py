@@ -0,0 +1,117 @@
+"""
+fee_calculator.py
+
+Size-based fee calculation for the P2PKH transactions built by buyIn.py and cashOut.py.
+
+The serialized size of a P2PKH transaction only depends on its input and output counts,
+so coin selection can settle on a fee without serializing or signing anything.
+"""
+
+from decimal import Decimal
+import configparser
+import math
+
+# Load fee settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+# Fee rate in DOGE per 1000 bytes
+feerate_per_kb_doge = config.get('feeconfig', 'feerate_per_kb', fallback='0.01')
+# Ask the node for a fee rate via estimatesmartfee (falls back to feerate_per_kb)
+use_estimatesmartfee = config.getboolean('feeconfig', 'use_estimatesmartfee', fallback=False)
+estimatesmartfee_blocks = config.getint('feeconfig', 'estimatesmartfee_blocks', fallback=6)
+# Lowest fee ever paid, in DOGE
+min_fee_doge = config.get('feeconfig', 'min_fee', fallback='0.001')
+
+FEERATE_PER_KB = int(Decimal(feerate_per_kb_doge) * Decimal('1e8'))  # satoshis per kB
+MIN_FEE = int(Decimal(min_fee_doge) * Decimal('1e8'))  # satoshis
+
+# Change below this is not worth an output and is left to the miners (Dogecoin soft dust limit)
+DUST_THRESHOLD = 1000000  # 0.01 DOGE
+
+# Serialized sizes of the P2PKH building blocks
+TX_OVERHEAD_SIZE = 4 + 4  # version + locktime
+P2PKH_INPUT_SIZE = 32 + 4 + 1 + 107 + 4  # outpoint + scriptSig length + max scriptSig + sequence
+P2PKH_OUTPUT_SIZE = 8 + 1 + 25  # amount + scriptPubKey length + scriptPubKey
+
+# estimatesmartfee result cached per block height
+_feerate_cache = {'height': None, 'feerate': None}
+
+def varint_size(n):
+    if n < 0xfd:
+        return 1
+    elif n <= 0xffff:
+        return 3
+    elif n <= 0xffffffff:
+        return 5
+    else:
+        return 9
+
+def estimate_tx_size(num_inputs, num_outputs):
+    """
+    Serialized size in bytes of a signed P2PKH transaction.
+    Assumes maximum-length low-S signatures, so the result is never below the real size.
+    """
+    return (
+        TX_OVERHEAD_SIZE +
+        varint_size(num_inputs) + num_inputs * P2PKH_INPUT_SIZE +
+        varint_size(num_outputs) + num_outputs * P2PKH_OUTPUT_SIZE
+    )
+
+def fee_for_size(size_bytes, feerate_per_kb=FEERATE_PER_KB):
+    return max(MIN_FEE, math.ceil(size_bytes * feerate_per_kb / 1000))
+
+def calculate_fee(num_inputs, num_outputs, feerate_per_kb=FEERATE_PER_KB):
+    return fee_for_size(estimate_tx_size(num_inputs, num_outputs), feerate_per_kb)
+
+def get_feerate(rpc_connection=None):
+    """
+    Return the fee rate to use in satoshis per kB.
+    With use_estimatesmartfee enabled the node's estimate is looked up once per block
+    and never goes below the configured feerate_per_kb.
+    """
+    if not use_estimatesmartfee or rpc_connection is None:
+        return FEERATE_PER_KB
+
+    try:
+        height = rpc_connection.getblockcount()
+        if _feerate_cache['height'] == height:
+            return _feerate_cache['feerate']
+
+        estimate = rpc_connection.estimatesmartfee(estimatesmartfee_blocks)
+        feerate = FEERATE_PER_KB
+        if estimate.get('feerate', -1) > 0:
+            feerate = max(feerate, int(Decimal(str(estimate['feerate'])) * Decimal('1e8')))
+
+        _feerate_cache['height'] = height
+        _feerate_cache['feerate'] = feerate
+        return feerate
+    except Exception as e:
+        print(f"Fee estimation failed, using configured fee rate: {e}")
+        return FEERATE_PER_KB
+
+def select_coins(utxos, amount_satoshis, num_outputs, feerate_per_kb=FEERATE_PER_KB):
+    """
+    Pick UTXOs (tx_codec.TxIn) in order until they cover amount_satoshis plus the fee for the resulting size.
+
+    num_outputs is the number of outputs besides change. Returns (selected, fee, change)
+    or None if the UTXOs cannot cover the amount.
+    """
+    selected = []
+    total_input = 0
+
+    for utxo in utxos:
+        selected.append(utxo)
+        total_input += utxo.amount
+
+        # Fee with a change output
+        fee = calculate_fee(len(selected), num_outputs + 1, feerate_per_kb)
+        if total_input >= amount_satoshis + fee + DUST_THRESHOLD:
+            return selected, fee, total_input - amount_satoshis - fee
+
+        # Fee without a change output, the dust remainder goes to the miners
+        fee = calculate_fee(len(selected), num_outputs, feerate_per_kb)
+        if total_input >= amount_satoshis + fee:
+            return selected, total_input - amount_satoshis, 0
+
+    return None
@@ -2,7 +2,11 @@ import random
 import sys
 import os
 import time
-from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
+from bitcoinrpc.authproxy import JSONRPCException
+import rpc_router
+
+# Pause before each spin's block lookup
+SPIN_DELAY_SECONDS = 1
 
 
 def load_rpc_credentials(filename):
@@ -49,13 +53,14 @@ def initialize_rpc_connection():
     rpc_url = f"http://{rpc_user}:{rpc_password}@{rpc_host}:{rpc_port}"
     
     try:
-        return AuthServiceProxy(rpc_url)
+        # Reads may be served by other configured nodes; every call has a timeout
+        return rpc_router.get_router(rpc_url)
     except Exception as e:
         raise Exception(f"Failed to establish RPC connection: {str(e)}")
 
-def get_random_tx_data():
-    """Get random hex characters from a block's transaction data."""
-    time.sleep(1)
+def get_random_block_data(delay=None):
+    """Get the height and concatenated transaction ids of a random recent block."""
+    time.sleep(SPIN_DELAY_SECONDS if delay is None else delay)
     try:
         rpc_connection = initialize_rpc_connection()
         
@@ -68,13 +73,17 @@ def get_random_tx_data():
         if block["tx"]:
             tx_data = ''.join(block["tx"])
         
-        return tx_data
+        return random_block_number, tx_data
     except JSONRPCException as e:
         print(f"RPC Error: {e}")
     except Exception as e:
-        print(f"Error in get_random_tx_data: {e}")
+        print(f"Error in get_random_block_data: {e}")
     
-    return "" 
+    return None, ""
+
+def get_random_tx_data():
+    """Get random hex characters from a block's transaction data."""
+    return get_random_block_data()[1]
 
 
 # Add reel map placeholders
@@ -1376,11 +1385,22 @@ def generate_reel_result(reel_number, hex_segment):
     mapping = REEL_MAPS[reel_number]
     return mapping.get(hex_segment, "default_icon.png")
 
-def spin_reels():
-    """Main function to spin reels and generate slot results."""
-    reel_results = []
-    tx_data = get_random_tx_data()
+def icon_index(icon):
+    """Icon number (1-9) of a reel icon file name such as reel_icon_7.png."""
+    return int(icon[len('reel_icon_'):-len('.png')])
 
+def spin_reels_detailed(delay=None):
+    """
+    Spin the reels and return the result with the entropy it came from:
+    {'icons', 'block_height', 'offsets', 'reel_bytes'}, or None on failure.
+    delay overrides SPIN_DELAY_SECONDS, e.g. 0 for spins fetched ahead of time.
+    """
+    block_height, tx_data = get_random_block_data(delay)
+    return spin_from_block(block_height, tx_data)
+
+def spin_from_block(block_height, tx_data):
+    """Spin the reels on the transaction data of the block at block_height, as spin_reels_detailed does."""
+    reel_results = []
     if not tx_data:
         print("Failed to retrieve transaction data")
         return None
@@ -1390,23 +1410,40 @@ def spin_reels():
         print("Insufficient transaction data")
         return None
 
-    # Select 5 non-overlapping segments from the transaction data
+    # Select 5 non-overlapping segments from the transaction data. Redrawing a start index that
+    # overlaps an earlier segment is uniform over the indices still free, like picking from a
+    # list of them, without rebuilding that list for every segment
     hex_segments = []
-    available_indices = list(range(len(tx_data) - 1))
+    offsets = []
+    num_indices = len(tx_data) - 1
+    used_indices = set()
     for _ in range(5):
-        if not available_indices:
+        if len(used_indices) >= num_indices:
             print("Not enough unique segments in transaction data")
             return None
-        start_index = random.choice(available_indices)
+        start_index = random.randrange(num_indices)
+        while start_index in used_indices:
+            start_index = random.randrange(num_indices)
+        offsets.append(start_index)
         hex_segments.append(tx_data[start_index:start_index+2])
-        # Remove used indices
-        available_indices = [i for i in available_indices if abs(i - start_index) > 1]
+        # Mark used indices
+        used_indices.update(i for i in (start_index - 1, start_index, start_index + 1) if 0 <= i < num_indices)
 
     for i in range(1, 6):
         reel_result = generate_reel_result(i, hex_segments[i-1])
         reel_results.append(reel_result)
 
-    return reel_results
+    return {
+        'icons': reel_results,
+        'block_height': block_height,
+        'offsets': offsets,
+        'reel_bytes': [int(segment, 16) for segment in hex_segments],
+    }
+
+def spin_reels():
+    """Main function to spin reels and generate slot results."""
+    spin = spin_reels_detailed()
+    return spin['icons'] if spin else None
 
 # Example use of spin_reels function
 if __name__ == "__main__":
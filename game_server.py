@@ -0,0 +1,581 @@
+"""
+game_server.py
+
+Asyncio server for many remote player sessions against one pool.
+
+Clients speak JSON lines over TCP: one request object per line, one reply per request, in order.
+The server greets every connection with {"event": "hello", "session": id}; each session is a
+slot_engine.SlotEngine driven by the connection's coroutine, so thousands of them cost little
+more than their sockets. A dropped connection leaves a session with credits or a deposit address
+in place for {"cmd": "resume", "session": id}.
+
+    {"id": 1, "cmd": "deposit"}                    (reply carries "deposit_address")
+    {"id": 2, "cmd": "buy_in", "txid": "..."}
+    {"id": 3, "cmd": "bet", "bet": 6}              (no "bet": next level)
+    {"id": 4, "cmd": "spin"}
+    {"id": 5, "cmd": "cash_out", "address": "D..."}
+    {"id": 6, "cmd": "state"}   {"id": 7, "cmd": "stats"}
+
+The server never signs for an address a client names. Each session gets its own deposit address
+in the node wallet; the player pays it from their own wallet and sends the txid, and buy_in
+credits the whole DOGE that transaction paid to that address once it has deposit_confirmations.
+A transaction is credited only once, and the deposit is then swept to the pool.
+
+Replies carry the id, "ok" and either the session state or "error". Reels come from a shared
+AsyncEntropyPool: the recent blocks spin_reels_detailed draws from are fetched once, in
+the background and on demand, and each spin picks a random block and offsets as the game does.
+Cash-outs go through one shared payout_queue.PayoutQueue; one whose batch was signed but not seen
+broadcast holds the session until the node knows the txid. Deposit checks and sweeps run in
+executor threads. Spins, payments and sessions are written to the spin store. From its deposit
+address on, each session's money is written to its own journal.Journal in session_dir while the
+player is connected; the server reloads those sessions when it starts.
+
+    python game_server.py --host 127.0.0.1 --port 22560
+"""
+
+from collections import deque
+import argparse
+import asyncio
+import configparser
+import contextlib
+import io
+import json
+import os
+import random
+import time
+import uuid
+
+from bitcoinrpc.authproxy import JSONRPCException
+
+from five_reel_value_gen import icon_index, initialize_rpc_connection, spin_from_block
+import cashOut
+import jackpot
+import journal
+import payout_queue
+import slot_engine
+import spin_store
+import utxo_consolidator
+from tx_codec import Transaction, is_p2pkh_address
+import win_calculator
+
+try:
+    import reel_math
+except ImportError:
+    reel_math = None
+
+# Load server settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+LISTEN_HOST = config.get('gameserver', 'listen_host', fallback='127.0.0.1')
+LISTEN_PORT = config.getint('gameserver', 'listen_port', fallback=22560)
+MAX_SESSIONS = config.getint('gameserver', 'max_sessions', fallback=5000)
+SPIN_TIMEOUT_SECONDS = config.getfloat('gameserver', 'spin_timeout_seconds', fallback=10)
+ENTROPY_BLOCKS = config.getint('gameserver', 'entropy_blocks', fallback=1001)
+TIP_REFRESH_SECONDS = config.getfloat('gameserver', 'tip_refresh_seconds', fallback=10)
+FETCH_CONCURRENCY = config.getint('gameserver', 'fetch_concurrency', fallback=8)
+DEPOSIT_CONFIRMATIONS = config.getint('gameserver', 'deposit_confirmations', fallback=1)
+SESSION_DIR = config.get('gameserver', 'session_dir', fallback='game_sessions')
+
+# Blocks this close to the tip may still be replaced by a reorg
+REORG_DEPTH = 6
+# Spin latencies kept for the stats command
+LATENCY_SAMPLES = 10000
+SATOSHIS_PER_DOGE = 10**8
+
+class DepositError(Exception):
+    """The transaction cannot be credited (yet)."""
+
+def new_deposit_address(session_id):
+    return initialize_rpc_connection().getnewaddress(f"gameserver-{session_id}")
+
+def verify_deposit(address, txid, min_confirmations=DEPOSIT_CONFIRMATIONS):
+    """Satoshis txid pays to address, once it has min_confirmations. Raises DepositError."""
+    try:
+        tx = initialize_rpc_connection().gettransaction(txid)
+    except JSONRPCException as e:
+        raise DepositError(f"unknown transaction {txid}: {e}") from None
+    if tx['confirmations'] < min_confirmations:
+        raise DepositError(f"deposit has {max(0, tx['confirmations'])} of {min_confirmations} confirmations")
+    paid = sum(output.amount for output in Transaction.from_hex(tx['hex']).outputs if output.address == address)
+    if paid <= 0:
+        raise DepositError("transaction pays nothing to this session's deposit address")
+    return paid
+
+def sweep_deposit(address):
+    from buyIn import sweep_to_pool
+    return sweep_to_pool(address)
+
+class AsyncEntropyPool:
+    """Transaction data of the last `depth` blocks, shared by every session's spins."""
+
+    def __init__(self, rpc_factory=initialize_rpc_connection, depth=ENTROPY_BLOCKS,
+                 refresh_interval=TIP_REFRESH_SECONDS, fetch_concurrency=FETCH_CONCURRENCY):
+        self.rpc_factory = rpc_factory
+        self.depth = depth
+        self.refresh_interval = refresh_interval
+        self.fetch_concurrency = fetch_concurrency
+        self.tip = None
+        self.rpc_calls = 0
+        self._blocks = {}
+        self._fetching = {}
+        self._semaphore = asyncio.Semaphore(fetch_concurrency)
+        self._tip_known = asyncio.Event()
+        self._task = None
+
+    async def _call(self, method, *params):
+        # The RPC clients block; keep them off the event loop
+        self.rpc_calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: getattr(self.rpc_factory(), method)(*params))
+
+    async def refresh_tip(self):
+        tip = await self._call('getblockcount')
+        if tip != self.tip:
+            lowest = tip - self.depth + 1
+            for height in list(self._blocks):
+                if height < lowest or height > tip - REORG_DEPTH:
+                    del self._blocks[height]
+            self.tip = tip
+        self._tip_known.set()
+
+    async def block_data(self, height):
+        """Concatenated txids of the block at height, fetched once however many spins want it."""
+        tx_data = self._blocks.get(height)
+        if tx_data is not None:
+            return tx_data
+        future = self._fetching.get(height)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(height))
+            self._fetching[height] = future
+            future.add_done_callback(lambda _: self._fetching.pop(height, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, height):
+        async with self._semaphore:
+            block = await self._call('getblock', await self._call('getblockhash', height))
+        tx_data = ''.join(block['tx']) if block['tx'] else ''
+        self._blocks[height] = tx_data
+        return tx_data
+
+    def cached_blocks(self):
+        return len(self._blocks)
+
+    async def spin(self):
+        """A spin_reels_detailed() dict from a random recent block, or None."""
+        await self._tip_known.wait()
+        tip = self.tip
+        height = random.randint(max(0, tip - self.depth + 1), tip)
+        return spin_from_block(height, await self.block_data(height))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_tip()
+                # Fill the window newest first, a few blocks at a time so spins can fetch in between
+                missing = [h for h in range(self.tip, max(-1, self.tip - self.depth), -1) if h not in self._blocks]
+                for start in range(0, len(missing), self.fetch_concurrency):
+                    await asyncio.gather(*(self.block_data(h) for h in missing[start:start + self.fetch_concurrency]))
+            except Exception as e:
+                print(f"Entropy pool refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+def table_win_calculator():
+    """calculate_win from reel_math's payout table: the same wins, without the console output."""
+    tensor = reel_math.payout_tensor()
+    def calculate(results, bet_amount, credits):
+        win = int(tensor[(reel_math.BET_LEVELS.index(bet_amount),) + tuple(icon_index(icon) - 1 for icon in results)])
+        return win, credits + win
+    return calculate
+
+def quiet_win_calculator(results, bet_amount, credits):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return win_calculator.calculate_win(results, bet_amount, credits)
+
+class GameSession:
+    __slots__ = ('session_id', 'engine', 'connected', 'deposit_address', 'db_session', 'journal', 'journal_closed')
+
+    def __init__(self, session_id, engine):
+        self.session_id = session_id
+        self.engine = engine
+        self.connected = False
+        self.deposit_address = None
+        # Id of the session's row in the spin store
+        self.db_session = None
+        # Open while the player is connected; journal_closed is the future of the last close
+        self.journal = None
+        self.journal_closed = None
+
+    def state(self):
+        engine = self.engine
+        return {
+            'session': self.session_id,
+            'state': engine.state,
+            'bet': engine.bet_amount,
+            'credits': engine.credits,
+            'buy_in_total': engine.buy_in_total,
+            'last_win': engine.last_win,
+            'deposit_address': self.deposit_address,
+        }
+
+class GameServer:
+    def __init__(self, entropy_pool=None, payouts=None, spin_db=None, win_calculator=None,
+                 new_deposit_address=new_deposit_address, verify_deposit=verify_deposit,
+                 sweep_deposit=sweep_deposit, pool_address=None, jackpot_pool=None, session_dir=None,
+                 max_sessions=MAX_SESSIONS, spin_timeout=SPIN_TIMEOUT_SECONDS):
+        self.entropy_pool = entropy_pool
+        self.payouts = payouts
+        self.spin_db = spin_db
+        if win_calculator is None:
+            win_calculator = table_win_calculator() if reel_math is not None else quiet_win_calculator
+        self.win_calculator = win_calculator
+        self.new_deposit_address = new_deposit_address
+        self.verify_deposit = verify_deposit
+        self.sweep_deposit = sweep_deposit
+        self.pool_address = pool_address
+        self.jackpot_pool = jackpot_pool
+        # None keeps sessions in memory only
+        self.session_dir = session_dir
+        self.max_sessions = max_sessions
+        self.spin_timeout = spin_timeout
+        self.sessions = {}
+        # Deposit txids credited (or being checked), so none is credited twice
+        self.credited_deposits = set()
+        self.spins = 0
+        self.spin_errors = 0
+        self.spin_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.started_at = time.monotonic()
+        self._server = None
+
+    def new_session(self, session_id=None):
+        session_id = session_id or uuid.uuid4().hex
+        # Buy-ins only come from verified deposits, never from an address the client names
+        engine = slot_engine.SlotEngine(win_calculator=self.win_calculator, send_buy_in=None, verbose=False,
+                                        jackpot=self.jackpot_pool)
+        session = GameSession(session_id, engine)
+        if self.spin_db is not None:
+            db_session = session.db_session = self.spin_db.start_session(self.pool_address)
+            engine.add_listener(lambda event, data: self._record(db_session, event, data))
+        self.sessions[session_id] = session
+        return session
+
+    def _journal_path(self, session):
+        return os.path.join(self.session_dir, f"{session.session_id}.log")
+
+    def load_sessions(self):
+        """Bring back the journalled sessions of an earlier run, detached. Blocks on disk."""
+        if self.session_dir is None:
+            return
+        os.makedirs(self.session_dir, exist_ok=True)
+        for name in sorted(os.listdir(self.session_dir)):
+            if not name.endswith('.log'):
+                continue
+            session = self.new_session(name[:-len('.log')])
+            session_journal = journal.Journal(self._journal_path(session))
+            state = session_journal.open()
+            session.engine.journal = session_journal
+            session.engine.restore(state)
+            session.engine.journal = None
+            session_journal.close()
+            session.deposit_address = state.deposit_address
+            self.credited_deposits.update(state.credited_txids)
+        print(f"Loaded {len(self.sessions)} sessions from {self.session_dir}")
+
+    async def _open_journal(self, session):
+        """Journal the session's money from now on; a no-op without a session_dir."""
+        if self.session_dir is None or session.journal is not None:
+            return
+        if session.journal_closed is not None:
+            await session.journal_closed
+            session.journal_closed = None
+        session_journal = journal.Journal(self._journal_path(session))
+        await asyncio.get_running_loop().run_in_executor(None, session_journal.open)
+        session.journal = session.engine.journal = session_journal
+
+    def _close_journal(self, session):
+        if session.journal is None:
+            return
+        session.journal_closed = asyncio.get_running_loop().run_in_executor(None, session.journal.close)
+        session.journal = session.engine.journal = None
+
+    def _record(self, db_session, event, data):
+        if event == 'spin_finished':
+            self.spin_db.record_spin(db_session, data['spin'], data['bet'], data['win'], data['credits'])
+        elif event in ('buy_in', 'cash_out'):
+            self.spin_db.record_payment(db_session, event, data['amount'], txid=data['txid'],
+                                       address=data['address'], status=data.get('status', 'broadcast'))
+
+    async def spin(self, session):
+        engine = session.engine
+        if not engine.start_spin():
+            return {'error': 'insufficient credits' if engine.state == slot_engine.IDLE else f"engine is {engine.state}"}
+        start = time.perf_counter()
+        try:
+            spin = await asyncio.wait_for(self.entropy_pool.spin(), self.spin_timeout)
+        except Exception as e:
+            print(f"Spin failed: {e!r}")
+            spin = None
+        if engine.deliver_result(spin) is None:
+            self.spin_errors += 1
+            return {'error': 'no spin result, bet refunded'}
+        if self.jackpot_pool is not None and engine.spin_bet == jackpot.JACKPOT_BET and jackpot.is_jackpot(spin['icons']):
+            # Settling the pool takes the file lock and fsyncs; keep the other sessions spinning
+            win = await asyncio.get_running_loop().run_in_executor(None, engine.finish_spin)
+        else:
+            win = engine.finish_spin()
+        self.spins += 1
+        self.spin_latencies.append(time.perf_counter() - start)
+        return {'icons': spin['icons'], 'block_height': spin['block_height'], 'win': win}
+
+    async def deposit(self, session):
+        if session.deposit_address is None:
+            loop = asyncio.get_running_loop()
+            try:
+                address = await loop.run_in_executor(None, self.new_deposit_address, session.session_id)
+                # Journalled before the player sees it, so a deposit always finds its session again
+                await self._open_journal(session)
+                if session.journal is not None:
+                    await loop.run_in_executor(None, lambda: session.journal.append('deposit_address', wait=True, address=address))
+            except Exception as e:
+                return {'error': f"no deposit address: {e}"}
+            session.deposit_address = address
+        return {}
+
+    async def buy_in(self, session, txid):
+        """Credit the whole DOGE txid paid to the session's deposit address."""
+        address = session.deposit_address
+        if address is None:
+            return {'error': 'ask for a deposit address first'}
+        if not isinstance(txid, str) or not txid:
+            return {'error': 'txid of the deposit required'}
+        if session.engine.state != slot_engine.IDLE:
+            return {'error': f"engine is {session.engine.state}"}
+        if txid in self.credited_deposits:
+            return {'error': 'deposit already credited'}
+        self.credited_deposits.add(txid)
+        loop = asyncio.get_running_loop()
+        try:
+            paid = await loop.run_in_executor(None, self.verify_deposit, address, txid)
+        except Exception as e:
+            self.credited_deposits.discard(txid)
+            return {'error': f"buy-in failed: {e}"}
+        amount = paid // SATOSHIS_PER_DOGE
+        if amount <= 0:
+            # Left in credited_deposits: it can never be worth a credit
+            return {'error': 'deposit is less than 1 DOGE'}
+        await loop.run_in_executor(None, session.engine.credit_buy_in, address, amount, txid)
+        try:
+            await loop.run_in_executor(None, self.sweep_deposit, address)
+        except Exception as e:
+            # The player is credited either way; the deposit is swept with the next one
+            print(f"Sweep of deposit {txid} failed: {e}")
+        return {'txid': txid, 'amount': amount}
+
+    async def cash_out(self, session, address):
+        engine = session.engine
+        # Payouts are P2PKH only; anything else would fail or misdirect the shared batch
+        if not is_p2pkh_address(address):
+            return {'error': 'a Dogecoin P2PKH address is required'}
+        # Journalled engine calls wait for an fsync; keep them off the event loop
+        loop = asyncio.get_running_loop()
+        started = await loop.run_in_executor(None, engine.begin_cash_out)
+        if started is None:
+            return {'error': 'nothing to cash out' if engine.state == slot_engine.IDLE else f"engine is {engine.state}"}
+        amount, win_differential = started
+        try:
+            txid = await asyncio.wrap_future(self.payouts.submit(address, amount, win_differential))
+        except payout_queue.PayoutUnconfirmed as e:
+            print(f"Cashout of {amount} DOGE unconfirmed: {e}")
+            await loop.run_in_executor(None, engine.hold_cash_out, address, amount, e.txid)
+            return await self.settle_cash_out(session)
+        except Exception as e:
+            print(f"Cashout of {amount} DOGE failed: {e}")
+            txid = None
+        await loop.run_in_executor(None, engine.finish_cash_out, address, amount, txid)
+        return {'txid': txid, 'amount': amount} if txid else {'error': 'cash-out failed, credits kept'}
+
+    async def settle_cash_out(self, session):
+        """Ask the node about the session's pending cash-out; the session stays CASHING_OUT until it answers."""
+        engine = session.engine
+        pending = engine.pending_cash_out
+        loop = asyncio.get_running_loop()
+        txid = await loop.run_in_executor(None, engine.settle_pending_cash_out)
+        if engine.pending_cash_out is not None:
+            return {'error': f"cash-out {pending['txid']} pending, the node cannot say yet", 'txid': pending['txid']}
+        if not txid:
+            return {'error': 'cash-out failed, credits kept'}
+        # The queue accrues dev fees only for payouts it saw broadcast
+        try:
+            await loop.run_in_executor(None, cashOut.accrue_dev_fees,
+                                       int(pending['win_differential'] * SATOSHIS_PER_DOGE), txid)
+        except Exception as e:
+            print(f"Dev fee accrual failed for payout {txid}: {e}")
+        return {'txid': txid, 'amount': pending['amount']}
+
+    def stats(self):
+        latencies = sorted(self.spin_latencies)
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+        elapsed = time.monotonic() - self.started_at
+        return {
+            'sessions': len(self.sessions),
+            'connected': sum(1 for session in self.sessions.values() if session.connected),
+            'spins': self.spins,
+            'spin_errors': self.spin_errors,
+            'spins_per_second': round(self.spins / elapsed, 1) if elapsed else None,
+            'spin_p50_ms': percentile(0.5),
+            'spin_p99_ms': percentile(0.99),
+            'entropy_blocks': self.entropy_pool.cached_blocks(),
+            'rpc_calls': self.entropy_pool.rpc_calls,
+        }
+
+    async def handle(self, session, request):
+        command = request.get('cmd')
+        if command == 'stats':
+            return dict(self.stats(), ok=True)
+        if session.engine.pending_cash_out is not None:
+            # Nothing else happens in a session until its cash-out is settled
+            result = await self.settle_cash_out(session)
+            if session.engine.pending_cash_out is None and command != 'state':
+                result = dict(result, **await self._command(session, command, request))
+        else:
+            result = await self._command(session, command, request)
+        reply = session.state()
+        reply.update(result)
+        reply['ok'] = 'error' not in result
+        return reply
+
+    async def _command(self, session, command, request):
+        if command == 'spin':
+            result = await self.spin(session)
+        elif command == 'bet':
+            engine = session.engine
+            if 'bet' in request:
+                result = {} if engine.set_bet(request['bet']) else {'error': f"bet must be one of {list(engine.bet_levels)} and not mid-spin"}
+            else:
+                engine.cycle_bet()
+                result = {}
+        elif command == 'deposit':
+            result = await self.deposit(session)
+        elif command == 'buy_in':
+            result = await self.buy_in(session, request.get('txid'))
+        elif command == 'cash_out':
+            result = await self.cash_out(session, request.get('address'))
+        elif command == 'state':
+            result = {}
+        else:
+            result = {'error': f"unknown command {command!r}"}
+        return result
+
+    async def _client(self, reader, writer):
+        if sum(1 for session in self.sessions.values() if session.connected) >= self.max_sessions:
+            writer.write(b'{"event": "busy"}\n')
+            await writer.drain()
+            writer.close()
+            return
+        session = self.new_session()
+        session.connected = True
+        writer.write((json.dumps({'event': 'hello', 'session': session.session_id}) + '\n').encode('utf-8'))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    reply = {'ok': False, 'error': 'invalid JSON'}
+                else:
+                    if request.get('cmd') == 'resume':
+                        resumed = self.sessions.get(request.get('session'))
+                        if resumed is None or resumed.connected:
+                            reply = {'ok': False, 'error': 'no such detached session'}
+                        else:
+                            self._detach(session)
+                            session = resumed
+                            session.connected = True
+                            if session.deposit_address is not None:
+                                await self._open_journal(session)
+                            reply = dict(session.state(), ok=True)
+                    else:
+                        reply = await self.handle(session, request)
+                    if 'id' in request:
+                        reply['id'] = request['id']
+                writer.write((json.dumps(reply) + '\n').encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._detach(session)
+            writer.close()
+
+    def _detach(self, session):
+        session.connected = False
+        engine = session.engine
+        # Nothing to come back for; a deposit address may still receive the player's DOGE
+        if engine.credits == 0 and engine.state == slot_engine.IDLE and session.deposit_address is None:
+            self.sessions.pop(session.session_id, None)
+            if self.spin_db is not None:
+                self.spin_db.end_session(session.db_session)
+        else:
+            self._close_journal(session)
+
+    async def start(self, host=LISTEN_HOST, port=LISTEN_PORT):
+        self.entropy_pool.start()
+        self._server = await asyncio.start_server(self._client, host, port, backlog=1024)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for session in self.sessions.values():
+            self._close_journal(session)
+            if session.journal_closed is not None:
+                await session.journal_closed
+        await self.entropy_pool.stop()
+
+async def serve(host, port):
+    payouts = payout_queue.PayoutQueue()
+    payouts.start()
+    spin_db = spin_store.SpinStore()
+    spin_db.start()
+    # Sessions here and cabinets on the same host feed one progressive jackpot
+    jackpot_pool = jackpot.JackpotPool(claimant='game_server').open()
+    server = GameServer(AsyncEntropyPool(), payouts, spin_db, jackpot_pool=jackpot_pool, session_dir=SESSION_DIR)
+    await asyncio.get_running_loop().run_in_executor(None, server.load_sessions)
+    # Every deposit is swept into the pool as its own UTXO; merge them while no payout is queued
+    consolidator = utxo_consolidator.UtxoConsolidator(payout_queue=payouts)
+    consolidator.start()
+    listener = await server.start(host, port)
+    print(f"Game server listening on {host}:{port}")
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.stop()
+        consolidator.stop()
+        payouts.stop()
+        spin_db.close()
+        jackpot_pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-session slot game server")
+    parser.add_argument('--host', default=LISTEN_HOST)
+    parser.add_argument('--port', type=int, default=LISTEN_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,326 @@
+"""
+jackpot.py
+
+Progressive jackpot shared by every cabinet and game server on the host.
+
+Five reel_icon_1.png at the top bet no longer pays the fixed 1000x bet but the whole jackpot,
+which starts at that amount (SEED_CREDITS) and grows by contribution_percent of every bet
+played anywhere on the host. Lower bets keep the fixed payout.
+
+The pool lives in a named shared memory segment of 64-bit counters, in millionths of a credit.
+Each process claims a shard of its own and is its only writer, so accruing a bet is one
+uncontended counter update with no lock shared between processes. The jackpot is the base
+(everything settled or recovered) plus the sum of the shards. Hits and shard changes take a file
+lock, so one hit settles the whole pool exactly once however many processes hit at the same
+moment; each hit is appended to the settlement log with fsync before it is paid.
+
+The value is snapshotted to disk every snapshot_seconds and after every hit. When the segment
+is gone (the host rebooted) the first process to open it restores the later of the snapshot
+and the last settlement, losing at most snapshot_seconds of contributions.
+
+A SlotEngine given a pool calls settle_spin() for every spin and journals a jackpot win with
+its hit number, waiting for the fsync. Each settlement names the pool's claimant (the cabinet's
+journal), so a cabinet that crashed between the two can find the hits it never credited with
+settlements(claimant, after_hit) and credit them when it restores the session.
+"""
+
+import configparser
+import contextlib
+import json
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from slot_engine import BET_LEVELS
+from win_calculator import payOutTable
+
+# Load jackpot settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+SEGMENT_NAME = config.get('jackpot', 'segment_name', fallback='dogeslot_jackpot')
+CONTRIBUTION_PERCENT = config.getfloat('jackpot', 'contribution_percent', fallback=1)
+SNAPSHOT_PATH = config.get('jackpot', 'snapshot_path', fallback='jackpot_snapshot.json')
+SETTLEMENT_LOG_PATH = config.get('jackpot', 'settlement_log', fallback='jackpot_settlements.jsonl')
+SNAPSHOT_SECONDS = config.getfloat('jackpot', 'snapshot_seconds', fallback=30)
+MAX_SHARDS = config.getint('jackpot', 'max_shards', fallback=64)
+
+JACKPOT_ICON = "reel_icon_1.png"
+JACKPOT_BET = max(BET_LEVELS)
+FIXED_MULTIPLIER = payOutTable['Five In A Row'][JACKPOT_ICON]
+SEED_CREDITS = config.getint('jackpot', 'seed_credits', fallback=FIXED_MULTIPLIER * JACKPOT_BET)
+
+# Counters are millionths of a credit, so a 1% contribution of a 3 credit bet is exact
+SCALE = 10**6
+
+# Segment layout in signed 64-bit words (the base goes negative when a hit pays out contributions
+# still held in the shards): a header line, then one 64 byte line per shard
+MAGIC = 0x4A41434B504F5431  # "JACKPOT1"
+WORDS_PER_LINE = 8
+HEADER_MAGIC, HEADER_BASE, HEADER_HITS = 0, 1, 2
+SHARD_PID, SHARD_ACCRUED = 0, 1
+
+def is_jackpot(results):
+    return len(results) == 5 and all(icon == JACKPOT_ICON for icon in results)
+
+def _pid_alive(pid):
+    if fcntl is None:
+        # No cheap check on Windows; a shard is freed when its process closes the pool
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _open_segment(name, size=0, create=False):
+    """Open without Python's resource tracker, which would unlink the segment when this process exits."""
+    try:
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    except TypeError:
+        # Python before 3.13 always tracks
+        segment = shared_memory.SharedMemory(name, create=create, size=size)
+        if fcntl is not None:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+class JackpotPool:
+    def __init__(self, name=SEGMENT_NAME, contribution_percent=CONTRIBUTION_PERCENT, seed_credits=SEED_CREDITS,
+                 snapshot_path=SNAPSHOT_PATH, settlement_log_path=SETTLEMENT_LOG_PATH,
+                 snapshot_seconds=SNAPSHOT_SECONDS, max_shards=MAX_SHARDS, claimant=None):
+        self.name = name
+        self.contribution_percent = contribution_percent
+        self.seed_credits = seed_credits
+        self.snapshot_path = snapshot_path
+        self.settlement_log_path = settlement_log_path
+        self.snapshot_seconds = snapshot_seconds
+        self.max_shards = max_shards
+        # Who is paid for the hits settled through this pool, written to the settlement log
+        self.claimant = claimant
+        # Contribution per credit bet, in counter units
+        self._rate = int(round(contribution_percent / 100 * SCALE))
+        # Threads of this process share its shard; hits also serialize here before the file lock
+        self._lock = threading.Lock()
+        self._lock_file = open(snapshot_path + '.lock', 'a+b')
+        self._segment = None
+        self._words = None
+        self._shard = None
+        self._stop = threading.Event()
+        self._snapshot_thread = None
+
+    def open(self):
+        """Attach to the host's pool (restoring it from disk if this is the first process) and claim a shard."""
+        size = (1 + self.max_shards) * WORDS_PER_LINE * 8
+        with self._locked():
+            try:
+                self._segment = _open_segment(self.name)
+                self._words = self._segment.buf.cast('q')
+                if self._words[HEADER_MAGIC] != MAGIC:
+                    raise RuntimeError(f"Shared memory segment {self.name} is not a jackpot pool")
+            except FileNotFoundError:
+                self._segment = _open_segment(self.name, size, create=True)
+                self._words = self._segment.buf.cast('q')
+                value, hits = self._recover()
+                self._words[HEADER_BASE] = value
+                self._words[HEADER_HITS] = hits
+                self._words[HEADER_MAGIC] = MAGIC
+                print(f"Jackpot restored at {value / SCALE:.2f} credits after {hits} hits")
+            self._shard = self._claim_shard()
+        if self.snapshot_seconds:
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="jackpot-snapshot", daemon=True)
+            self._snapshot_thread.start()
+        return self
+
+    def close(self):
+        """Snapshot, hand this process's contributions to the base and free its shard."""
+        if self._segment is None:
+            return
+        self._stop.set()
+        if self._snapshot_thread:
+            self._snapshot_thread.join()
+        with self._locked():
+            self._words[HEADER_BASE] += self._words[self._shard + SHARD_ACCRUED]
+            self._words[self._shard + SHARD_ACCRUED] = 0
+            self._words[self._shard + SHARD_PID] = 0
+            self._write_snapshot()
+        self._words.release()
+        self._segment.close()
+        self._segment = None
+        self._lock_file.close()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._lock_file.seek(0)
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._lock_file.seek(0)
+                    msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _shard_offsets(self):
+        return range(WORDS_PER_LINE, (1 + self.max_shards) * WORDS_PER_LINE, WORDS_PER_LINE)
+
+    def _claim_shard(self):
+        """Take a free shard, folding a dead process's contributions into the base. Needs the file lock."""
+        for offset in self._shard_offsets():
+            pid = self._words[offset + SHARD_PID]
+            if pid and _pid_alive(pid):
+                continue
+            self._words[HEADER_BASE] += self._words[offset + SHARD_ACCRUED]
+            self._words[offset + SHARD_ACCRUED] = 0
+            self._words[offset + SHARD_PID] = os.getpid()
+            return offset
+        raise RuntimeError(f"All {self.max_shards} jackpot shards are in use")
+
+    def _recover(self):
+        """(value, hits) from the snapshot, or from the settlement log if a hit came after it."""
+        value, hits = self.seed_credits * SCALE, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as file:
+                snapshot = json.load(file)
+            value, hits = snapshot['value'], snapshot['hits']
+        if os.path.exists(self.settlement_log_path):
+            with open(self.settlement_log_path, 'r') as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry['hit'] > hits:
+                            value, hits = entry['value_after'], entry['hit']
+        return value, hits
+
+    def _write_snapshot(self):
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'value': self._value(), 'hits': self._words[HEADER_HITS], 'time': time.time()}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+    def snapshot(self):
+        with self._locked():
+            self._write_snapshot()
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_seconds):
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"Jackpot snapshot failed: {e}")
+
+    def _value(self):
+        words = self._words
+        return words[HEADER_BASE] + sum(words[offset + SHARD_ACCRUED] for offset in self._shard_offsets())
+
+    def value(self):
+        """Current jackpot in credits. Read without a lock, so it may trail a contribution in flight."""
+        return self._value() / SCALE
+
+    def accrue(self, bet):
+        """Add the contribution of one bet. Only this process writes its shard."""
+        with self._lock:
+            self._words[self._shard + SHARD_ACCRUED] += bet * self._rate
+
+    def settle(self, detail=None):
+        """
+        Pay out the jackpot for one hit and reset it to the seed. Returns the settlement log entry;
+        its payout is the whole credits won, the fraction of a credit stays in the pool. detail
+        (e.g. the reels) goes into the log.
+        """
+        with self._locked():
+            value = self._value()
+            payout = value // SCALE
+            value_after = value - payout * SCALE + self.seed_credits * SCALE
+            hit = self._words[HEADER_HITS] + 1
+            entry = {'hit': hit, 'time': time.time(), 'payout': payout, 'value_after': value_after,
+                     'pid': os.getpid(), 'claimant': self.claimant, 'detail': detail}
+            with open(self.settlement_log_path, 'a') as file:
+                file.write(json.dumps(entry, sort_keys=True) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            # Logged: now reset the pool so no other process can win the same amount
+            self._words[HEADER_BASE] += value_after - value
+            self._words[HEADER_HITS] = hit
+            self._write_snapshot()
+        print(f"JACKPOT! Hit {hit} pays {payout} credits")
+        return entry
+
+    def settle_spin(self, icons, bet):
+        """
+        Feed one spin's bet to the pool and settle it if the spin hit the jackpot. Returns None, or
+        {'hit', 'payout', 'replaces'}: the payout stands in for the fixed 'replaces' credits of
+        calculate_win. A hit blocks on the file lock and two fsyncs; keep it off event loops.
+        """
+        self.accrue(bet)
+        if bet != JACKPOT_BET or not is_jackpot(icons):
+            return None
+        entry = self.settle({'icons': list(icons), 'bet': bet})
+        return {'hit': entry['hit'], 'payout': entry['payout'], 'replaces': FIXED_MULTIPLIER * bet}
+
+    def settlements(self, claimant, after_hit=0):
+        """Settlement log entries of claimant with a hit number above after_hit."""
+        entries = []
+        if os.path.exists(self.settlement_log_path):
+            with open(self.settlement_log_path, 'r') as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry.get('claimant') == claimant and entry['hit'] > after_hit:
+                            entries.append(entry)
+        return entries
+
+if __name__ == "__main__":
+    import multiprocessing
+    import tempfile
+
+    # Several processes accrue into one pool at once; one hit settles it
+    def play(name, directory, spins):
+        pool = JackpotPool(name, snapshot_path=os.path.join(directory, 'snapshot.json'),
+                           settlement_log_path=os.path.join(directory, 'settlements.jsonl'), snapshot_seconds=0)
+        pool.open()
+        for _ in range(spins):
+            pool.accrue(JACKPOT_BET)
+        pool.close()
+
+    directory = tempfile.mkdtemp(prefix='jackpot_')
+    name = f"dogeslot_jackpot_demo_{os.getpid()}"
+    pool = JackpotPool(name, snapshot_path=os.path.join(directory, 'snapshot.json'),
+                       settlement_log_path=os.path.join(directory, 'settlements.jsonl'), snapshot_seconds=0).open()
+    start = time.perf_counter()
+    for _ in range(100000):
+        pool.accrue(3)
+    print(f"accrue: {(time.perf_counter() - start) / 100000 * 1e6:.2f} us each")
+
+    processes = [multiprocessing.Process(target=play, args=(name, directory, 10000)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    expected = SEED_CREDITS + (100000 * 3 + 4 * 10000 * JACKPOT_BET) * CONTRIBUTION_PERCENT / 100
+    print(f"Jackpot {pool.value():.2f} credits, expected {expected:.2f}")
+
+    pool.claimant = 'demo'
+    hit = pool.settle_spin([JACKPOT_ICON] * 5, JACKPOT_BET)
+    print(f"Hit {hit['hit']} paid {hit['payout']} credits, jackpot reset to {pool.value():.2f}")
+    print(f"Settlements of the demo claimant: {[entry['hit'] for entry in pool.settlements('demo')]}")
+    pool.close()
+    segment = shared_memory.SharedMemory(name)
+    segment.close()
+    segment.unlink()
@@ -0,0 +1,260 @@
+"""
+journal.py
+
+Append-only write-ahead journal of the money moving through a game session.
+
+Buy-ins, spins, wins and cash-outs are appended as checksummed JSON lines. A writer thread
+group-commits them: everything queued since the last flush is written with one write() and
+one fsync(). Logging a spin only queues the record, while buy-ins and cash-outs wait for the
+fsync that covers them. recover() replays the journal to rebuild the session after a crash.
+If a write fails the journal stops, and every waiting or later append raises JournalError.
+"""
+
+import configparser
+import json
+import os
+import threading
+import time
+import zlib
+
+# Load journal settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+JOURNAL_PATH = config.get('journal', 'path', fallback='session_journal.log')
+# How long the writer waits for more records before an fsync
+COMMIT_INTERVAL_SECONDS = config.getfloat('journal', 'commit_interval_ms', fallback=2) / 1000
+
+class JournalError(Exception):
+    """The journal could not write a record; the session's money is not safe to move."""
+
+def encode_record(record):
+    payload = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n".encode('utf-8')
+
+def decode_record(line):
+    """Return the record stored in a journal line, or None if the line is torn or corrupt."""
+    try:
+        text = line.decode('utf-8')
+        checksum, payload = text.rstrip('\n').split(' ', 1)
+        if not text.endswith('\n') or int(checksum, 16) != zlib.crc32(payload.encode('utf-8')):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+def read_records(path=JOURNAL_PATH):
+    """Yield the journal's records up to the first torn or corrupt line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as file:
+        for line in file:
+            record = decode_record(line)
+            if record is None:
+                print(f"Journal {path}: ignoring torn or corrupt tail")
+                return
+            yield record
+
+class SessionState:
+    __slots__ = ('credits', 'buy_in_total', 'win_differential', 'pending_cash_out', 'last_jackpot_hit',
+                 'deposit_address', 'credited_txids', 'last_seq')
+
+    def __init__(self, credits=0, buy_in_total=0, win_differential=0, pending_cash_out=None,
+                 last_jackpot_hit=0, deposit_address=None, credited_txids=None, last_seq=0):
+        self.credits = credits
+        self.buy_in_total = buy_in_total
+        self.win_differential = win_differential
+        # Cash-out that started but never finished: {'amount', 'win_differential', 'txid'}
+        self.pending_cash_out = pending_cash_out
+        # Highest jackpot settlement credited, to find hits settled but lost in a crash
+        self.last_jackpot_hit = last_jackpot_hit
+        # Address the player pays buy-ins to, if the session has its own (game_server.py)
+        self.deposit_address = deposit_address
+        # Buy-in txids already credited, so a replayed one is refused after a restart
+        self.credited_txids = list(credited_txids or [])
+        self.last_seq = last_seq
+
+    def apply(self, record):
+        kind = record['type']
+        if kind == 'checkpoint':
+            self.credits = record['credits']
+            self.buy_in_total = record['buy_in_total']
+            self.win_differential = record['win_differential']
+            self.pending_cash_out = record.get('pending_cash_out')
+            self.last_jackpot_hit = record.get('last_jackpot_hit', 0)
+            self.deposit_address = record.get('deposit_address')
+            self.credited_txids = list(record.get('credited_txids', []))
+        elif kind == 'deposit_address':
+            self.deposit_address = record['address']
+        elif kind == 'buy_in':
+            self.credits += record['amount']
+            self.buy_in_total += record['amount']
+            if record.get('txid'):
+                self.credited_txids.append(record['txid'])
+        elif kind == 'spin':
+            self.credits -= record['bet']
+        elif kind == 'spin_void':
+            self.credits += record['bet']
+        elif kind == 'win':
+            self.credits += record['win']
+            if 'jackpot_hit' in record:
+                self.last_jackpot_hit = max(self.last_jackpot_hit, record['jackpot_hit'])
+        elif kind == 'cash_out_start':
+            self.pending_cash_out = {'amount': record['amount'], 'win_differential': record['win_differential'], 'txid': None}
+        elif kind == 'cash_out_signed':
+            if self.pending_cash_out is not None:
+                self.pending_cash_out['txid'] = record['txid']
+        elif kind == 'cash_out_done':
+            self.credits -= record['amount']
+            self.buy_in_total = 0
+            self.win_differential = 0
+            self.pending_cash_out = None
+        elif kind == 'cash_out_failed':
+            self.pending_cash_out = None
+        self.last_seq = record.get('seq', self.last_seq)
+
+    def as_checkpoint(self):
+        return {
+            'type': 'checkpoint',
+            'credits': self.credits,
+            'buy_in_total': self.buy_in_total,
+            'win_differential': self.win_differential,
+            'pending_cash_out': self.pending_cash_out,
+            'last_jackpot_hit': self.last_jackpot_hit,
+            'deposit_address': self.deposit_address,
+            'credited_txids': self.credited_txids,
+        }
+
+def recover(path=JOURNAL_PATH):
+    """Replay the journal and return the SessionState it describes."""
+    state = SessionState()
+    for record in read_records(path):
+        state.apply(record)
+    return state
+
+class Journal:
+    def __init__(self, path=JOURNAL_PATH, commit_interval=COMMIT_INTERVAL_SECONDS):
+        self.path = path
+        self.commit_interval = commit_interval
+        self._queue = []
+        self._waiters = []
+        self._seq = 0
+        self._written_seq = 0
+        self._condition = threading.Condition()
+        self._file = None
+        self._thread = None
+        self._running = False
+        # Exception that stopped the writer thread
+        self._error = None
+
+    def open(self):
+        """Recover the session, compact the journal to a checkpoint and start the writer."""
+        state = recover(self.path)
+        self._seq = state.last_seq
+        self._written_seq = self._seq
+        self._error = None
+
+        # Rewrite the journal as a single checkpoint so replay stays short
+        temp_path = self.path + '.tmp'
+        checkpoint = state.as_checkpoint()
+        checkpoint['seq'] = self._seq
+        with open(temp_path, 'wb') as file:
+            file.write(encode_record(checkpoint))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+        self._file = open(self.path, 'ab')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        return state
+
+    def append(self, kind, wait=False, **fields):
+        """
+        Queue a record. With wait=True, block until it is on disk.
+        Returns the record's sequence number.
+        """
+        with self._condition:
+            self._raise_error()
+            if not self._running:
+                raise RuntimeError("Journal is not open")
+            self._seq += 1
+            seq = self._seq
+            record = dict(fields, type=kind, seq=seq, time=time.time())
+            self._queue.append(encode_record(record))
+            self._condition.notify_all()
+            if wait:
+                while self._written_seq < seq and self._running:
+                    self._condition.wait()
+                if self._written_seq < seq:
+                    self._raise_error()
+        return seq
+
+    def sync(self):
+        """Block until every record appended so far is on disk."""
+        with self._condition:
+            seq = self._seq
+            while self._written_seq < seq and self._running:
+                self._condition.wait()
+            if self._written_seq < seq:
+                self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise JournalError(f"Journal {self.path} stopped: {self._error}") from self._error
+
+    def close(self):
+        try:
+            self.sync()
+        except JournalError:
+            # Already reported by the writer and raised to the appends it failed
+            pass
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+        if self._file:
+            self._file.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and self._running:
+                    self._condition.wait()
+                if not self._queue and not self._running:
+                    return
+
+            # Let more records arrive so they share the fsync
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+
+            with self._condition:
+                batch = self._queue
+                self._queue = []
+                batch_seq = self._seq
+
+            try:
+                self._file.write(b''.join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as e:
+                # Nothing after this batch can be made durable: stop and fail the waiters
+                print(f"Journal {self.path} write failed: {e}")
+                with self._condition:
+                    self._error = e
+                    self._running = False
+                    self._condition.notify_all()
+                return
+
+            with self._condition:
+                self._written_seq = batch_seq
+                self._condition.notify_all()
+
+# Print the session state stored in the journal
+if __name__ == "__main__":
+    state = recover()
+    print(f"Credits: {state.credits}")
+    print(f"Total bought in: {state.buy_in_total}")
+    print(f"Pending cash-out: {state.pending_cash_out}")
@@ -0,0 +1,193 @@
+"""
+load_generator.py
+
+Find where the slot breaks under many players.
+
+A stand-in node (mock_rpc_server) is started with a funded pool and one funded wallet address
+per player, and the game's modules are pointed at it. Each simulated player is a thread with
+its own slot_engine.SlotEngine on the default interfaces, so every operation runs the real code:
+buy-in through buyIn.process_transaction, spins through five_reel_value_gen.spin_reels_detailed
+and win_calculator.calculate_win, cash-out through cashOut.send_doge, building and signing
+real transactions. A player buys in, plays a random number of spins at random bet levels and
+cashes out, over and over.
+
+Concurrency ramps through the given player counts. For each level the report shows spins per
+second, spin resolution and payment latency percentiles, node requests per spin (buy-ins and
+cash-outs included) and error rates. The node runs in this process and shares its CPU.
+
+    python load_generator.py --players 1,4,16,64 --duration 20 --latency-ms 5 --error-rate 0.01
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import buyIn
+import cashOut
+import dev_fee_ledger
+import five_reel_value_gen
+import mock_rpc_server
+import rpc_router
+import slot_engine
+
+BUY_IN_AMOUNTS = (30, 60, 90, 150)
+PLAYER_OUTPUTS = 100
+PLAYER_OUTPUT_DOGE = 500
+POOL_OUTPUTS = 500
+POOL_OUTPUT_DOGE = 1000
+
+class LoadStats:
+    """Counts and latencies of one concurrency level, filled in by every player thread."""
+
+    KINDS = ('spin', 'buy_in', 'cash_out')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {kind: [] for kind in self.KINDS}
+        self.errors = dict.fromkeys(self.KINDS, 0)
+
+    def record(self, kind, latency, ok):
+        with self._lock:
+            if ok:
+                self.latencies[kind].append(latency)
+            else:
+                self.errors[kind] += 1
+
+    def count(self, kind):
+        return len(self.latencies[kind])
+
+    def error_rate(self, kind):
+        total = self.count(kind) + self.errors[kind]
+        return self.errors[kind] / total if total else 0.0
+
+def percentiles(values, quantiles=(0.5, 0.95, 0.99)):
+    if not values:
+        return [None] * len(quantiles)
+    values = sorted(values)
+    return [values[min(len(values) - 1, int(q * len(values)))] for q in quantiles]
+
+def start_stand_in_node(num_players, faults, block_interval, seed=0):
+    """Mock node with a funded pool and players. Returns (server, pool_address, player_addresses)."""
+    chain = mock_rpc_server.MockChain(seed, block_interval=block_interval)
+    pool_address = chain.new_address()
+    chain.fund(pool_address, POOL_OUTPUT_DOGE * 10**8, POOL_OUTPUTS)
+    players = []
+    for _ in range(num_players):
+        address = chain.new_address()
+        chain.fund(address, PLAYER_OUTPUT_DOGE * 10**8, PLAYER_OUTPUTS)
+        players.append(address)
+    server = mock_rpc_server.start_mock_server(chain, faults)
+    return server, pool_address, players
+
+def point_game_at(node_url, pool_address, pool_wif, ledger_path):
+    """Send the game modules' RPC traffic and payments to the stand-in node."""
+    router = rpc_router.get_router(node_url, [])
+    five_reel_value_gen.initialize_rpc_connection = lambda: router
+    buyIn.rpc_connection = router
+    buyIn.recipient_address = pool_address
+    cashOut.rpc_url = node_url
+    cashOut.from_address = pool_address
+    cashOut.privkey_hex = buyIn.wif_to_privkey_hex(pool_wif)
+    # Keep dev fee accruals out of the real ledger, and never sweep to the placeholder addresses
+    dev_fee_ledger._default_ledger = dev_fee_ledger.DevFeeLedger(ledger_path, sweep_threshold=10**18,
+                                                                 sweep_interval=float('inf'))
+
+def play(address, stats, stop, rng, max_spins):
+    """One player: buy in, spin, cash out, until stop is set."""
+    engine = slot_engine.SlotEngine(verbose=False)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            txid = engine.buy_in(address, rng.choice(BUY_IN_AMOUNTS))
+        except Exception:
+            txid = None
+        stats.record('buy_in', time.perf_counter() - start, txid is not None)
+        if txid is None:
+            stop.wait(0.1)
+            continue
+
+        for _ in range(rng.randint(1, max_spins)):
+            engine.set_bet(rng.choice(engine.bet_levels))
+            if stop.is_set() or not engine.can_spin():
+                break
+            start = time.perf_counter()
+            win = engine.spin()
+            stats.record('spin', time.perf_counter() - start, win is not None)
+
+        if engine.credits > 0:
+            start = time.perf_counter()
+            txid = engine.cash_out(address)
+            stats.record('cash_out', time.perf_counter() - start, txid is not None)
+
+def run_level(node, players, duration, max_spins, seed):
+    stats = LoadStats()
+    stop = threading.Event()
+    requests_before = node.request_count
+    threads = [threading.Thread(target=play, args=(address, stats, stop, random.Random(f"{seed}:{i}"), max_spins),
+                                name=f"player-{i}", daemon=True)
+               for i, address in enumerate(players)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return stats, elapsed, node.request_count - requests_before
+
+def format_ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.0f}"
+
+def format_header():
+    return (f"{'players':>7} {'spins/s':>8} {'spin p50/p95/p99 ms':>20} {'buy-in p50/p99':>15} "
+            f"{'cash-out p50/p99':>17} {'rpc/spin':>8} {'spin err':>8} {'pay err':>8}")
+
+def format_row(players, stats, elapsed, node_requests):
+    spins = stats.count('spin')
+    spin_p = '/'.join(format_ms(value) for value in percentiles(stats.latencies['spin']))
+    buy_in_p = '/'.join(format_ms(value) for value in percentiles(stats.latencies['buy_in'], (0.5, 0.99)))
+    cash_out_p = '/'.join(format_ms(value) for value in percentiles(stats.latencies['cash_out'], (0.5, 0.99)))
+    payments = stats.count('buy_in') + stats.count('cash_out')
+    payment_errors = stats.errors['buy_in'] + stats.errors['cash_out']
+    payment_error_rate = payment_errors / (payments + payment_errors) if payments + payment_errors else 0.0
+    rpc_per_spin = f"{node_requests / spins:.1f}" if spins else '-'
+    return (f"{players:>7} {spins / elapsed:>8.1f} {spin_p:>20} {buy_in_p:>15} {cash_out_p:>17} "
+            f"{rpc_per_spin:>8} {stats.error_rate('spin'):>8.1%} {payment_error_rate:>8.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load generator against a stand-in node")
+    parser.add_argument('--players', default='1,2,4,8,16,32', help="comma separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=15, help="seconds per level")
+    parser.add_argument('--max-spins', type=int, default=40, help="most spins per buy-in")
+    parser.add_argument('--spin-delay', type=float, default=0,
+                        help=f"pause before each spin's block lookup (the game waits {five_reel_value_gen.SPIN_DELAY_SECONDS} s)")
+    parser.add_argument('--block-interval', type=float, default=2, help="stand-in node seconds per block")
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help="fraction of node calls answered with an RPC error")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="show the game's console output")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.players.split(',')]
+    faults = mock_rpc_server.FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    node, pool_address, players = start_stand_in_node(max(levels), faults, args.block_interval, args.seed)
+    ledger_dir = tempfile.mkdtemp(prefix='load_generator_')
+    point_game_at(node.url, pool_address, node.chain.dumpprivkey(pool_address), os.path.join(ledger_dir, 'dev_fee_ledger.jsonl'))
+    five_reel_value_gen.SPIN_DELAY_SECONDS = args.spin_delay
+
+    print(f"Stand-in node {node.url.split('@')[1]}, {args.latency_ms:.0f} ms latency, "
+          f"{args.error_rate:.1%} errors, spin delay {args.spin_delay} s")
+    print(format_header())
+    for level in levels:
+        # The real code prints every step; keep the report readable
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            stats, elapsed, node_requests = run_level(node, players[:level], args.duration, args.max_spins, args.seed)
+        print(format_row(level, stats, elapsed, node_requests))
+    node.shutdown()
@@ -0,0 +1,460 @@
+"""
+mock_rpc_server.py
+
+Offline stand-in for a Dogecoin Core node, for benchmarks and regression runs.
+
+Serves the JSON-RPC calls this project makes over HTTP on localhost, backed by a synthetic
+chain and a small in-memory wallet:
+
+    getblockcount, getblockhash, getblock, getrawmempool, listsinceblock,
+    listunspent, validateaddress, importaddress, dumpprivkey, estimatesmartfee,
+    sendrawtransaction, getrawtransaction, gettransaction, getnewaddress
+
+Blocks are derived from the seed and height, so any height can be served without storing
+it, and a new block is mined every --block-interval seconds. sendrawtransaction decodes the
+transaction with tx_codec, checks its inputs against the UTXO set (signatures are not checked)
+and puts it in the mempool until the next block. Every request can be delayed by a latency
+with jitter, and a fraction of calls can fail with an RPC error, an HTTP 500 or a hang.
+
+    python mock_rpc_server.py --port 22555 --latency-ms 40 --jitter-ms 20 --error-rate 0.01 \\
+        --wallet-addresses 3 --fund-amount 1000
+
+Point RPC.conf's rpchost/rpcport at it; any rpcuser/rpcpassword is accepted unless
+--rpcuser/--rpcpassword are given.
+"""
+
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+
+import base58
+
+from secp256k1_signer import get_signer
+from tx_codec import Transaction, create_script_pubkey, is_p2pkh_address, public_key_to_address
+
+# Base58 version byte of Dogecoin mainnet private keys
+WIF_VERSION = 0x9E
+
+# Dogecoin Core error codes
+RPC_MISC_ERROR = -1
+RPC_INVALID_ADDRESS_OR_KEY = -5
+RPC_INVALID_PARAMETER = -8
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INTERNAL_ERROR = -32603
+RPC_VERIFY_ERROR = -25
+RPC_VERIFY_REJECTED = -26
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+def to_doge(satoshis):
+    return Decimal(satoshis) / Decimal('1e8')
+
+def sha256d_hex(text):
+    return hashlib.sha256(hashlib.sha256(text.encode('utf-8')).digest()).hexdigest()
+
+def privkey_to_wif(privkey_bytes):
+    return base58.b58encode_check(bytes([WIF_VERSION]) + privkey_bytes + b'\x01').decode('utf-8')
+
+class MockChain:
+    """Synthetic chain plus wallet. All methods are called with the lock held."""
+
+    def __init__(self, seed=0, start_height=5000000, block_interval=60, min_block_txs=1, max_block_txs=80):
+        self.seed = seed
+        self.block_interval = block_interval
+        self.min_block_txs = min_block_txs
+        self.max_block_txs = max_block_txs
+        self.height = start_height
+        self._next_block_time = time.time() + block_interval if block_interval else None
+        self.lock = threading.RLock()
+        # (txid, vout) -> {'address', 'amount' (satoshis), 'script_pubkey', 'height' (None in the mempool)}
+        self.utxos = {}
+        self.spent = set()
+        # txid -> {'hex', 'height'} for transactions created through sendrawtransaction or fund()
+        self.transactions = {}
+        self.mempool = []
+        # address -> WIF for wallet addresses, None for watch-only ones
+        self.wallet = {}
+        self._rng = random.Random(seed)
+
+    # Blocks
+
+    def advance(self, now=None):
+        """Mine the blocks that are due, confirming the mempool into the first one."""
+        if self._next_block_time is None:
+            return
+        now = now or time.time()
+        while now >= self._next_block_time:
+            self.mine_block()
+            self._next_block_time += self.block_interval
+
+    def mine_block(self):
+        self.height += 1
+        for txid in self.mempool:
+            self.transactions[txid]['height'] = self.height
+            tx = Transaction.from_hex(self.transactions[txid]['hex'])
+            for vout in range(len(tx.outputs)):
+                if (txid, vout) in self.utxos:
+                    self.utxos[(txid, vout)]['height'] = self.height
+        self.mempool = []
+
+    def block_hash(self, height):
+        # The height is embedded in the hash so getblock can be answered without a lookup table
+        return f"{height:08x}" + sha256d_hex(f"{self.seed}:block:{height}")[8:]
+
+    def height_of(self, block_hash):
+        try:
+            height = int(block_hash[:8], 16)
+        except (TypeError, ValueError):
+            height = -1
+        if not 0 <= height <= self.height or self.block_hash(height) != block_hash:
+            raise RPCError(RPC_INVALID_ADDRESS_OR_KEY, "Block not found")
+        return height
+
+    def block_txids(self, height):
+        rng = random.Random(f"{self.seed}:{height}")
+        count = rng.randint(self.min_block_txs, self.max_block_txs)
+        txids = [sha256d_hex(f"{self.seed}:tx:{height}:{i}") for i in range(count)]
+        txids += [txid for txid, tx in self.transactions.items() if tx['height'] == height]
+        return txids
+
+    def confirmations(self, height):
+        return 0 if height is None else self.height - height + 1
+
+    # Wallet
+
+    def new_address(self, watch_only=False):
+        privkey = hashlib.sha256(f"{self.seed}:key:{len(self.wallet)}".encode('utf-8')).digest()
+        address = public_key_to_address(get_signer(privkey).public_key())
+        self.wallet[address] = None if watch_only else privkey_to_wif(privkey)
+        return address
+
+    def fund(self, address, amount_satoshis, count=1):
+        """Credit `count` confirmed outputs of amount_satoshis to address, in one synthetic transaction."""
+        txid = sha256d_hex(f"{self.seed}:fund:{self._rng.random()}")
+        script_pubkey = create_script_pubkey(address)
+        for vout in range(count):
+            self.utxos[(txid, vout)] = {'address': address, 'amount': amount_satoshis,
+                                        'script_pubkey': script_pubkey.hex(), 'height': self.height - 100}
+        self.transactions[txid] = {'hex': '', 'height': self.height - 100}
+        return txid
+
+    def send_raw_transaction(self, raw_tx_hex):
+        try:
+            tx = Transaction.from_hex(raw_tx_hex)
+        except ValueError as e:
+            raise RPCError(-22, f"TX decode failed: {e}")
+        txid = tx.txid()
+        if txid in self.transactions:
+            raise RPCError(-27, "transaction already in block chain" if self.transactions[txid]['height'] else "txn-already-in-mempool")
+
+        input_total = 0
+        for txin in tx.inputs:
+            if txin.outpoint in self.spent:
+                raise RPCError(RPC_VERIFY_REJECTED, "txn-mempool-conflict")
+            if txin.outpoint not in self.utxos:
+                raise RPCError(RPC_VERIFY_ERROR, "Missing inputs")
+            input_total += self.utxos[txin.outpoint]['amount']
+        output_total = sum(txout.amount for txout in tx.outputs)
+        if output_total > input_total:
+            raise RPCError(RPC_VERIFY_REJECTED, "bad-txns-in-belowout")
+
+        for txin in tx.inputs:
+            del self.utxos[txin.outpoint]
+            self.spent.add(txin.outpoint)
+        for vout, txout in enumerate(tx.outputs):
+            self.utxos[(txid, vout)] = {'address': txout.address, 'amount': txout.amount,
+                                        'script_pubkey': txout.script_pubkey.hex(), 'height': None}
+        self.transactions[txid] = {'hex': raw_tx_hex, 'height': None}
+        self.mempool.append(txid)
+        return txid
+
+    # RPC methods, named as on the node
+
+    def getblockcount(self):
+        return self.height
+
+    def getblockhash(self, height):
+        if not 0 <= height <= self.height:
+            raise RPCError(RPC_INVALID_PARAMETER, "Block height out of range")
+        return self.block_hash(height)
+
+    def getblock(self, block_hash, verbose=True):
+        height = self.height_of(block_hash)
+        return {
+            'hash': block_hash,
+            'confirmations': self.confirmations(height),
+            'height': height,
+            'version': 6422788,
+            'time': int(time.time()) - (self.height - height) * 60,
+            'previousblockhash': self.block_hash(height - 1) if height else None,
+            'tx': self.block_txids(height),
+        }
+
+    def getrawmempool(self, verbose=False):
+        return list(self.mempool)
+
+    def listsinceblock(self, block_hash=None, target_confirmations=1, include_watchonly=False):
+        since = self.height_of(block_hash) if block_hash else -1
+        entries = []
+        for txid, tx in self.transactions.items():
+            if tx['height'] is None or tx['height'] > since:
+                entry = {'txid': txid, 'category': 'send', 'confirmations': self.confirmations(tx['height'])}
+                if tx['height'] is not None:
+                    entry['blockhash'] = self.block_hash(tx['height'])
+                    entry['blockheight'] = tx['height']
+                entries.append(entry)
+        return {'transactions': entries, 'lastblock': self.block_hash(self.height)}
+
+    def listunspent(self, minconf=1, maxconf=9999999, addresses=None):
+        result = []
+        for (txid, vout), utxo in self.utxos.items():
+            if addresses is not None:
+                if utxo['address'] not in addresses:
+                    continue
+            elif utxo['address'] not in self.wallet:
+                continue
+            confirmations = self.confirmations(utxo['height'])
+            if minconf <= confirmations <= maxconf:
+                result.append({
+                    'txid': txid,
+                    'vout': vout,
+                    'address': utxo['address'],
+                    'scriptPubKey': utxo['script_pubkey'],
+                    'amount': to_doge(utxo['amount']),
+                    'confirmations': confirmations,
+                    'spendable': self.wallet.get(utxo['address']) is not None,
+                })
+        return result
+
+    def validateaddress(self, address):
+        # The synthetic chain only knows P2PKH
+        if not is_p2pkh_address(address):
+            return {'isvalid': False}
+        return {
+            'isvalid': True,
+            'address': address,
+            'scriptPubKey': create_script_pubkey(address).hex(),
+            'ismine': self.wallet.get(address) is not None,
+            'iswatchonly': address in self.wallet and self.wallet[address] is None,
+        }
+
+    def importaddress(self, address, label='', rescan=True):
+        self.wallet.setdefault(address, None)
+        return None
+
+    def getnewaddress(self, label=''):
+        return self.new_address()
+
+    def dumpprivkey(self, address):
+        wif = self.wallet.get(address)
+        if wif is None:
+            raise RPCError(-4, f"Private key for address {address} is not known")
+        return wif
+
+    def estimatesmartfee(self, conf_target, estimate_mode='CONSERVATIVE'):
+        return {'feerate': Decimal('0.01'), 'blocks': conf_target}
+
+    def sendrawtransaction(self, raw_tx_hex, allow_high_fees=False):
+        return self.send_raw_transaction(raw_tx_hex)
+
+    def getrawtransaction(self, txid, verbose=False):
+        tx = self.transactions.get(txid)
+        if tx is None or not tx['hex']:
+            raise RPCError(RPC_INVALID_ADDRESS_OR_KEY, "No such mempool or blockchain transaction")
+        return tx['hex']
+
+    def gettransaction(self, txid, include_watchonly=False):
+        tx = self.transactions.get(txid)
+        if tx is None:
+            raise RPCError(RPC_INVALID_ADDRESS_OR_KEY, "Invalid or non-wallet transaction id")
+        result = {'txid': txid, 'confirmations': self.confirmations(tx['height']), 'hex': tx['hex']}
+        if tx['height'] is not None:
+            result['blockhash'] = self.block_hash(tx['height'])
+        return result
+
+RPC_METHODS = (
+    'getblockcount', 'getblockhash', 'getblock', 'getrawmempool', 'listsinceblock',
+    'listunspent', 'validateaddress', 'importaddress', 'dumpprivkey', 'estimatesmartfee',
+    'sendrawtransaction', 'getrawtransaction', 'gettransaction', 'getnewaddress',
+)
+
+class FaultInjector:
+    """Latency, jitter and failures applied to every request."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, http_error_rate=0.0,
+                 hang_rate=0.0, hang_seconds=60, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Return (delay seconds, fault) with fault one of None, 'rpc', 'http', 'hang'."""
+        with self._lock:
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            roll = self._rng.random()
+        if roll < self.hang_rate:
+            return self.hang_seconds, 'hang'
+        roll -= self.hang_rate
+        if roll < self.http_error_rate:
+            return delay, 'http'
+        roll -= self.http_error_rate
+        if roll < self.error_rate:
+            return delay, 'rpc'
+        return delay, None
+
+class JSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Decimal):
+            # Amounts go out as JSON numbers with 8 decimals, like the node sends them
+            return float(o)
+        return super().default(o)
+
+class MockRPCHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body go out in separate writes; without this Nagle holds the body for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        if server.credentials and self.headers.get('Authorization') != server.credentials:
+            self.send_response(401)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        delay, fault = server.faults.draw()
+        if delay:
+            time.sleep(delay)
+        server.count_request()
+        if fault == 'http':
+            self._reply(500, b'Internal Server Error', 'text/plain')
+            return
+        if fault == 'hang':
+            return
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._reply(500, json.dumps({'result': None, 'error': {'code': -32700, 'message': 'Parse error'}, 'id': None}).encode('utf-8'))
+            return
+
+        if isinstance(request, list):
+            response = [self._call(item, fault) for item in request]
+            status = 200
+        else:
+            response = self._call(request, fault)
+            status = 500 if response['error'] else 200
+        self._reply(status, json.dumps(response, cls=JSONEncoder).encode('utf-8'))
+
+    def _call(self, request, fault):
+        request_id = request.get('id')
+        method = request.get('method')
+        try:
+            if fault == 'rpc':
+                raise RPCError(RPC_MISC_ERROR, "Injected failure")
+            if method not in RPC_METHODS:
+                raise RPCError(RPC_METHOD_NOT_FOUND, "Method not found")
+            chain = self.server.chain
+            with chain.lock:
+                chain.advance()
+                result = getattr(chain, method)(*request.get('params', []))
+            return {'result': result, 'error': None, 'id': request_id}
+        except RPCError as e:
+            return {'result': None, 'error': {'code': e.code, 'message': e.message}, 'id': request_id}
+        except TypeError as e:
+            return {'result': None, 'error': {'code': RPC_MISC_ERROR, 'message': str(e)}, 'id': request_id}
+
+    def _reply(self, status, payload, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class MockRPCServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, chain, faults=None, rpc_user=None, rpc_password=None):
+        super().__init__(address, MockRPCHandler)
+        self.chain = chain
+        self.faults = faults or FaultInjector()
+        self.credentials = None
+        if rpc_user is not None:
+            token = base64.b64encode(f"{rpc_user}:{rpc_password}".encode('utf-8')).decode('ascii')
+            self.credentials = f"Basic {token}"
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://user:pass@{host}:{port}"
+
+def start_mock_server(chain=None, faults=None, host='127.0.0.1', port=0, **kwargs):
+    """Start a server on a background thread and return it; port=0 picks a free port."""
+    server = MockRPCServer((host, port), chain or MockChain(), faults, **kwargs)
+    threading.Thread(target=server.serve_forever, name="mock-rpc-server", daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Dogecoin RPC server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=22555)
+    parser.add_argument('--rpcuser')
+    parser.add_argument('--rpcpassword')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start-height', type=int, default=5000000)
+    parser.add_argument('--block-interval', type=float, default=60, help="seconds per block, 0 to never mine")
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help="fraction of calls answered with an RPC error")
+    parser.add_argument('--http-error-rate', type=float, default=0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--hang-rate', type=float, default=0, help="fraction of requests that never get an answer")
+    parser.add_argument('--wallet-addresses', type=int, default=2, help="spendable wallet addresses to create")
+    parser.add_argument('--fund-amount', type=float, default=1000, help="DOGE per funded output")
+    parser.add_argument('--fund-outputs', type=int, default=5, help="outputs funded per wallet address")
+    parser.add_argument('--pool-address', help="watch-only pool address to fund as well")
+    args = parser.parse_args()
+
+    chain = MockChain(args.seed, args.start_height, args.block_interval)
+    amount = int(Decimal(str(args.fund_amount)) * Decimal('1e8'))
+    for _ in range(args.wallet_addresses):
+        address = chain.new_address()
+        chain.fund(address, amount, args.fund_outputs)
+        print(f"Wallet address {address}: {args.fund_outputs} x {args.fund_amount} DOGE")
+    if args.pool_address:
+        chain.importaddress(args.pool_address)
+        chain.fund(args.pool_address, amount, args.fund_outputs)
+        print(f"Pool address {args.pool_address}: {args.fund_outputs} x {args.fund_amount} DOGE")
+
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.http_error_rate, args.hang_rate, seed=args.seed)
+    server = MockRPCServer((args.host, args.port), chain, faults, args.rpcuser, args.rpcpassword)
+    print(f"Mock Dogecoin RPC listening on {args.host}:{args.port}, height {chain.height}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,163 @@
+"""
+monte_carlo.py
+
+Monte Carlo sizing of the player pool.
+
+Each run plays players * spins_per_player spins against a pool that starts at --pool DOGE:
+the pool takes every bet and pays every win, with spins drawn from the installed reel
+tables and paid by the real calculate_win rules (through reel_math's payout tensor).
+Runs are split into batches over a multiprocessing pool; every batch draws from its own
+child of one SeedSequence, so results only depend on --seed. Batches are consumed in order
+and the simulation stops as soon as the risk-of-ruin confidence interval is narrower than
+--ci, or after --max-runs.
+
+    python monte_carlo.py --pool 50000 --players 20 --spins 500 --bet-mix 3:0.5,6:0.3,9:0.2
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import reel_math
+
+CHECKPOINTS = 10  # points along each run where the pool balance is sampled
+DRAWDOWN_PERCENTILES = (50, 90, 99, 99.9)
+Z_95 = 1.959964
+
+# Per-process simulation tables, set by _init_worker
+_tables = {}
+
+def parse_bet_mix(text):
+    """'3:0.5,6:0.3,9:0.2' -> probabilities aligned with reel_math.BET_LEVELS."""
+    mix = np.zeros(len(reel_math.BET_LEVELS))
+    for part in text.split(','):
+        bet, weight = part.split(':')
+        mix[reel_math.BET_LEVELS.index(int(bet))] = float(weight)
+    if mix.sum() <= 0:
+        raise ValueError("Bet mix must have a positive weight")
+    return mix / mix.sum()
+
+def _init_worker(cumulative, payouts):
+    _tables['cumulative'] = cumulative
+    _tables['payouts'] = payouts
+
+def simulate_batch(seed, runs, total_spins, pool, bet_mix, checkpoints=CHECKPOINTS):
+    """
+    Play `runs` independent runs of total_spins spins.
+    Returns (ruined, drawdowns, final balances, balances at checkpoints).
+    """
+    rng = np.random.default_rng(seed)
+    cumulative = _tables['cumulative']
+    payouts = _tables['payouts']
+    bets = np.array(reel_math.BET_LEVELS, dtype=np.int64)
+    sample_at = np.linspace(0, total_spins, checkpoints + 1, dtype=np.int64)[1:] - 1
+
+    ruined = np.zeros(runs, dtype=bool)
+    drawdowns = np.empty(runs)
+    finals = np.empty(runs)
+    trajectories = np.empty((runs, checkpoints))
+    for run in range(runs):
+        combos = np.searchsorted(cumulative, rng.random(total_spins), side='right')
+        np.minimum(combos, len(cumulative) - 1, out=combos)
+        bet_levels = rng.choice(len(bets), size=total_spins, p=bet_mix)
+        balance = pool + np.cumsum(bets[bet_levels] - payouts[bet_levels, combos])
+
+        ruined[run] = balance.min() < 0
+        peak = np.maximum(np.maximum.accumulate(balance), pool)
+        drawdowns[run] = (peak - balance).max()
+        finals[run] = balance[-1]
+        trajectories[run] = balance[sample_at]
+    return ruined, drawdowns, finals, trajectories
+
+def wilson_interval(successes, trials, z=Z_95):
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+def simulate(pool, players, spins_per_player, bet_mix, counts=None, workers=None,
+             batch_runs=50, max_runs=20000, min_runs=200, ci_width=0.01, seed=0):
+    """Run batches until the 95% risk-of-ruin interval is narrower than ci_width. Returns a results dict."""
+    if counts is None:
+        counts = reel_math.load_reel_counts()
+    cumulative = np.cumsum(reel_math.combo_distribution(counts))
+    payouts = reel_math.payout_tensor().reshape(len(reel_math.BET_LEVELS), -1)
+    total_spins = players * spins_per_player
+    workers = workers or os.cpu_count() or 1
+
+    max_batches = math.ceil(max_runs / batch_runs)
+    seeds = np.random.SeedSequence(seed).spawn(max_batches)
+    tasks = ((child, batch_runs, total_spins, pool, bet_mix) for child in seeds)
+
+    ruined, drawdowns, finals, trajectories = [], [], [], []
+    ruin_count = 0
+    runs = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(cumulative, payouts)) as process_pool:
+        # imap keeps batch order, so where the simulation stops only depends on the seed
+        for batch in process_pool.imap(_simulate_task, tasks):
+            ruined.append(batch[0])
+            drawdowns.append(batch[1])
+            finals.append(batch[2])
+            trajectories.append(batch[3])
+            ruin_count += int(batch[0].sum())
+            runs += len(batch[0])
+
+            low, high = wilson_interval(ruin_count, runs)
+            if runs >= min_runs and high - low <= ci_width:
+                break
+        process_pool.terminate()
+
+    drawdowns = np.concatenate(drawdowns)
+    finals = np.concatenate(finals)
+    trajectories = np.concatenate(trajectories)
+    low, high = wilson_interval(ruin_count, runs)
+    return {
+        'runs': runs,
+        'total_spins': total_spins,
+        'risk_of_ruin': ruin_count / runs,
+        'risk_of_ruin_ci': (low, high),
+        'drawdown_percentiles': {p: float(np.percentile(drawdowns, p)) for p in DRAWDOWN_PERCENTILES},
+        'final_percentiles': {p: float(np.percentile(finals, p)) for p in (1, 10, 50, 90, 99)},
+        'trajectory_percentiles': {p: np.percentile(trajectories, p, axis=0) for p in (1, 10, 50, 90, 99)},
+    }
+
+def _simulate_task(task):
+    return simulate_batch(*task)
+
+def print_results(results, pool):
+    low, high = results['risk_of_ruin_ci']
+    print(f"{results['runs']} runs of {results['total_spins']} spins against a {pool} DOGE pool")
+    print(f"Risk of ruin: {results['risk_of_ruin']:.4f} (95% CI {low:.4f} - {high:.4f})")
+    print("Drawdown percentiles (DOGE): " + ', '.join(f"p{p}: {value:.0f}" for p, value in results['drawdown_percentiles'].items()))
+    print("Final pool percentiles (DOGE): " + ', '.join(f"p{p}: {value:.0f}" for p, value in results['final_percentiles'].items()))
+    print("Pool balance along the run (percentiles at each tenth):")
+    for p, values in results['trajectory_percentiles'].items():
+        print(f"  p{p:<3} " + ' '.join(f"{value:9.0f}" for value in values))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Player pool risk-of-ruin simulator")
+    parser.add_argument('--pool', type=float, required=True, help="starting pool balance in DOGE")
+    parser.add_argument('--players', type=int, default=10)
+    parser.add_argument('--spins', type=int, default=500, help="spins per player")
+    parser.add_argument('--bet-mix', default='3:1,6:1,9:1', help="bet:weight pairs")
+    parser.add_argument('--workers', type=int, default=0, help="processes (default: all cores)")
+    parser.add_argument('--batch-runs', type=int, default=50)
+    parser.add_argument('--max-runs', type=int, default=20000)
+    parser.add_argument('--ci', type=float, default=0.01, help="stop once the 95%% CI of the risk of ruin is this wide")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = simulate(args.pool, args.players, args.spins, parse_bet_mix(args.bet_mix),
+                       workers=args.workers or None, batch_runs=args.batch_runs,
+                       max_runs=args.max_runs, ci_width=args.ci, seed=args.seed)
+    print_results(results, args.pool)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {results['runs'] * results['total_spins'] / elapsed:.0f} spins/s")
@@ -0,0 +1,196 @@
+"""
+payout_queue.py
+
+Batches cash-outs from the shared pool address into multi-output transactions.
+
+Pending cash-outs are collected until max_batch_size requests are waiting or the oldest
+has waited max_wait_seconds. They are then paid by one transaction with a single change output,
+and every request in the batch resolves to that transaction's txid. Dev fees are accrued in
+dev_fee_ledger.py rather than paid with the batch. If the transaction was signed but the broadcast
+raised, the node may still have it: the requests fail with PayoutUnconfirmed carrying the txid,
+and the caller must ask the node before it treats the payout as failed.
+"""
+
+from concurrent.futures import Future
+import configparser
+import threading
+import time
+
+from bitcoinrpc.authproxy import JSONRPCException
+
+import cashOut
+from tx_codec import is_p2pkh_address
+
+# Load queue settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+MAX_BATCH_SIZE = config.getint('payoutqueue', 'max_batch_size', fallback=20)
+MAX_WAIT_SECONDS = config.getfloat('payoutqueue', 'max_wait_seconds', fallback=30.0)
+
+class PayoutError(Exception):
+    pass
+
+class PayoutUnconfirmed(PayoutError):
+    """The payout transaction txid was signed, but whether it reached the node is unknown."""
+
+    def __init__(self, txid, cause):
+        super().__init__(f"Broadcast of {txid} failed, check the txid: {cause}")
+        self.txid = txid
+
+class PayoutRequest:
+    __slots__ = ('address', 'amount_satoshis', 'win_differential_satoshis', 'future', 'submitted_at')
+
+    def __init__(self, address, amount_satoshis, win_differential_satoshis):
+        self.address = address
+        self.amount_satoshis = amount_satoshis
+        self.win_differential_satoshis = win_differential_satoshis
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+def build_payouts(batch):
+    """Merge a batch of requests into (address, amount_satoshis) outputs, one per address."""
+    payouts = {}
+    for request in batch:
+        payouts[request.address] = payouts.get(request.address, 0) + request.amount_satoshis
+    return list(payouts.items())
+
+class PayoutQueue:
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_SECONDS, send_payouts=cashOut.send_payouts):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.send_payouts = send_payouts
+        self._pending = []
+        self._in_flight_total = 0
+        self._flush_requested = False
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="payout-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush=True):
+        """Stop the queue, paying out (or failing) whatever is still pending."""
+        with self._condition:
+            self._running = False
+            if not flush:
+                for request in self._pending:
+                    request.future.set_exception(PayoutError("Payout queue stopped"))
+                self._pending = []
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, to_address, amount_doge, win_differential=0):
+        """Queue a cash-out. The returned future resolves to the shared txid."""
+        if not is_p2pkh_address(to_address):
+            raise PayoutError(f"Invalid payout address: {to_address!r}")
+        request = PayoutRequest(to_address, int(amount_doge * 1e8), int(win_differential * 1e8))
+        with self._condition:
+            if not self._running:
+                raise PayoutError("Payout queue is not running")
+            self._pending.append(request)
+            self._condition.notify_all()
+        return request.future
+
+    def flush(self):
+        """Send the pending requests now instead of waiting for the window to close."""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def pending_total(self):
+        """Satoshis still owed by queued or in-flight payouts."""
+        with self._condition:
+            queued = sum(amount for _, amount in build_payouts(self._pending))
+            return queued + self._in_flight_total
+
+    def _batch_ready(self):
+        if not self._pending:
+            return False
+        if self._flush_requested or not self._running or len(self._pending) >= self.max_batch_size:
+            return True
+        return time.monotonic() - self._pending[0].submitted_at >= self.max_wait
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._batch_ready():
+                    if not self._running:
+                        return
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self.max_wait - (time.monotonic() - self._pending[0].submitted_at))
+                    self._condition.wait(timeout)
+
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                if not self._pending:
+                    self._flush_requested = False
+                payouts = build_payouts(batch)
+                self._in_flight_total = sum(amount for _, amount in payouts)
+
+            self._send_batch(batch)
+
+            with self._condition:
+                self._in_flight_total = 0
+
+    def _send_batch(self, batch):
+        # One bad request must not fail everyone else's payout
+        for request in batch:
+            if not is_p2pkh_address(request.address) or request.amount_satoshis <= 0:
+                request.future.set_exception(PayoutError(f"Invalid payout to {request.address!r}"))
+        batch = [request for request in batch if not request.future.done()]
+        if not batch:
+            return
+        payouts = build_payouts(batch)
+        print(f"Sending {len(batch)} payouts in one transaction ({len(payouts)} outputs)")
+        signed = []
+        try:
+            txid = self.send_payouts(payouts, on_signed=lambda tx: signed.append(tx.txid()))
+        except Exception as e:
+            print(f"Batched payout failed: {e}")
+            txid = None
+            # A node's rejection is final; anything else after signing may have been broadcast
+            error = PayoutUnconfirmed(signed[-1], e) if signed and not isinstance(e, JSONRPCException) else e
+        else:
+            error = PayoutError("Transaction broadcast failed")
+
+        for request in batch:
+            if txid:
+                request.future.set_result(txid)
+            else:
+                request.future.set_exception(error)
+        if not txid:
+            return
+
+        # The payouts are broadcast; a ledger problem must not stop the queue or the waiting sessions
+        for request in batch:
+            try:
+                cashOut.accrue_dev_fees(request.win_differential_satoshis, txid)
+            except Exception as e:
+                print(f"Dev fee accrual failed for payout {txid}: {e}")
+
+# Example usage
+if __name__ == "__main__":
+    queue = PayoutQueue(max_batch_size=3, max_wait=5.0)
+    queue.start()
+    futures = [queue.submit("<recipient_address>", 10, 2), queue.submit("<recipient_address_2>", 5, -5)]
+    queue.flush()
+    for future in futures:
+        try:
+            print(f"TXID: {future.result()}")
+        except PayoutError as e:
+            print(f"Payout failed: {e}")
+    queue.stop()
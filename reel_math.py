@@ -0,0 +1,140 @@
+"""
+reel_math.py
+
+Exact odds of the slot from its reel tables.
+
+Every reel byte (00-ff) is equally likely, so an icon's probability on a reel is the number
+of bytes mapped to it divided by 256. The payout of all 9^5 icon combinations is tabulated
+once per bet level by running the real win_calculator.calculate_win, after which RTP, hit
+frequency and variance for any set of reel weights are a few small tensor contractions.
+"""
+
+import contextlib
+import functools
+import io
+import os
+
+import numpy as np
+
+from five_reel_value_gen import REEL_MAPS, icon_index
+import win_calculator
+
+NUM_REELS = 5
+NUM_ICONS = 9
+REEL_SIZE = 256
+BET_LEVELS = (3, 6, 9)
+REELS_DIR = 'reels'
+
+def icon_name(index):
+    return f"reel_icon_{index}.png"
+
+def reel_conf_path(reel_number, directory=REELS_DIR):
+    return os.path.join(directory, f"reel{reel_number}_icon_mapping.conf")
+
+def load_reel_counts(directory=REELS_DIR):
+    """
+    Icon counts per reel as a (5, 9) int array, column i being reel_icon_(i+1).
+    Reads reels/reelN_icon_mapping.conf, or the game's REEL_MAPS for reels without a file.
+    """
+    counts = np.zeros((NUM_REELS, NUM_ICONS), dtype=np.int64)
+    for reel in range(NUM_REELS):
+        path = reel_conf_path(reel + 1, directory)
+        if os.path.exists(path):
+            with open(path) as file:
+                icons = [line.strip().split('=', 1)[1] for line in file if '=' in line]
+        else:
+            icons = list(REEL_MAPS[reel + 1].values())
+        for icon in icons:
+            counts[reel, icon_index(icon) - 1] += 1
+    return counts
+
+def reel_probabilities(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+@functools.lru_cache(maxsize=None)
+def payout_tensor():
+    """
+    Win in credits for every combination and bet level, shape (3, 9, 9, 9, 9, 9).
+    Axis 0 follows BET_LEVELS, the others are the icon index (0-8) on reels 1-5.
+    """
+    tensor = np.zeros((len(BET_LEVELS),) + (NUM_ICONS,) * NUM_REELS, dtype=np.int64)
+    # calculate_win prints every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        for combo in np.ndindex(*(NUM_ICONS,) * NUM_REELS):
+            results = [icon_name(i + 1) for i in combo]
+            for b, bet in enumerate(BET_LEVELS):
+                tensor[(b,) + combo] = win_calculator.calculate_win(results, bet, 0)[0]
+    tensor.setflags(write=False)
+    return tensor
+
+def contract(tensor, probabilities):
+    """Expectation of a (..., 9, 9, 9, 9, 9) tensor over independent reels."""
+    leading = tensor.shape[:-NUM_REELS]
+    result = tensor.reshape(-1, NUM_ICONS)
+    for reel in reversed(range(NUM_REELS)):
+        result = (result @ probabilities[reel]).reshape(-1, NUM_ICONS)
+    return result.reshape(leading)
+
+def evaluate(probabilities, tensor=None):
+    """
+    Exact (rtp, hit_frequency, std) arrays, one value per bet level, for (5, 9) reel probabilities.
+    std is of the win per spin in units of the bet.
+    """
+    if tensor is None:
+        tensor = evaluation_tensor()
+    rtp, second_moment, hit_frequency = contract(tensor, probabilities)
+    return rtp, hit_frequency, np.sqrt(np.maximum(second_moment - rtp ** 2, 0))
+
+@functools.lru_cache(maxsize=None)
+def evaluation_tensor():
+    """
+    Payouts per unit bet, their squares and the hit indicator stacked into one
+    (3, 3, 9, 9, 9, 9, 9) float tensor, so evaluate() is a single contraction.
+    """
+    tensor = payout_tensor()
+    bets = np.array(BET_LEVELS, dtype=np.float64).reshape((-1,) + (1,) * NUM_REELS)
+    returns = tensor / bets
+    stacked = np.ascontiguousarray(np.stack([returns, returns ** 2, (tensor > 0).astype(np.float64)]))
+    stacked.setflags(write=False)
+    return stacked
+
+def theoretical_stats(counts=None):
+    """{bet: {'rtp', 'hit_frequency', 'std'}} for the given reel counts (default: the installed reels)."""
+    if counts is None:
+        counts = load_reel_counts()
+    rtp, hit_frequency, std = evaluate(reel_probabilities(counts))
+    return {
+        bet: {'rtp': float(rtp[b]), 'hit_frequency': float(hit_frequency[b]), 'std': float(std[b])}
+        for b, bet in enumerate(BET_LEVELS)
+    }
+
+def combo_distribution(counts=None):
+    """Probability of each of the 9^5 combinations, flattened in payout_tensor() order."""
+    if counts is None:
+        counts = load_reel_counts()
+    probabilities = reel_probabilities(counts)
+    result = probabilities[0]
+    for reel in range(1, NUM_REELS):
+        result = np.multiply.outer(result, probabilities[reel])
+    return result.ravel()
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    payout_tensor()
+    print(f"Tabulated payouts in {time.perf_counter() - start:.2f} s")
+
+    counts = load_reel_counts()
+    for bet, stats in theoretical_stats(counts).items():
+        print(f"Bet {bet}: RTP {stats['rtp']:.4f}, hit frequency {stats['hit_frequency']:.4f}, std {stats['std']:.2f}x bet")
+
+    probabilities = reel_probabilities(counts)
+    tensor = evaluation_tensor()
+    runs = 2000
+    start = time.perf_counter()
+    for _ in range(runs):
+        evaluate(probabilities, tensor)
+    elapsed = time.perf_counter() - start
+    print(f"evaluate(): {elapsed / runs * 1e6:.0f} us per candidate")
@@ -0,0 +1,193 @@
+"""
+reel_optimizer.py
+
+Search the per-reel icon counts for a target RTP, hit frequency and, optionally, volatility
+(standard deviation of the win per spin) at each bet level.
+
+A candidate moves `step` of a reel's 256 bytes from one icon to another. Every statistic is
+linear in a single reel's probabilities once the other four reels are fixed, so after each
+accepted move the payout tensor is contracted down to one small matrix per reel and all
+moves of all reels are scored with a single matrix product. The search is steepest descent
+with shrinking steps and seeded random restarts. The best counts are written as
+reelN_icon_mapping.conf files, in the format of reels/, together with a report.
+
+    python reel_optimizer.py --rtp 3:0.92,6:0.94,9:0.96 --hit-frequency 0.55 --std 4 --output reels_optimized
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import reel_math
+
+STEPS = (16, 8, 4, 2, 1)
+# Differences of this size count as one unit of loss
+RTP_TOLERANCE = 0.001
+HIT_TOLERANCE = 0.005
+STD_TOLERANCE = 0.05
+
+def parse_targets(text):
+    """'0.95' or '3:0.92,6:0.94,9:0.96' -> array aligned with reel_math.BET_LEVELS."""
+    if ':' not in text:
+        return np.full(len(reel_math.BET_LEVELS), float(text))
+    targets = np.full(len(reel_math.BET_LEVELS), np.nan)
+    for part in text.split(','):
+        bet, value = part.split(':')
+        targets[reel_math.BET_LEVELS.index(int(bet))] = float(value)
+    if np.isnan(targets).any():
+        raise ValueError("Give a target for every bet level: " + ', '.join(map(str, reel_math.BET_LEVELS)))
+    return targets
+
+def reel_marginal(tensor, probabilities, reel):
+    """Contract every reel but `reel`: (..., 9, 9, 9, 9, 9) -> (..., 9), linear in that reel's probabilities."""
+    lead = tensor.ndim - reel_math.NUM_REELS
+    result = tensor
+    for other in reversed(range(reel + 1, reel_math.NUM_REELS)):
+        result = result @ probabilities[other]
+    for other in reversed(range(reel)):
+        result = np.tensordot(result, probabilities[other], axes=([lead + other], [0]))
+    return result
+
+def candidate_moves():
+    """All (from_icon, to_icon) pairs as two index arrays."""
+    pairs = [(i, j) for i in range(reel_math.NUM_ICONS) for j in range(reel_math.NUM_ICONS) if i != j]
+    return np.array([i for i, _ in pairs]), np.array([j for _, j in pairs])
+
+class ReelOptimizer:
+    def __init__(self, target_rtp, target_hit_frequency, target_std=None, min_count=1,
+                 rtp_tolerance=RTP_TOLERANCE, hit_tolerance=HIT_TOLERANCE, std_tolerance=STD_TOLERANCE):
+        self.target_rtp = np.asarray(target_rtp, dtype=np.float64)
+        self.target_hit_frequency = np.asarray(target_hit_frequency, dtype=np.float64)
+        self.target_std = None if target_std is None else np.asarray(target_std, dtype=np.float64)
+        self.min_count = min_count
+        self.rtp_tolerance = rtp_tolerance
+        self.hit_tolerance = hit_tolerance
+        self.std_tolerance = std_tolerance
+        self.tensor = reel_math.evaluation_tensor()
+        self.move_from, self.move_to = candidate_moves()
+        self.evaluated = 0
+
+    def loss(self, rtp, second_moment, hit_frequency):
+        """Sum over bet levels of squared, tolerance-scaled misses; works on (bets, ...) arrays."""
+        shape = (-1,) + (1,) * (np.ndim(rtp) - 1)
+        rtp_miss = (rtp - self.target_rtp.reshape(shape)) / self.rtp_tolerance
+        hit_miss = (hit_frequency - self.target_hit_frequency.reshape(shape)) / self.hit_tolerance
+        total = rtp_miss ** 2 + hit_miss ** 2
+        if self.target_std is not None:
+            std = np.sqrt(np.maximum(second_moment - rtp ** 2, 0))
+            total = total + ((std - self.target_std.reshape(shape)) / self.std_tolerance) ** 2
+        return total.sum(axis=0)
+
+    def evaluate(self, counts):
+        self.evaluated += 1
+        return float(self.loss(*reel_math.contract(self.tensor, reel_math.reel_probabilities(counts))))
+
+    def best_move(self, counts, step):
+        """Return (loss, reel, from_icon, to_icon) of the best move of `step` bytes, or None if none is legal."""
+        probabilities = reel_math.reel_probabilities(counts)
+        best = None
+        for reel in range(reel_math.NUM_REELS):
+            marginal = reel_marginal(self.tensor, probabilities, reel)  # (3 stats, bets, 9)
+            legal = counts[reel, self.move_from] - step >= self.min_count
+            if not legal.any():
+                continue
+            move_from, move_to = self.move_from[legal], self.move_to[legal]
+            # Candidate probabilities for this reel, one row per move
+            candidates = np.repeat(probabilities[reel][np.newaxis, :], len(move_from), axis=0)
+            rows = np.arange(len(move_from))
+            candidates[rows, move_from] -= step / reel_math.REEL_SIZE
+            candidates[rows, move_to] += step / reel_math.REEL_SIZE
+            stats = marginal @ candidates.T  # (3 stats, bets, moves)
+            losses = self.loss(*stats)
+            self.evaluated += len(losses)
+            index = int(np.argmin(losses))
+            if best is None or losses[index] < best[0]:
+                best = (float(losses[index]), reel, int(move_from[index]), int(move_to[index]))
+        return best
+
+    def descend(self, counts):
+        counts = counts.copy()
+        loss = self.evaluate(counts)
+        for step in STEPS:
+            while True:
+                move = self.best_move(counts, step)
+                if move is None or move[0] >= loss:
+                    break
+                loss, reel, move_from, move_to = move
+                counts[reel, move_from] -= step
+                counts[reel, move_to] += step
+        return counts, loss
+
+    def perturb(self, counts, rng, moves=20, step=8):
+        counts = counts.copy()
+        for _ in range(moves):
+            reel = rng.integers(reel_math.NUM_REELS)
+            move_from, move_to = rng.choice(reel_math.NUM_ICONS, size=2, replace=False)
+            if counts[reel, move_from] - step >= self.min_count:
+                counts[reel, move_from] -= step
+                counts[reel, move_to] += step
+        return counts
+
+    def optimize(self, counts, restarts=10, seed=0):
+        """Descend from counts, then from `restarts` random perturbations of the best so far."""
+        rng = np.random.default_rng(seed)
+        best_counts, best_loss = self.descend(np.asarray(counts, dtype=np.int64))
+        for _ in range(restarts):
+            candidate, loss = self.descend(self.perturb(best_counts, rng))
+            if loss < best_loss:
+                best_counts, best_loss = candidate, loss
+        return best_counts, best_loss
+
+def write_reel_confs(counts, directory):
+    """Write reel1..5_icon_mapping.conf: bytes 00-ff mapped to icons in contiguous blocks, icon 1 first."""
+    os.makedirs(directory, exist_ok=True)
+    for reel in range(reel_math.NUM_REELS):
+        icons = [reel_math.icon_name(icon + 1) for icon in range(reel_math.NUM_ICONS) for _ in range(counts[reel, icon])]
+        lines = [f"{value:02x}={icon}" for value, icon in enumerate(icons)]
+        with open(reel_math.reel_conf_path(reel + 1, directory), 'w', newline='') as file:
+            file.write('\r\n'.join(lines))
+
+def format_report(original, optimized, optimizer, elapsed):
+    lines = []
+    for name, counts in (("Current", original), ("Optimized", optimized)):
+        rtp, hit_frequency, std = reel_math.evaluate(reel_math.reel_probabilities(counts), optimizer.tensor)
+        lines.append(f"{name} reels:")
+        for b, bet in enumerate(reel_math.BET_LEVELS):
+            std_target = f" (target {optimizer.target_std[b]:.2f})" if optimizer.target_std is not None else ""
+            lines.append(f"  bet {bet}: RTP {rtp[b]:.4f} (target {optimizer.target_rtp[b]:.4f}), "
+                         f"hit frequency {hit_frequency[b]:.4f} (target {optimizer.target_hit_frequency[b]:.4f}), "
+                         f"std {std[b]:.2f}x bet{std_target}")
+        lines.append("  icon counts  " + ' '.join(f"{i + 1:>4}" for i in range(reel_math.NUM_ICONS)))
+        for reel in range(reel_math.NUM_REELS):
+            lines.append(f"  reel {reel + 1}       " + ' '.join(f"{count:>4}" for count in counts[reel]))
+    lines.append(f"Evaluated {optimizer.evaluated} candidates in {elapsed:.2f} s "
+                 f"({optimizer.evaluated / elapsed:.0f} per second)")
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reel weight optimizer")
+    parser.add_argument('--rtp', required=True, help="target RTP, one value or bet:value pairs")
+    parser.add_argument('--hit-frequency', required=True, help="target hit frequency, one value or bet:value pairs")
+    parser.add_argument('--std', help="target standard deviation of the win per spin in bets, one value or bet:value pairs")
+    parser.add_argument('--reels', default=reel_math.REELS_DIR, help="directory with the starting reel tables")
+    parser.add_argument('--output', default='reels_optimized')
+    parser.add_argument('--min-count', type=int, default=1, help="fewest bytes any icon keeps on a reel")
+    parser.add_argument('--restarts', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    original = reel_math.load_reel_counts(args.reels)
+    optimizer = ReelOptimizer(parse_targets(args.rtp), parse_targets(args.hit_frequency),
+                              parse_targets(args.std) if args.std else None, args.min_count)
+    start = time.perf_counter()
+    optimized, loss = optimizer.optimize(original, args.restarts, args.seed)
+    elapsed = time.perf_counter() - start
+
+    write_reel_confs(optimized, args.output)
+    report = format_report(original, optimized, optimizer, elapsed)
+    with open(os.path.join(args.output, 'report.txt'), 'w') as file:
+        file.write(report + '\n')
+    print(report)
+    print(f"Wrote {args.output}/reel1-5_icon_mapping.conf and report.txt")
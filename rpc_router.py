@@ -0,0 +1,288 @@
+"""
+rpc_router.py
+
+Routes RPC calls across several Dogecoin nodes with health checks, timeouts and failover.
+
+The node from [rpcconfig] is the primary. It holds the wallet, so wallet and signing calls
+are always pinned to it. Read-only chain calls (getblock*, listunspent, ...) go to the fastest
+healthy node among the primary and the [rpcrouter] read_endpoints. A background thread polls
+every node's tip height and latency; a node more than max_lag_blocks behind the best tip, or
+failing, is skipped until it recovers. Every call has a timeout. A read that has not answered
+after hedge_after_ms is sent to the next node as well and the first answer wins; a read that
+fails moves on to the next node at once.
+
+Listing read_endpoints only makes sense for nodes that watch the same addresses, since
+listunspent is answered by them too.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+import configparser
+import threading
+import time
+
+from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
+
+# Load router settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+READ_ENDPOINTS = [url.strip() for url in config.get('rpcrouter', 'read_endpoints', fallback='').split(',') if url.strip()]
+HEALTH_INTERVAL_SECONDS = config.getfloat('rpcrouter', 'health_interval_seconds', fallback=10)
+MAX_LAG_BLOCKS = config.getint('rpcrouter', 'max_lag_blocks', fallback=2)
+READ_TIMEOUT_SECONDS = config.getfloat('rpcrouter', 'read_timeout_seconds', fallback=10)
+WALLET_TIMEOUT_SECONDS = config.getfloat('rpcrouter', 'wallet_timeout_seconds', fallback=30)
+HEDGE_AFTER_SECONDS = config.getfloat('rpcrouter', 'hedge_after_ms', fallback=300) / 1000
+
+# Calls any synced node answers the same way
+READ_METHODS = frozenset((
+    'getblockcount', 'getblockhash', 'getblock', 'getbestblockhash', 'getblockheader',
+    'listunspent', 'estimatesmartfee',
+))
+# Node error while it is starting up or reindexing
+RPC_IN_WARMUP = -28
+# Not found answers (unknown block hash, height above the tip) that a node up to
+# max_lag_blocks behind gives for the newest blocks; another node may have them
+RPC_INVALID_ADDRESS_OR_KEY = -5
+RPC_INVALID_PARAMETER = -8
+RETRY_ELSEWHERE_CODES = frozenset((RPC_IN_WARMUP, RPC_INVALID_ADDRESS_OR_KEY, RPC_INVALID_PARAMETER))
+# Weight of the newest sample in the latency average
+LATENCY_SMOOTHING = 0.3
+
+class RPCUnavailable(Exception):
+    """No node answered in time."""
+
+class Endpoint:
+    __slots__ = ('url', 'name', 'latency', 'tip_height', 'healthy', 'last_error')
+
+    def __init__(self, url):
+        self.url = url
+        parsed = urlparse(url)
+        # Never log credentials
+        self.name = f"{parsed.hostname}:{parsed.port}"
+        self.latency = None
+        self.tip_height = None
+        self.healthy = True
+        self.last_error = None
+
+    def record_latency(self, seconds):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def __repr__(self):
+        latency = f"{self.latency * 1000:.0f} ms" if self.latency is not None else "?"
+        return f"Endpoint({self.name}, {'healthy' if self.healthy else 'unhealthy'}, tip {self.tip_height}, {latency})"
+
+class RPCRouter:
+    def __init__(self, primary_url, read_urls=(), read_timeout=READ_TIMEOUT_SECONDS,
+                 wallet_timeout=WALLET_TIMEOUT_SECONDS, hedge_after=HEDGE_AFTER_SECONDS,
+                 health_interval=HEALTH_INTERVAL_SECONDS, max_lag_blocks=MAX_LAG_BLOCKS):
+        self.primary = Endpoint(primary_url)
+        self.endpoints = [self.primary] + [Endpoint(url) for url in read_urls if url != primary_url]
+        self.read_timeout = read_timeout
+        self.wallet_timeout = wallet_timeout
+        self.hedge_after = hedge_after
+        self.health_interval = health_interval
+        self.max_lag_blocks = max_lag_blocks
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Threads stuck on a hung node are only freed by the call timeout, so leave plenty of room
+        self._executor = ThreadPoolExecutor(max_workers=8 * len(self.endpoints), thread_name_prefix="rpc-router")
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        def call(*params):
+            if method in READ_METHODS:
+                return self.read(method, *params)
+            return self.wallet(method, *params)
+        return call
+
+    def wallet(self, method, *params):
+        """Call the primary node. No retries: wallet calls are not all safe to repeat."""
+        self._ensure_health_checks()
+        return self._call(self.primary, self.wallet_timeout, method, params)
+
+    def read(self, method, *params):
+        """Call the fastest healthy node, hedging to the next ones when it is slow or failing."""
+        self._ensure_health_checks()
+        candidates = self.read_order()
+        deadline = time.monotonic() + self.read_timeout
+        pending = {}
+        last_error = None
+        # A not found answer, raised if no node has the data
+        not_found = None
+        launched = 0
+
+        def launch():
+            nonlocal launched
+            endpoint = candidates[launched]
+            launched += 1
+            future = self._executor.submit(self._call, endpoint, self.read_timeout, method, params)
+            pending[future] = (endpoint, time.perf_counter())
+
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = launched < len(candidates)
+            # Wait for an answer; past hedge_after, bring in the next node as well
+            done, _ = wait(pending, timeout=min(self.hedge_after, remaining) if can_hedge else remaining,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                try:
+                    result = future.result()
+                except JSONRPCException as e:
+                    code = e.error.get('code')
+                    if code not in RETRY_ELSEWHERE_CODES:
+                        # A real answer, e.g. a malformed request; another node would say the same
+                        raise
+                    if code != RPC_IN_WARMUP:
+                        not_found = e
+                    last_error = e
+                except Exception as e:
+                    last_error = e
+                else:
+                    # Nodes that lost the race were at least this slow; stop sending them first
+                    for endpoint, started in pending.values():
+                        endpoint.record_latency(time.perf_counter() - started)
+                    return result
+            # Slow or failed so far: try the next node
+            if launched < len(candidates):
+                launch()
+            elif not pending and not_found is not None:
+                # Every node was asked and none has it
+                raise not_found
+
+        raise RPCUnavailable(f"No node answered {method} within {self.read_timeout:.0f} s: {last_error}")
+
+    def read_order(self):
+        """Healthy nodes by latency (unmeasured first), then the unhealthy ones as a last resort."""
+        with self._lock:
+            def latency(endpoint):
+                return endpoint.latency if endpoint.latency is not None else 0.0
+            healthy = sorted((e for e in self.endpoints if e.healthy), key=latency)
+            unhealthy = sorted((e for e in self.endpoints if not e.healthy), key=latency)
+        return healthy + unhealthy
+
+    def check_health(self):
+        """Poll every node's tip height once and update the routing table."""
+        results = {}
+        futures = {self._executor.submit(self._call, e, self.read_timeout, 'getblockcount', ()): e for e in self.endpoints}
+        for future, endpoint in futures.items():
+            try:
+                results[endpoint] = future.result()
+            except Exception as e:
+                results[endpoint] = None
+                endpoint.last_error = str(e)
+
+        heights = [height for height in results.values() if height is not None]
+        best = max(heights) if heights else None
+        with self._lock:
+            for endpoint, height in results.items():
+                was_healthy = endpoint.healthy
+                if height is not None:
+                    endpoint.last_error = None
+                endpoint.tip_height = height
+                endpoint.healthy = height is not None and height >= best - self.max_lag_blocks
+                if endpoint.healthy != was_healthy:
+                    state = 'healthy again' if endpoint.healthy else f"unhealthy ({endpoint.last_error or f'tip {height}, best {best}'})"
+                    print(f"RPC node {endpoint.name} is {state}")
+
+    def start(self):
+        if self._health_thread is None and self.health_interval and len(self.endpoints) > 1:
+            self._health_thread = threading.Thread(target=self._run_health_checks, name="rpc-router-health", daemon=True)
+            self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._health_thread:
+            self._health_thread.join()
+            self._health_thread = None
+
+    def _ensure_health_checks(self):
+        if self._health_thread is None:
+            with self._lock:
+                self.start()
+
+    def _run_health_checks(self):
+        while not self._stop.is_set():
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"RPC health check failed: {e}")
+            self._stop.wait(self.health_interval)
+
+    def _proxy(self, endpoint, timeout):
+        # AuthServiceProxy keeps one HTTP connection and is not thread-safe: one per thread and node
+        proxies = self._local.__dict__.setdefault('proxies', {})
+        key = (endpoint.url, timeout)
+        if key not in proxies:
+            proxies[key] = AuthServiceProxy(endpoint.url, timeout=timeout)
+        return proxies[key]
+
+    def _call(self, endpoint, timeout, method, params):
+        start = time.perf_counter()
+        try:
+            result = getattr(self._proxy(endpoint, timeout), method)(*params)
+        except JSONRPCException as e:
+            # The node answered, so it is reachable
+            endpoint.record_latency(time.perf_counter() - start)
+            if e.error.get('code') == RPC_IN_WARMUP:
+                endpoint.healthy = False
+                endpoint.last_error = str(e)
+            raise
+        except Exception as e:
+            # Drop the connection, it may be half-read
+            self._local.proxies.pop((endpoint.url, timeout), None)
+            if endpoint.healthy:
+                print(f"RPC node {endpoint.name} is unhealthy ({e})")
+            endpoint.healthy = False
+            endpoint.last_error = str(e)
+            raise
+        endpoint.record_latency(time.perf_counter() - start)
+        if not endpoint.healthy and endpoint.last_error is not None:
+            # It failed before and answers now; a node that is only lagging waits for the health check
+            endpoint.healthy = True
+            endpoint.last_error = None
+            print(f"RPC node {endpoint.name} is healthy again")
+        return result
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+def get_router(primary_url, read_urls=None):
+    """Shared router for a primary node URL, with the configured read endpoints."""
+    with _routers_lock:
+        router = _routers.get(primary_url)
+        if router is None:
+            router = RPCRouter(primary_url, READ_ENDPOINTS if read_urls is None else read_urls)
+            _routers[primary_url] = router
+        return router
+
+if __name__ == "__main__":
+    import mock_rpc_server
+
+    # Three mock nodes: fast, slow and one that hangs on a third of its requests
+    fast = mock_rpc_server.start_mock_server(faults=mock_rpc_server.FaultInjector(latency_ms=5, jitter_ms=2, seed=1))
+    slow = mock_rpc_server.start_mock_server(faults=mock_rpc_server.FaultInjector(latency_ms=80, jitter_ms=20, seed=2))
+    flaky = mock_rpc_server.start_mock_server(faults=mock_rpc_server.FaultInjector(latency_ms=5, hang_rate=0.3, hang_seconds=5, seed=3))
+    router = RPCRouter(slow.url, [flaky.url, fast.url], read_timeout=2, hedge_after=0.05, health_interval=1)
+    router.check_health()
+
+    latencies = []
+    for _ in range(200):
+        start = time.perf_counter()
+        router.getblock(router.getblockhash(4999000))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"Reads: p50 {latencies[100] * 1000:.0f} ms, p99 {latencies[197] * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms")
+    print("Wallet calls go to the primary:", router.validateaddress('D')['isvalid'], f"({slow.request_count} requests on it)")
+    print(router.endpoints)
+    router.stop()
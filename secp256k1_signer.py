@@ -0,0 +1,89 @@
+"""
+secp256k1_signer.py
+
+secp256k1 signing backends for tx_signing.py and the address helpers.
+
+Uses the native libsecp256k1 binding (coincurve) when it is installed and falls back to the
+pure-Python ecdsa package otherwise. Both backends sign with RFC6979 nonces and return
+low-S DER signatures, so they produce byte-identical signatures for the same key and digest.
+"""
+
+from ecdsa import SigningKey, SECP256k1, util
+import hashlib
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+class EcdsaSigner:
+    """Pure-Python backend (ecdsa package)."""
+
+    name = 'ecdsa'
+
+    def __init__(self, privkey_bytes):
+        self.privkey_bytes = privkey_bytes
+        self.key = SigningKey.from_string(privkey_bytes, curve=SECP256k1)
+
+    def public_key(self, compressed=True):
+        vk = self.key.get_verifying_key()
+        return vk.to_string("compressed" if compressed else "uncompressed")
+
+    def sign_digest(self, digest):
+        return self.key.sign_digest_deterministic(digest, hashfunc=hashlib.sha256, sigencode=util.sigencode_der_canonize)
+
+class CoincurveSigner:
+    """Native libsecp256k1 backend (coincurve package)."""
+
+    name = 'coincurve'
+
+    def __init__(self, privkey_bytes):
+        self.privkey_bytes = privkey_bytes
+        self.key = coincurve.PrivateKey(privkey_bytes)
+
+    def public_key(self, compressed=True):
+        return self.key.public_key.format(compressed)
+
+    def sign_digest(self, digest):
+        # libsecp256k1 always produces low-S signatures
+        return self.key.sign(digest, hasher=None)
+
+# Available backends, fastest first
+BACKENDS = {}
+if coincurve is not None:
+    BACKENDS[CoincurveSigner.name] = CoincurveSigner
+BACKENDS[EcdsaSigner.name] = EcdsaSigner
+
+DEFAULT_BACKEND = next(iter(BACKENDS))
+
+def get_signer(privkey_bytes, backend=None):
+    """Return a signer for the private key using the given or the fastest available backend."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Signing backend not available: {backend}")
+    return BACKENDS[backend](privkey_bytes)
+
+# Signing benchmark for each available backend
+if __name__ == "__main__":
+    import os
+    import time
+
+    privkey_bytes = hashlib.sha256(b'secp256k1_signer benchmark').digest()
+    digests = [hashlib.sha256(os.urandom(32)).digest() for _ in range(2000)]
+
+    signatures = {}
+    for name in BACKENDS:
+        signer = get_signer(privkey_bytes, name)
+        count = 200 if name == EcdsaSigner.name else len(digests)
+        start = time.perf_counter()
+        signatures[name] = [signer.sign_digest(digest) for digest in digests[:count]]
+        elapsed = time.perf_counter() - start
+        print(f"{name:10s} {count / elapsed:10.0f} signatures/s")
+
+    # The backends must agree on every signature they both produced
+    if len(signatures) > 1:
+        common = min(len(sigs) for sigs in signatures.values())
+        reference = signatures[EcdsaSigner.name][:common]
+        for name, sigs in signatures.items():
+            assert sigs[:common] == reference, f"{name} signatures differ from ecdsa"
+        print("Backends produce identical signatures")
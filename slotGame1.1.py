@@ -2,7 +2,7 @@
 import os
 import sys
 import random
-import threading
+import time
 from decimal import Decimal, ROUND_HALF_UP
 
 # Third-party library imports
@@ -12,11 +12,18 @@ import pygame.mixer
 import pygame_gui
 
 # Local imports
-from five_reel_value_gen import spin_reels
-import win_calculator
-from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
-from buyIn import process_transaction
-from cashOut import send_doge
+from bitcoinrpc.authproxy import JSONRPCException
+from cashOut import transaction_known
+import autoplay
+import jackpot
+import journal
+import rpc_router
+import slot_engine
+import spin_log
+import spin_store
+import spin_worker
+import tx_tracker
+import utxo_consolidator
 
 # Initialize Pygame and the mixer
 pygame.init()
@@ -41,9 +48,6 @@ frame_rate = 60  # Frame rate for the game loop
 bounce_duration = 30  # Number of frames for the bouncing effect
 num_reels = 5  # Number of reels
 visible_icons = 5  # Number of visible icons per reel
-bet_amount = 3
-credits = 0  # Starting credits
-current_win = 0
 player_pool_address = "<pool_address>"
 
 #Constants for bounce animation
@@ -51,6 +55,15 @@ BOUNCE_DISTANCE = 25  # Pixels to move down during bounce
 BOUNCE_SPEED = 3      # Pixels per frame during bounce
 SPIN_SPEED = 6        # Spin speed
 
+# Reel animation per mode; turbo is the short one used to run auto-play quickly.
+# spin_speed should divide square_size so the icons land on the rows.
+ANIMATION_PROFILES = {
+    'normal': {'spin_speed': SPIN_SPEED, 'extra_spins': (0, 1, 2, 3, 4), 'bounce_distance': BOUNCE_DISTANCE, 'bounce_speed': BOUNCE_SPEED},
+    'turbo': {'spin_speed': 19, 'extra_spins': (0, 0, 0, 0, 0), 'bounce_distance': 8, 'bounce_speed': 4},
+}
+turbo_enabled = False
+animation = ANIMATION_PROFILES['normal']
+
 square_size = 95  # Size of each icon
 # Win thresholds for sound effects
 SMALL_WIN_THRESHOLD = 20  # Play small win sound for wins up to 10 credits
@@ -144,13 +157,120 @@ player_balance = None
 showing_rules = False
 rules_image = None
 
-# Add this near the top of the file with other global variables
-buy_in_total = 0
-win_differential = 0
-
 # Add these global variables
 player_pool_balance = Decimal('0')
 
+# Durable record of the session's money, replayed at start-up after a crash
+session_journal = journal.Journal()
+
+# Queryable history of sessions, spins and payments, written off the render thread
+spin_db = spin_store.SpinStore()
+spin_db_session = None
+# Compact binary copy of every spin for long-term audit
+spin_audit_log = spin_log.SpinLog()
+
+# Progressive jackpot shared with the other cabinets on this host; hits are settled to this journal
+jackpot_pool = jackpot.JackpotPool(claimant=os.path.abspath(session_journal.path)).open()
+
+# Bet, credits, buy-in total and the spin state live in the engine; this file draws them
+engine = slot_engine.SlotEngine(journal=session_journal, jackpot=jackpot_pool)
+
+def record_engine_event(event, data):
+    if event == 'spin_finished':
+        spin_db.record_spin(spin_db_session, data['spin'], data['bet'], data['win'], data['credits'])
+        spin_audit_log.append(data['spin'], data['bet'], data['win'], flush=auto_play is None)
+    elif event == 'buy_in':
+        spin_db.record_payment(spin_db_session, 'buy_in', data['amount'], txid=data['txid'], address=data['address'])
+    elif event == 'cash_out':
+        spin_db.record_payment(spin_db_session, 'cash_out', data['amount'], txid=data['txid'],
+                               address=data['address'], status=data['status'])
+
+engine.add_listener(record_engine_event)
+
+# Posted to the pygame queue by the spin worker when a spin's future completes
+SPIN_DONE_EVENT = pygame.USEREVENT + 1
+
+# Reels are fetched by one long-lived worker thread; spin_future is the spin on screen
+spin_requests = spin_worker.SpinWorker(
+    engine.spin_source,
+    on_done=lambda future: pygame.event.post(pygame.event.Event(SPIN_DONE_EVENT, future=future)))
+spin_future = None
+
+# Auto-play series in progress, and the next spin's reels fetched while this one animates
+auto_play = None
+next_future = None
+
+# Merges the pool's small buy-in UTXOs while nobody is playing, so cash-outs stay small
+consolidator = utxo_consolidator.UtxoConsolidator(
+    is_idle=lambda: engine.state == slot_engine.IDLE and auto_play is None)
+# Fetched ahead of time, so the suspense delay is already covered by the animation
+prefetch_spin_source = lambda: slot_engine.default_spin_source(delay=0)
+
+def deliver_spin(future):
+    """Hand a completed spin future to the engine; a failed one refunds the bet."""
+    try:
+        spin = future.result()
+    except Exception as e:
+        print(f"Spin failed: {e!r}")
+        spin = None
+    engine.deliver_result(spin)
+
+def begin_spin(prefetched=None):
+    """Take the bet and start the reels, with the spin future fetched in advance if there is one."""
+    global spin_future
+    if not engine.start_spin():
+        if prefetched is not None:
+            prefetched.cancel()
+        return False
+    reset_spin_variables()
+    future = prefetched
+    if future is None:
+        try:
+            future = spin_requests.submit()
+        except spin_worker.SpinQueueFull as e:
+            print(f"Spin not started: {e}")
+            engine.deliver_result(None)
+            return False
+    if future.done():
+        # Its SPIN_DONE_EVENT was posted before it was the spin on screen and will be ignored
+        spin_future = None
+        deliver_spin(future)
+    else:
+        spin_future = future
+    return True
+
+def start_auto_play():
+    global auto_play
+    auto_play = autoplay.AutoPlay(engine)
+    # Batch the journal and the audit log while spins come quickly
+    session_journal.commit_interval = autoplay.COMMIT_INTERVAL_SECONDS
+    print(f"Auto-play started: {auto_play.spins} spins")
+
+def stop_auto_play(reason="stopped by player"):
+    global auto_play, next_future
+    auto_play.stop(reason)
+    auto_play = None
+    if next_future is not None:
+        next_future.cancel()
+        next_future = None
+    session_journal.commit_interval = journal.COMMIT_INTERVAL_SECONDS
+    spin_audit_log.flush()
+
+def update_auto_play():
+    """Fetch the next spin while this one animates, and start it once the reels stop."""
+    global next_future
+    if next_future is None and engine.state == slot_engine.RESULT:
+        try:
+            next_future = spin_requests.submit(spin_source=prefetch_spin_source)
+        except spin_worker.SpinQueueFull:
+            pass
+    if not spinning and engine.state == slot_engine.IDLE:
+        if auto_play.should_spin():
+            prefetched, next_future = next_future, None
+            begin_spin(prefetched)
+        else:
+            stop_auto_play(auto_play.stop_reason)
+
 
 def load_random_icons(num_icons):
     icons = []
@@ -227,7 +347,7 @@ def initialize_rpc_connection():
     rpc_url = f"http://{rpc_user}:{rpc_password}@{rpc_host}:{rpc_port}"
     
     try:
-        return AuthServiceProxy(rpc_url)
+        return rpc_router.get_router(rpc_url)
     except Exception as e:
         raise Exception(f"Failed to establish RPC connection: {str(e)}")
 
@@ -329,7 +449,7 @@ def wallet_ui():
     print("Exiting wallet_ui()")
 
 def buyin_ui():
-    global credits, screen, player_pool_address, player_address, player_balance, buy_in_total
+    global screen, player_pool_address, player_address, player_balance
     if player_address is None or player_balance is None:
         print("No wallet selected. Please select a wallet first.")
         show_loading_screen("Load Wallet First")
@@ -398,16 +518,10 @@ def buyin_ui():
                             pygame.time.wait(3000)
                         else:
                             try:
-                                txid = process_transaction(player_address, amount)
+                                txid = engine.buy_in(player_address, amount)
                                 if txid:
-                                    credits += amount
                                     player_balance -= Decimal(amount)
-                                    buy_in_total += amount  # Add the amount to buy_in_total
-                                    print(f"Bought in {amount} credits! Transaction ID: {txid}")
-                                    print(f"Total bought in: {buy_in_total} credits")
                                     running = False
-                                else:
-                                    print("Transaction failed. No credits added.")
                             except Exception as e:
                                 print(f"An error occurred: {str(e)}")
                                 error_text = font.render(f"Error: {str(e)}", True, (255, 0, 0))
@@ -430,7 +544,7 @@ def buyin_ui():
         balance_text = font.render(f"Balance: {player_balance:.8f} DOGE", True, BLACK)
         screen.blit(balance_text, (BUYIN_UI_X + 50, BUYIN_UI_Y + 500))
         pygame.display.flip()
-    print(f"Current credits after buy-in: {credits}")
+    print(f"Current credits after buy-in: {engine.credits}")
 
 def show_loading_screen(text, duration=2000):
     overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
@@ -527,7 +641,6 @@ REEL_X_ADJUSTMENTS = [15, 16, 16, 24, 16]  # Adjust these values to move reels l
 
 # Global variables for spin animation
 spinning = False
-spin_result = None
 result_loaded = False
 spin_complete = [False] * num_reels  # num_reels is 5
 result_icon_added = [False] * num_reels
@@ -541,16 +654,12 @@ bounce_direction = [1] * num_reels  # 1 for down, -1 for up
 # Initialize chosen_icons as a list of lists
 chosen_icons = [[(random.choice(reel_icons_flat), 0) for _ in range(visible_icons)] for _ in range(num_reels)] if reel_icons_flat else []
 
-def threaded_spin_reels():
-    global spin_result
-    spin_result = spin_reels()
-    print("Spin result:", spin_result)
-
 def reset_spin_variables():
-    global spinning, spin_result, result_loaded, spin_complete, result_icon_added, random_icons_after_result, reel_stop_counters
-    global bouncing, bounce_offsets, bounce_direction
+    global spinning, result_loaded, spin_complete, result_icon_added, random_icons_after_result, reel_stop_counters
+    global bouncing, bounce_offsets, bounce_direction, animation
     spinning = True
-    spin_result = None
+    # The profile is fixed for the whole spin
+    animation = ANIMATION_PROFILES['turbo' if turbo_enabled else 'normal']
     result_loaded = False
     spin_complete = [False] * num_reels
     result_icon_added = [False] * num_reels
@@ -560,29 +669,33 @@ def reset_spin_variables():
     bounce_offsets = [0] * num_reels
     bounce_direction = [1] * num_reels  # 1 for down, -1 for up
 
-def update_spin_logic(chosen_icons, square_size, SPIN_SPEED):
+def update_spin_logic(chosen_icons, square_size):
     """
     Updates the positions of the icons during the spinning animation.
     Manages the spinning logic, adding result icons, bouncing effect, and stopping the spin when complete.
     """
-    global spinning, spin_result, result_loaded, spin_complete, result_icon_added, random_icons_after_result, reel_stop_counters
-    global bouncing, bounce_offsets, bounce_direction, credits, current_win
+    global spinning, result_loaded, spin_complete, result_icon_added, random_icons_after_result, reel_stop_counters
+    global bouncing, bounce_offsets, bounce_direction
 
+    if spinning and engine.state == slot_engine.IDLE:
+        # No reels came back; the engine refunded the bet
+        spinning = False
     if spinning:
+        spin_result = engine.result_icons()
         for reel_index, reel in enumerate(chosen_icons):
             if not spin_complete[reel_index]:
                 if not bouncing[reel_index]:
                     # Regular spinning logic
                     for i, (icon, offset) in enumerate(reel):
-                        # Move the icon down by SPIN_SPEED pixels
-                        chosen_icons[reel_index][i] = (icon, offset + SPIN_SPEED)
+                        # Move the icon down by the profile's spin speed
+                        chosen_icons[reel_index][i] = (icon, offset + animation['spin_speed'])
 
                     if chosen_icons[reel_index][0][1] >= square_size:
                         # Remove the icon that has moved off-screen
                         chosen_icons[reel_index].pop()
 
-                        # Define the number of extra spins for each reel
-                        extra_spins = [0, 1, 2, 3, 4]
+                        # Number of extra spins for each reel
+                        extra_spins = animation['extra_spins']
 
                         if spin_result and reel_stop_counters[reel_index] >= extra_spins[reel_index]:
                             if not result_icon_added[reel_index]:
@@ -608,7 +721,7 @@ def update_spin_logic(chosen_icons, square_size, SPIN_SPEED):
                                 if random_icons_after_result[reel_index] >= 2:
                                     # Start bouncing effect
                                     bouncing[reel_index] = True
-                                    if sound_enabled:
+                                    if sound_enabled and not turbo_enabled:
                                         soft_stop_sound.play()
                                     print(f"Reel {reel_index + 1} started bouncing!")
                         else:
@@ -624,12 +737,12 @@ def update_spin_logic(chosen_icons, square_size, SPIN_SPEED):
                 else:
                     # Bouncing logic
                     if bounce_direction[reel_index] == 1:  # Moving down
-                        bounce_offsets[reel_index] += BOUNCE_SPEED
-                        if bounce_offsets[reel_index] >= BOUNCE_DISTANCE:
-                            bounce_offsets[reel_index] = BOUNCE_DISTANCE
+                        bounce_offsets[reel_index] += animation['bounce_speed']
+                        if bounce_offsets[reel_index] >= animation['bounce_distance']:
+                            bounce_offsets[reel_index] = animation['bounce_distance']
                             bounce_direction[reel_index] = -1
                     elif bounce_direction[reel_index] == -1:  # Moving up
-                        bounce_offsets[reel_index] -= BOUNCE_SPEED
+                        bounce_offsets[reel_index] -= animation['bounce_speed']
                         if bounce_offsets[reel_index] <= 0:
                             bounce_offsets[reel_index] = 0
                             bouncing[reel_index] = False
@@ -641,9 +754,11 @@ def update_spin_logic(chosen_icons, square_size, SPIN_SPEED):
             spinning = False
             print("All reels have completed spinning!")
             # Calculate win after spin is complete
-            if spin_result:
-                win, win_type = win_calculator.calculate_win(spin_result, bet_amount, credits)
-                print(f"Debug: Win calculated - Amount: {win}, Type: {win_type}")
+            win = engine.finish_spin()
+            if win is not None and auto_play is not None:
+                auto_play.record(win)
+            if win is not None:
+                print(f"Debug: Win calculated - Amount: {win}")
                 if sound_enabled:
                     if 0 < win <= SMALL_WIN_THRESHOLD:
                         print("Debug: Playing small win sound")
@@ -654,10 +769,6 @@ def update_spin_logic(chosen_icons, square_size, SPIN_SPEED):
                     elif win > BIG_WIN_THRESHOLD:
                         print("Debug: Playing jackpot sound")
                         jackpot_sound.play()
-                current_win = win
-                credits += win  # Add the win to the credits
-                print(f"Spin Result: {spin_result}, Bet Amount: {bet_amount}, Win: {win}, Win Type: {win_type}, Credits: {credits}")
-                spin_result = None
 
 def draw_icons(screen, chosen_icons, start_x, start_y, square_size):
     """
@@ -691,9 +802,48 @@ def import_watch_only_address(rpc_connection, address):
     except JSONRPCException as e:
         print(f"Error importing watch-only address: {str(e)}")
 
+def restore_session():
+    """Replay the session journal and settle a cash-out that was interrupted by a crash."""
+    state = session_journal.open()
+
+    pending = state.pending_cash_out
+    if pending is not None:
+        # Not signed means never broadcast. A signed one may be in the mempool, so play waits
+        # until the node can say; settling it as failed would let the player cash out twice.
+        broadcast = False
+        while pending['txid']:
+            try:
+                broadcast = transaction_known(initialize_rpc_connection(), pending['txid'])
+                break
+            except Exception as e:
+                print(f"Could not check interrupted cashout {pending['txid']}: {str(e)}")
+                show_loading_screen("Checking interrupted cashout.\nWaiting for the node...", 5000)
+                pygame.event.pump()
+        if broadcast:
+            kind, fields = 'cash_out_done', {'amount': pending['amount'], 'txid': pending['txid']}
+            print(f"Interrupted cashout of {pending['amount']} DOGE was broadcast. TXID: {pending['txid']}")
+        else:
+            kind, fields = 'cash_out_failed', {}
+            print(f"Interrupted cashout of {pending['amount']} DOGE was not broadcast, credits kept.")
+        session_journal.append(kind, wait=True, **fields)
+        state.apply(dict(fields, type=kind))
+
+    # A crash between settling the jackpot and journalling the win leaves the hit unpaid
+    for entry in jackpot_pool.settlements(jackpot_pool.claimant, state.last_jackpot_hit):
+        fields = {'win': entry['payout'], 'jackpot_hit': entry['hit']}
+        session_journal.append('win', wait=True, **fields)
+        state.apply(dict(fields, type='win'))
+        print(f"Credited jackpot hit {entry['hit']} of {entry['payout']} credits lost in a crash")
+
+    engine.restore(state)
+    print(f"Restored session: {engine.credits} credits, {engine.buy_in_total} bought in")
+
+def print_transaction_status(tracked, old_status):
+    print(f"{tracked.label} transaction {tracked.txid}: {old_status} -> {tracked.status} ({tracked.confirmations} confirmations)")
+
 # Add this function near the top of your file, after the imports and global variables
 def initialize_game():
-    global player_pool_address
+    global player_pool_address, spin_db_session
     
     try:
         rpc_connection = initialize_rpc_connection()
@@ -702,6 +852,18 @@ def initialize_game():
     except Exception as e:
         print(f"Error initializing game: {str(e)}")
 
+    restore_session()
+
+    spin_db.start()
+    spin_requests.start()
+    consolidator.start()
+    spin_db_session = spin_db.start_session(player_pool_address)
+
+    # Follow buy-in and cash-out transactions in the background
+    tracker = tx_tracker.default_tracker()
+    tracker.add_listener(print_transaction_status)
+    tracker.start_in_thread()
+
 # Add this function to update the player pool balance
 def update_player_pool_balance():
     global player_pool_balance
@@ -727,7 +889,6 @@ def draw_player_pool_balance():
 # Main game loop
 clock = pygame.time.Clock()
 running = True
-spin_result = None
 
 # Display the loading screen with the warning message
 show_loading_screen("Play at your own risk.\nMalfunctions void all payouts.")
@@ -739,6 +900,23 @@ while running:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == SPIN_DONE_EVENT:
+            # Only the spin on screen counts; a cancelled or timed-out one was already refunded
+            if event.future is spin_future:
+                spin_future = None
+                deliver_spin(event.future)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_a:
+                if auto_play is not None:
+                    stop_auto_play()
+                elif not showing_rules:
+                    start_auto_play()
+            elif event.key == pygame.K_t:
+                turbo_enabled = not turbo_enabled
+                print(f"Turbo {'enabled' if turbo_enabled else 'disabled'}")
+        elif event.type == pygame.MOUSEBUTTONDOWN and auto_play is not None:
+            # Any click ends auto-play and does nothing else
+            stop_auto_play()
         elif event.type == pygame.MOUSEBUTTONDOWN:
             if showing_rules:
                 showing_rules = False
@@ -746,46 +924,27 @@ while running:
                 if rules_button.get_rect(topleft=(RULES_BUTTON_X, RULES_BUTTON_Y)).collidepoint(event.pos):
                     showing_rules = True
                 elif spin_button and spin_button.get_rect(topleft=(270, WINDOW_HEIGHT - 100)).collidepoint(event.pos):
-                    if credits >= bet_amount:
-                        credits -= bet_amount  # Subtract bet amount only once, when spinning starts
-                        reset_spin_variables()
-                        threading.Thread(target=threaded_spin_reels).start()
+                    begin_spin()
                 elif bet_button.get_rect(topleft=(BET_BUTTON_X, BET_BUTTON_Y)).collidepoint(event.pos):
-                    if bet_amount == 3:
-                        bet_amount = 6
-                    elif bet_amount == 6:
-                        bet_amount = 9
-                    else:
-                        bet_amount = 3
-                    print(f"Bet amount changed to: {bet_amount}")
+                    engine.cycle_bet()
                 elif cashout_button.get_rect(topleft=(CASHOUT_BUTTON_X, CASHOUT_BUTTON_Y)).collidepoint(event.pos):
                     print("Cashout button clicked!")
                     if player_address is None:
                         show_loading_screen("Load Wallet First")
-                    elif credits > 0:
-                        recipient_address = player_address
-                        amount_to_send = credits
-                        win_differential = amount_to_send - buy_in_total
-                        txid = send_doge(recipient_address, amount_to_send, win_differential)
-                        if txid:
-                            print(f"Cashout successful! TXID: {txid}")
-                            print(f"Amount cashed out: {amount_to_send} DOGE")
-                            print(f"Total bought in: {buy_in_total} DOGE")
-                            print(f"Win Differential: {win_differential} DOGE")
-                            credits = 0
-                            buy_in_total = 0  # Reset buy_in_total after cashout
-                            win_differential = 0  # Reset win_differential after cashout
-                        else:
-                            print("Cashout failed. Please try again.")
                     else:
-                        print("No credits to cash out.")
+                        engine.cash_out(player_address)
+                        # A signed cash-out that hit an error may be in the mempool: wait for the node
+                        while engine.pending_cash_out is not None:
+                            show_loading_screen("Checking cashout.\nWaiting for the node...", 5000)
+                            pygame.event.pump()
+                            engine.settle_pending_cash_out()
                 if sound_button and sound_button.get_rect(topleft=(SOUND_BUTTON_X, SOUND_BUTTON_Y)).collidepoint(event.pos):
                     sound_enabled = not sound_enabled
                     print(f"Sound {'enabled' if sound_enabled else 'disabled'}")
                 elif buy_in_button.get_rect(topleft=(BUY_IN_BUTTON_X, BUY_IN_BUTTON_Y)).collidepoint(event.pos):
                     buyin_ui()
-                    print(f"Current credits after buy-in: {credits}")
-                    print(f"Total bought in: {buy_in_total} credits")
+                    print(f"Current credits after buy-in: {engine.credits}")
+                    print(f"Total bought in: {engine.buy_in_total} credits")
                 if wallet_button and wallet_button.get_rect(topleft=(WALLET_BUTTON_X, WALLET_BUTTON_Y)).collidepoint(event.pos):
                     print("Wallet button clicked!")
                     show_loading_screen("Loading Wallets...")
@@ -796,13 +955,22 @@ while running:
                         print(f"Balance: {player_balance}")
                     else:
                         print("Wallet selection cancelled or failed.")
+    # Give up on a spin the worker has not answered in time
+    if spin_future is not None and not spin_future.done() and time.monotonic() > spin_future.deadline:
+        spin_future.cancel()
+        spin_future = None
+        print("Spin timed out")
+        engine.deliver_result(None)
+    if auto_play is not None:
+        update_auto_play()
+
     screen.fill(BLACK)
     if showing_rules:
         if rules_image:
             screen.blit(rules_image, (0, 0))
     else:
         # Update spinning logic
-        update_spin_logic(chosen_icons, square_size, SPIN_SPEED)
+        update_spin_logic(chosen_icons, square_size)
 
         # Calculate reel positions
         num_squares = visible_icons
@@ -814,6 +982,7 @@ while running:
         # Overlay for reels based on bet amount
         overlay = pygame.Surface((REEL_WIDTH, REEL_HEIGHT), pygame.SRCALPHA)
         overlay.fill((0, 0, 0, REEL_OVERLAY_ALPHA))
+        bet_amount = engine.bet_amount
         if bet_amount == 3:
             screen.blit(overlay, (reel_x[3], (WINDOW_HEIGHT - REEL_HEIGHT) // 2))
             screen.blit(overlay, (reel_x[4], (WINDOW_HEIGHT - REEL_HEIGHT) // 2))
@@ -821,11 +990,11 @@ while running:
             screen.blit(overlay, (reel_x[4], (WINDOW_HEIGHT - REEL_HEIGHT) // 2))
 
         # Draw credits display
-        draw_value_display(credits, WINDOW_WIDTH // 2 - 145, WINDOW_HEIGHT - 80, CREDITS_BG_WIDTH, CREDITS_BG_HEIGHT)
+        draw_value_display(engine.credits, WINDOW_WIDTH // 2 - 145, WINDOW_HEIGHT - 80, CREDITS_BG_WIDTH, CREDITS_BG_HEIGHT)
 
         # Draw win display
         win_display_x = BET_BUTTON_X + bet_button_size[0] + 10
-        draw_value_display(current_win, win_display_x, WINDOW_HEIGHT - 80, WIN_BG_WIDTH, WIN_BG_HEIGHT, text_color=(0, 255, 0))
+        draw_value_display(engine.last_win, win_display_x, WINDOW_HEIGHT - 80, WIN_BG_WIDTH, WIN_BG_HEIGHT, text_color=(0, 255, 0))
 
         # Draw bet amount neon numbers
         if neon_numbers[bet_amount]:
@@ -862,6 +1031,16 @@ while running:
         # Add this line to draw the player pool balance
         draw_player_pool_balance()
 
+        jackpot_text = font.render(f"JACKPOT {jackpot_pool.value():,.2f}", True, (255, 215, 0))
+        screen.blit(jackpot_text, ((WINDOW_WIDTH - jackpot_text.get_width()) // 2, 20))
+
+        if auto_play is not None:
+            auto_text = font.render(f"AUTO {auto_play.spins_played}/{auto_play.spins or '-'}", True, (255, 255, 0))
+            screen.blit(auto_text, (20, 20))
+        if turbo_enabled:
+            turbo_text = font.render("TURBO", True, (255, 128, 0))
+            screen.blit(turbo_text, (WINDOW_WIDTH - turbo_text.get_width() - 20, 20))
+
     pygame.display.flip()
     clock.tick(frame_rate)
 
@@ -869,5 +1048,14 @@ while running:
     if pygame.time.get_ticks() % 60000 < 100:  # Update roughly every minute
         update_player_pool_balance()
 
+if auto_play is not None:
+    stop_auto_play("game closed")
+spin_requests.stop()
+consolidator.stop()
+session_journal.close()
+spin_db.end_session(spin_db_session)
+spin_db.close()
+spin_audit_log.close()
+jackpot_pool.close()
 pygame.mixer.quit()
 pygame.quit()
\ No newline at end of file
@@ -0,0 +1,365 @@
+"""
+slot_engine.py
+
+The slot machine without a screen: bet level, credits, buy-in total, win differential and the
+spin state machine, shared by the pygame front end and anything else that plays the game.
+
+A spin goes IDLE -> SPINNING (bet taken, reels requested) -> RESULT (reels known, the front end
+animates them) -> IDLE (win paid). Where the reels and the win come from is plugged in:
+spin_source() returns a spin_reels_detailed() dict or None, and win_calculator has the
+signature of win_calculator.calculate_win. Buy-ins and cash-outs go through send_buy_in and
+send_cash_out in the same way; a cash-out holds the engine in CASHING_OUT between
+begin_cash_out and finish_cash_out, so the payment can also come from a queue. A cash-out whose
+signed transaction may have reached the node stays CASHING_OUT until check_broadcast can tell
+(settle_pending_cash_out). Money movements are written to the session journal, and every
+change is announced to listeners as callback(event, data). With a jackpot.JackpotPool every spin
+feeds the progressive jackpot, and a hit is journalled with its settlement number before the
+engine moves on.
+"""
+
+import threading
+
+from bitcoinrpc.authproxy import JSONRPCException
+
+IDLE = 'idle'
+SPINNING = 'spinning'
+RESULT = 'result'
+CASHING_OUT = 'cashing_out'
+
+BET_LEVELS = (3, 6, 9)
+
+# Imported on first use, so the engine loads without an RPC.conf or a node
+def default_spin_source(delay=None):
+    from five_reel_value_gen import spin_reels_detailed
+    return spin_reels_detailed(delay)
+
+def default_win_calculator(results, bet_amount, credits):
+    from win_calculator import calculate_win
+    return calculate_win(results, bet_amount, credits)
+
+def default_send_buy_in(from_address, amount):
+    from buyIn import process_transaction
+    return process_transaction(from_address, amount)
+
+def default_send_cash_out(to_address, amount, win_differential, on_signed=None):
+    from cashOut import send_doge
+    return send_doge(to_address, amount, win_differential, on_signed=on_signed)
+
+def default_check_broadcast(txid):
+    from cashOut import check_broadcast
+    return check_broadcast(txid)
+
+class SlotEngine:
+    def __init__(self, spin_source=default_spin_source, win_calculator=default_win_calculator,
+                 send_buy_in=default_send_buy_in, send_cash_out=default_send_cash_out,
+                 check_broadcast=default_check_broadcast, journal=None, bet_levels=BET_LEVELS, verbose=True, jackpot=None):
+        self.spin_source = spin_source
+        self.win_calculator = win_calculator
+        self.send_buy_in = send_buy_in
+        self.send_cash_out = send_cash_out
+        self.check_broadcast = check_broadcast
+        self.journal = journal
+        self.jackpot = jackpot
+        # Servers running many sessions turn the per-spin console output off
+        self.verbose = verbose
+        self.bet_levels = tuple(bet_levels)
+        self.bet_amount = self.bet_levels[0]
+        self.credits = 0
+        self.buy_in_total = 0
+        self.win_differential = 0
+        self.last_win = 0
+        self.state = IDLE
+        # Bet of the spin in progress, fixed when it starts
+        self.spin_bet = None
+        # spin_reels_detailed() dict of the spin in progress, once known
+        self.result = None
+        # Signed cash-out whose broadcast ended in an error: {'address', 'amount', 'txid', 'win_differential'}
+        self.pending_cash_out = None
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def add_listener(self, callback):
+        """
+        callback(event, data) is called after every change. Events: 'bet_changed', 'spin_started',
+        'spin_result', 'spin_failed', 'spin_finished', 'buy_in', 'cash_out', 'restored'.
+        A 'cash_out' has status 'broadcast', 'failed' or 'pending' (signed, not yet known to the node).
+        """
+        self._listeners.append(callback)
+
+    def _emit(self, event, **data):
+        for callback in self._listeners:
+            try:
+                callback(event, data)
+            except Exception as e:
+                print(f"Slot engine listener failed on {event}: {e}")
+
+    def _log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def _journal(self, kind, wait=False, **fields):
+        if self.journal is not None:
+            self.journal.append(kind, wait=wait, **fields)
+
+    def restore(self, state):
+        """
+        Take over the money of a journal.SessionState. A cash-out it left pending stays CASHING_OUT
+        for settle_pending_cash_out if it was signed, and is settled as failed if it never was.
+        """
+        pending = state.pending_cash_out
+        with self._lock:
+            self.credits = state.credits
+            self.buy_in_total = state.buy_in_total
+            self.win_differential = state.win_differential
+            if pending is not None and pending['txid']:
+                self.state = CASHING_OUT
+                self.pending_cash_out = {'address': None, 'amount': pending['amount'], 'txid': pending['txid'],
+                                         'win_differential': pending['win_differential']}
+            elif pending is not None:
+                self._journal('cash_out_failed', wait=True)
+        self._emit('restored', credits=self.credits, buy_in_total=self.buy_in_total)
+
+    def cycle_bet(self):
+        """Move to the next bet level (3 -> 6 -> 9 -> 3). Not while a spin is in progress."""
+        with self._lock:
+            if self.state != IDLE:
+                return self.bet_amount
+            index = self.bet_levels.index(self.bet_amount) if self.bet_amount in self.bet_levels else -1
+            self.bet_amount = self.bet_levels[(index + 1) % len(self.bet_levels)]
+        self._log(f"Bet amount changed to: {self.bet_amount}")
+        self._emit('bet_changed', bet=self.bet_amount)
+        return self.bet_amount
+
+    def set_bet(self, bet):
+        """Choose a bet level directly. Returns False for an unknown level or during a spin."""
+        with self._lock:
+            if self.state != IDLE or bet not in self.bet_levels:
+                return False
+            self.bet_amount = bet
+        self._emit('bet_changed', bet=bet)
+        return True
+
+    def can_spin(self):
+        return self.state == IDLE and self.credits >= self.bet_amount
+
+    def start_spin(self):
+        """Take the bet and enter SPINNING. Returns False if idle credits do not cover the bet."""
+        with self._lock:
+            if not self.can_spin():
+                return False
+            self.credits -= self.bet_amount
+            self.spin_bet = self.bet_amount
+            self.result = None
+            self.state = SPINNING
+            self._journal('spin', bet=self.spin_bet)
+        self._emit('spin_started', bet=self.spin_bet, credits=self.credits)
+        return True
+
+    def request_result(self):
+        """Fetch the reels from spin_source and deliver them. Blocks on the node; run it off the render thread."""
+        try:
+            spin = self.spin_source()
+        except Exception as e:
+            self._log(f"Spin failed: {e}")
+            spin = None
+        return self.deliver_result(spin)
+
+    def deliver_result(self, spin):
+        """SPINNING -> RESULT with the reels, or back to IDLE with the bet refunded if spin is None."""
+        with self._lock:
+            if self.state != SPINNING:
+                return None
+            if spin is None:
+                bet = self.spin_bet
+                self.credits += bet
+                self.spin_bet = None
+                self.state = IDLE
+                self._journal('spin_void', bet=bet)
+            else:
+                self.result = spin
+                self.state = RESULT
+        if spin is None:
+            self._log(f"No spin result, bet of {bet} refunded")
+            self._emit('spin_failed', bet=bet, credits=self.credits)
+        else:
+            self._log("Spin result:", spin['icons'])
+            self._emit('spin_result', spin=spin)
+        return spin
+
+    def result_icons(self):
+        result = self.result
+        return result['icons'] if result is not None else None
+
+    def finish_spin(self):
+        """
+        RESULT -> IDLE: resolve the win against the spin's bet and pay it. Returns the win.
+        A jackpot hit settles the shared pool, which blocks on disk; servers call this off their event loop then.
+        """
+        with self._lock:
+            if self.state != RESULT:
+                return None
+            spin, bet = self.result, self.spin_bet
+            win, _ = self.win_calculator(spin['icons'], bet, self.credits)
+            hit = self.jackpot.settle_spin(spin['icons'], bet) if self.jackpot is not None else None
+            if hit is not None:
+                win += hit['payout'] - hit['replaces']
+            self.credits += win
+            self.last_win = win
+            if hit is not None:
+                # The pool is already settled: the credit must reach the disk before anything else happens
+                self._journal('win', wait=True, win=win, jackpot_hit=hit['hit'])
+            elif win:
+                self._journal('win', win=win)
+            self.result = None
+            self.spin_bet = None
+            self.state = IDLE
+        self._log(f"Spin Result: {spin['icons']}, Bet Amount: {bet}, Win: {win}, Credits: {self.credits}")
+        self._emit('spin_finished', spin=spin, bet=bet, win=win, credits=self.credits, jackpot=hit)
+        return win
+
+    def spin(self):
+        """A whole spin without animation. Returns the win, or None if it could not be played."""
+        if not self.start_spin():
+            return None
+        if self.request_result() is None:
+            return None
+        return self.finish_spin()
+
+    def buy_in(self, from_address, amount):
+        """Send amount DOGE from the player to the pool and credit it. Returns the txid or None."""
+        if self.state != IDLE:
+            self._log("Cannot buy in during a spin.")
+            return None
+        txid = self.send_buy_in(from_address, amount)
+        if not txid:
+            self._log("Transaction failed. No credits added.")
+            return None
+        return self.credit_buy_in(from_address, amount, txid)
+
+    def credit_buy_in(self, from_address, amount, txid):
+        """Credit amount for a payment that has already reached the pool (txid). Returns the txid."""
+        with self._lock:
+            self._journal('buy_in', wait=True, amount=amount, txid=txid)
+            self.credits += amount
+            self.buy_in_total += amount
+        self._log(f"Bought in {amount} credits! Transaction ID: {txid}")
+        self._log(f"Total bought in: {self.buy_in_total} credits")
+        self._emit('buy_in', amount=amount, txid=txid, address=from_address, credits=self.credits)
+        return txid
+
+    def begin_cash_out(self):
+        """
+        IDLE -> CASHING_OUT: fix the amount (all credits) and the win differential and journal the
+        start. Returns (amount, win_differential), or None if there is nothing to pay.
+        """
+        with self._lock:
+            if self.state != IDLE:
+                self._log("Cannot cash out during a spin.")
+                return None
+            if self.credits <= 0:
+                self._log("No credits to cash out.")
+                return None
+            amount = self.credits
+            self.win_differential = amount - self.buy_in_total
+            self.state = CASHING_OUT
+            self._journal('cash_out_start', wait=True, amount=amount, win_differential=self.win_differential)
+            return amount, self.win_differential
+
+    def cash_out_signed(self, tx):
+        self._journal('cash_out_signed', wait=True, txid=tx.txid())
+
+    def finish_cash_out(self, to_address, amount, txid):
+        """CASHING_OUT -> IDLE: settle the cash-out begun for amount, paid by txid (None if it failed)."""
+        with self._lock:
+            if self.state != CASHING_OUT:
+                return None
+            self.state = IDLE
+            if not txid:
+                self._journal('cash_out_failed', wait=True)
+            else:
+                self._journal('cash_out_done', wait=True, amount=amount, txid=txid)
+                self._log(f"Cashout successful! TXID: {txid}")
+                self._log(f"Amount cashed out: {amount} DOGE")
+                self._log(f"Total bought in: {self.buy_in_total} DOGE")
+                self._log(f"Win Differential: {self.win_differential} DOGE")
+                self.credits -= amount
+                self.buy_in_total = 0
+                self.win_differential = 0
+        if not txid:
+            self._log("Cashout failed. Please try again.")
+            self._emit('cash_out', amount=amount, txid=None, address=to_address, status='failed')
+            return None
+        self._emit('cash_out', amount=amount, txid=txid, address=to_address, status='broadcast')
+        return txid
+
+    def cash_out(self, to_address):
+        """
+        Pay all credits out to to_address through send_cash_out. Returns the txid, or None if nothing
+        was sent or the outcome is not known yet (the engine is then still CASHING_OUT).
+        """
+        started = self.begin_cash_out()
+        if started is None:
+            return None
+        amount, win_differential = started
+        signed = []
+
+        def on_signed(tx):
+            self.cash_out_signed(tx)
+            signed.append(tx.txid())
+
+        try:
+            txid = self.send_cash_out(to_address, amount, win_differential, on_signed=on_signed)
+        except Exception as e:
+            self._log(f"Cashout error: {str(e)}")
+            if signed and not isinstance(e, JSONRPCException):
+                # The node may have the transaction; settling it as failed could pay the credits twice
+                self.hold_cash_out(to_address, amount, signed[-1])
+                return self.settle_pending_cash_out()
+            txid = None
+        return self.finish_cash_out(to_address, amount, txid)
+
+    def hold_cash_out(self, to_address, amount, txid):
+        """Keep the cash-out begun for amount CASHING_OUT until the node can say whether it has txid."""
+        with self._lock:
+            if self.state != CASHING_OUT:
+                return
+            self._journal('cash_out_signed', wait=True, txid=txid)
+            self.pending_cash_out = {'address': to_address, 'amount': amount, 'txid': txid,
+                                     'win_differential': self.win_differential}
+        self._emit('cash_out', amount=amount, txid=txid, address=to_address, status='pending')
+
+    def settle_pending_cash_out(self):
+        """
+        Ask the node about the pending cash-out and finish it. Returns its txid if it was broadcast,
+        None if it was not or if the node cannot answer yet (call again later).
+        """
+        pending = self.pending_cash_out
+        if pending is None:
+            return None
+        try:
+            broadcast = self.check_broadcast(pending['txid'])
+        except Exception as e:
+            self._log(f"Could not check cashout {pending['txid']}: {str(e)}")
+            return None
+        with self._lock:
+            self.pending_cash_out = None
+        return self.finish_cash_out(pending['address'], pending['amount'], pending['txid'] if broadcast else None)
+
+if __name__ == "__main__":
+    import random
+
+    # Offline round: random reels, the real win rules, fake payments
+    def random_spin():
+        icons = [f"reel_icon_{random.randint(1, 9)}.png" for _ in range(5)]
+        return {'icons': icons, 'block_height': 0, 'offsets': [0] * 5, 'reel_bytes': [0] * 5}
+
+    engine = SlotEngine(spin_source=random_spin, send_buy_in=lambda address, amount: 'buy-in-txid',
+                        send_cash_out=lambda address, amount, win_differential, on_signed=None: 'cash-out-txid')
+    events = []
+    engine.add_listener(lambda event, data: events.append(event))
+    engine.buy_in('D-player', 100)
+    engine.cycle_bet()
+    while engine.credits >= engine.bet_amount and len(events) < 200:
+        engine.spin()
+    engine.cash_out('D-player')
+    print(f"{len(events)} events, last: {events[-1]}, credits left {engine.credits}")
@@ -0,0 +1,143 @@
+"""
+spin_analytics.py
+
+Operator report over the binary spin log (spin_log.py).
+
+Segments are memory-mapped and folded into running totals a chunk at a time, so memory use
+depends on the chunk size and the number of hours covered, never on the number of spins.
+Observed RTP, hit frequency and symbol frequencies are printed next to the exact values
+reel_math derives from the reel tables and win_calculator.payOutTable.
+
+    python spin_analytics.py [--day YYYYMMDD] [--directory spin_log] [--top 10] [--hours 48]
+"""
+
+from datetime import datetime
+import argparse
+import time
+
+import numpy as np
+
+import reel_math
+import spin_log
+
+CHUNK_SIZE = 1 << 20  # records per chunk, 27 MiB
+
+class SpinAggregates:
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.spins = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        # Indexed by bet (0-255)
+        self.spins_per_bet = np.zeros(256, dtype=np.int64)
+        self.hits_per_bet = np.zeros(256, dtype=np.int64)
+        self.wins_per_bet = np.zeros(256, dtype=np.int64)
+        # Indexed by reel, then icon number (0 unused)
+        self.symbol_counts = np.zeros((reel_math.NUM_REELS, reel_math.NUM_ICONS + 1), dtype=np.int64)
+        # hour (ms // 3600000) -> [bet, win]
+        self.hourly = {}
+        self.top_wins = np.empty(0, dtype=spin_log.SPIN_RECORD)
+
+    def add(self, chunk):
+        if len(chunk) == 0:
+            return
+        self.spins += len(chunk)
+        timestamps = chunk['timestamp']
+        first, last = int(timestamps.min()), int(timestamps.max())
+        self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+        self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+
+        bets = chunk['bet']
+        wins = chunk['win'].astype(np.int64)
+        self.spins_per_bet += np.bincount(bets, minlength=256)
+        self.hits_per_bet += np.bincount(bets, weights=wins > 0, minlength=256).astype(np.int64)
+        self.wins_per_bet += np.bincount(bets, weights=wins, minlength=256).astype(np.int64)
+
+        icons = chunk['icons']
+        for reel in range(reel_math.NUM_REELS):
+            self.symbol_counts[reel] += np.bincount(icons[:, reel], minlength=reel_math.NUM_ICONS + 1)[:reel_math.NUM_ICONS + 1]
+
+        hours, inverse = np.unique(timestamps // 3600000, return_inverse=True)
+        hour_bets = np.bincount(inverse, weights=bets, minlength=len(hours))
+        hour_wins = np.bincount(inverse, weights=wins, minlength=len(hours))
+        for hour, bet, win in zip(hours.tolist(), hour_bets.tolist(), hour_wins.tolist()):
+            totals = self.hourly.setdefault(hour, [0, 0])
+            totals[0] += int(bet)
+            totals[1] += int(win)
+
+        # Keep the running top N: the chunk's own top N merged with the current ones
+        if len(chunk) > self.top_n:
+            candidates = chunk[np.argpartition(wins, -self.top_n)[-self.top_n:]]
+        else:
+            candidates = np.array(chunk)
+        merged = np.concatenate([self.top_wins, candidates])
+        self.top_wins = merged[np.argsort(merged['win'], kind='stable')[::-1][:self.top_n]]
+
+def aggregate(paths, top_n=10, chunk_size=CHUNK_SIZE):
+    aggregates = SpinAggregates(top_n)
+    for path in paths:
+        records = spin_log.read_segment(path)
+        for offset in range(0, len(records), chunk_size):
+            aggregates.add(records[offset:offset + chunk_size])
+    return aggregates
+
+def format_time(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+def print_report(aggregates, counts=None, hours=48):
+    if aggregates.spins == 0:
+        print("No spins recorded.")
+        return
+    if counts is None:
+        counts = reel_math.load_reel_counts()
+    theory = reel_math.theoretical_stats(counts)
+
+    print(f"{aggregates.spins} spins from {format_time(aggregates.first_timestamp)} to {format_time(aggregates.last_timestamp)}")
+
+    print("\nPer bet level          spins     RTP  expected   hit freq  expected")
+    for bet in np.nonzero(aggregates.spins_per_bet)[0]:
+        spins = aggregates.spins_per_bet[bet]
+        rtp = aggregates.wins_per_bet[bet] / (spins * bet) if bet else 0
+        hit_frequency = aggregates.hits_per_bet[bet] / spins
+        expected = theory.get(int(bet))
+        expected_rtp = f"{expected['rtp']:9.4f}" if expected else "        -"
+        expected_hits = f"{expected['hit_frequency']:9.4f}" if expected else "        -"
+        print(f"  bet {bet:<3} {spins:>18} {rtp:7.4f} {expected_rtp}  {hit_frequency:9.4f} {expected_hits}")
+
+    hour_keys = sorted(aggregates.hourly)
+    if hours:
+        hour_keys = hour_keys[-hours:]
+    print(f"\nRTP per hour (last {len(hour_keys)} of {len(aggregates.hourly)})")
+    for hour in hour_keys:
+        bet, win = aggregates.hourly[hour]
+        print(f"  {format_time(hour * 3600000)[:13]}:00  {win / bet if bet else 0:7.4f}  ({bet} bet)")
+
+    print(f"\nLargest {len(aggregates.top_wins)} wins")
+    for record in aggregates.top_wins:
+        icons = ' '.join(str(icon) for icon in record['icons'])
+        print(f"  {format_time(int(record['timestamp']))}  block {record['height']}  [{icons}]  bet {record['bet']}  win {record['win']}")
+
+    # z-score of each observed count against the binomial expectation from the reel weights
+    print("\nSymbol frequency per reel (observed / expected, z)")
+    probabilities = reel_math.reel_probabilities(counts)
+    for reel in range(reel_math.NUM_REELS):
+        observed = aggregates.symbol_counts[reel, 1:]
+        total = observed.sum()
+        expected = probabilities[reel] * total
+        z = (observed - expected) / np.sqrt(np.maximum(expected * (1 - probabilities[reel]), 1e-12))
+        cells = '  '.join(f"{i + 1}:{observed[i] / total:.3f}/{probabilities[reel, i]:.3f}({z[i]:+.1f})" for i in range(reel_math.NUM_ICONS))
+        print(f"  reel {reel + 1}  {cells}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spin log analytics")
+    parser.add_argument('--directory', default=spin_log.SPIN_LOG_DIR)
+    parser.add_argument('--day', help="only this local day, YYYYMMDD")
+    parser.add_argument('--top', type=int, default=10, help="number of largest wins to list")
+    parser.add_argument('--hours', type=int, default=48, help="hours of RTP to list, 0 for all")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    aggregates = aggregate(spin_log.list_segments(args.directory, args.day), args.top)
+    elapsed = time.perf_counter() - start
+    print_report(aggregates, hours=args.hours)
+    print(f"\nAggregated in {elapsed:.2f} s")
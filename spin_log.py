@@ -0,0 +1,185 @@
+"""
+spin_log.py
+
+Compact binary log of every spin for long-term audit and analytics.
+
+Each spin is one fixed-width 27-byte record appended to a segment file. A new segment starts
+each day and whenever the current one reaches max_segment_bytes, so old history can be copied
+off or deleted a file at a time. The reader maps segments straight into NumPy structured
+arrays, so a day of spins is available without parsing anything.
+"""
+
+from datetime import datetime
+import configparser
+import os
+import struct
+import time
+
+from five_reel_value_gen import icon_index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Load spin log settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+SPIN_LOG_DIR = config.get('spinlog', 'directory', fallback='spin_log')
+MAX_SEGMENT_BYTES = config.getint('spinlog', 'max_segment_mb', fallback=64) * 1024 * 1024
+
+# height, reel bytes, icon indices, bet, win, timestamp (ms)
+RECORD_FORMAT = struct.Struct('<I5s5sBIQ')
+RECORD_SIZE = RECORD_FORMAT.size
+
+if np is not None:
+    # Same layout as RECORD_FORMAT, no padding
+    SPIN_RECORD = np.dtype([
+        ('height', '<u4'),
+        ('reel_bytes', 'u1', (5,)),
+        ('icons', 'u1', (5,)),
+        ('bet', 'u1'),
+        ('win', '<u4'),
+        ('timestamp', '<u8'),
+    ])
+    assert SPIN_RECORD.itemsize == RECORD_SIZE
+
+def encode_spin(spin, bet, win, timestamp=None):
+    """Pack a spin from five_reel_value_gen.spin_reels_detailed() into one record."""
+    if timestamp is None:
+        timestamp = time.time()
+    return RECORD_FORMAT.pack(
+        spin.get('block_height') or 0,
+        bytes(spin.get('reel_bytes') or bytes(5)),
+        bytes(icon_index(icon) for icon in spin['icons']),
+        bet,
+        win,
+        int(timestamp * 1000),
+    )
+
+def segment_name(timestamp, number):
+    return f"spins-{datetime.fromtimestamp(timestamp):%Y%m%d}-{number:03d}.bin"
+
+def list_segments(directory=SPIN_LOG_DIR, day=None):
+    """Segment paths in write order, optionally only those of one local day ('YYYYMMDD' or date)."""
+    if not os.path.isdir(directory):
+        return []
+    if day is not None and not isinstance(day, str):
+        day = f"{day:%Y%m%d}"
+    names = sorted(name for name in os.listdir(directory) if name.startswith('spins-') and name.endswith('.bin'))
+    if day is not None:
+        names = [name for name in names if name[len('spins-'):len('spins-') + 8] == day]
+    return [os.path.join(directory, name) for name in names]
+
+class SpinLog:
+    """Appends spin records to the current segment, rotating by day and size."""
+
+    def __init__(self, directory=SPIN_LOG_DIR, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes - max_segment_bytes % RECORD_SIZE
+        self._file = None
+        self._day = None
+        self._number = 0
+        self._size = 0
+
+    def append(self, spin, bet, win, timestamp=None, flush=True):
+        """With flush=False the record waits in the file buffer for a later flush()."""
+        if timestamp is None:
+            timestamp = time.time()
+        record = encode_spin(spin, bet, win, timestamp)
+        day = datetime.fromtimestamp(timestamp).date()
+        if self._file is None or day != self._day or self._size >= self.max_segment_bytes:
+            self._rotate(day, timestamp)
+        self._file.write(record)
+        # No fsync: losing the last few records in a power cut is cheaper than wearing out the SD card
+        if flush:
+            self._file.flush()
+        self._size += RECORD_SIZE
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self, day, timestamp):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        if day != self._day:
+            # Carry on from the day's last segment after a restart
+            existing = list_segments(self.directory, day)
+            self._number = int(existing[-1][-7:-4]) if existing else 0
+            self._day = day
+        path = os.path.join(self.directory, segment_name(timestamp, self._number))
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size >= self.max_segment_bytes:
+            self._number += 1
+            path = os.path.join(self.directory, segment_name(timestamp, self._number))
+            size = 0
+        self._file = open(path, 'ab')
+        # Drop a record torn by a crash so the segment stays aligned
+        if size % RECORD_SIZE:
+            size -= size % RECORD_SIZE
+            self._file.truncate(size)
+        self._size = size
+
+def read_segment(path):
+    """Memory-map a segment as a read-only SPIN_RECORD array, ignoring a torn last record."""
+    if np is None:
+        raise RuntimeError("Reading the spin log requires numpy")
+    count = os.path.getsize(path) // RECORD_SIZE
+    if count == 0:
+        return np.empty(0, dtype=SPIN_RECORD)
+    return np.memmap(path, dtype=SPIN_RECORD, mode='r', shape=(count,))
+
+def read_segments(paths):
+    arrays = [read_segment(path) for path in paths]
+    if len(arrays) == 1:
+        return arrays[0]
+    if not arrays:
+        return np.empty(0, dtype=SPIN_RECORD)
+    return np.concatenate(arrays)
+
+def read_day(day, directory=SPIN_LOG_DIR):
+    """All spins of one local day ('YYYYMMDD' or date) as a SPIN_RECORD array."""
+    return read_segments(list_segments(directory, day))
+
+def read_all(directory=SPIN_LOG_DIR):
+    return read_segments(list_segments(directory))
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from datetime import timedelta
+
+    # Write a day of synthetic auto-play (one spin every 2 s) and time reading it back
+    directory = tempfile.mkdtemp()
+    log = SpinLog(directory, max_segment_bytes=1024 * 1024)
+    rng = random.Random(1)
+    day = datetime.now().date() - timedelta(days=1)
+    start_time = datetime(day.year, day.month, day.day).timestamp()
+    count = 43200
+
+    start = time.perf_counter()
+    for i in range(count):
+        spin = {
+            'icons': [f"reel_icon_{rng.randint(1, 9)}.png" for _ in range(5)],
+            'block_height': 5000000 + i // 30,
+            'reel_bytes': [rng.randrange(256) for _ in range(5)],
+        }
+        log.append(spin, rng.choice((3, 6, 9)), rng.choice((0, 0, 0, 3, 15)), start_time + i * 2)
+    log.close()
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {count} spins in {elapsed * 1000:.0f} ms ({elapsed / count * 1e6:.1f} us per spin), "
+          f"{count * RECORD_SIZE / 1024:.0f} KiB in {len(list_segments(directory))} segments")
+
+    start = time.perf_counter()
+    spins = read_day(day, directory)
+    rtp = spins['win'].sum() / spins['bet'].astype(np.uint64).sum()
+    sevens = (spins['icons'] == 7).all(axis=1).sum()
+    elapsed = time.perf_counter() - start
+    print(f"Read and summarized {len(spins)} spins in {elapsed * 1000:.2f} ms: RTP {rtp:.3f}, five sevens {sevens}")
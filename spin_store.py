@@ -0,0 +1,238 @@
+"""
+spin_store.py
+
+SQLite record of game sessions, spins and payments.
+
+The database runs in WAL mode so reports can read it while the game writes. Callers only
+queue rows; a writer thread owns the connection and inserts everything queued since its
+last pass with one executemany() per table inside a single transaction, so the render
+thread never waits on the disk and auto-play rates are absorbed in batches.
+"""
+
+from datetime import datetime, timedelta
+import configparser
+import contextlib
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+# Load spin store settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+SPIN_DB_PATH = config.get('spinstore', 'path', fallback='spins.db')
+# Most rows written per transaction
+MAX_BATCH_SIZE = config.getint('spinstore', 'max_batch_size', fallback=1000)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    pool_address TEXT
+);
+CREATE TABLE IF NOT EXISTS spins (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    timestamp REAL NOT NULL,
+    block_height INTEGER,
+    offsets TEXT,
+    reel_bytes TEXT,
+    icons TEXT NOT NULL,
+    bet INTEGER NOT NULL,
+    win INTEGER NOT NULL,
+    credits INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    timestamp REAL NOT NULL,
+    kind TEXT NOT NULL,
+    address TEXT,
+    amount INTEGER NOT NULL,
+    txid TEXT,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spins_by_session ON spins(session_id, timestamp);
+CREATE INDEX IF NOT EXISTS spins_by_time ON spins(timestamp);
+CREATE INDEX IF NOT EXISTS payments_by_session ON payments(session_id, timestamp);
+CREATE INDEX IF NOT EXISTS payments_by_time ON payments(timestamp);
+"""
+
+# One statement per row type; sqlite3 prepares each once and reuses it for every batch
+STATEMENTS = {
+    'session_start': "INSERT INTO sessions (id, started_at, pool_address) VALUES (?, ?, ?)",
+    'session_end': "UPDATE sessions SET ended_at = ? WHERE id = ?",
+    'spin': ("INSERT INTO spins (session_id, timestamp, block_height, offsets, reel_bytes, icons, bet, win, credits) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+    'payment': ("INSERT INTO payments (session_id, timestamp, kind, address, amount, txid, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)"),
+}
+# Write order inside a batch, so a session row always lands before its spins
+STATEMENT_ORDER = ('session_start', 'spin', 'payment', 'session_end')
+
+def connect(path=SPIN_DB_PATH):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only syncs at checkpoints; a crash can lose the last batch, never corrupt the file
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+def day_bounds(day):
+    """Unix time range [start, end) of a local calendar day given as a date or 'YYYY-MM-DD'."""
+    if isinstance(day, str):
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+    start = datetime(day.year, day.month, day.day)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+class SpinStore:
+    def __init__(self, path=SPIN_DB_PATH, max_batch_size=MAX_BATCH_SIZE):
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        # Create the schema here so errors surface in the caller, not the writer thread
+        connect(self.path).close()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="spin-store-writer", daemon=True)
+        self._thread.start()
+
+    def start_session(self, pool_address=None):
+        """Open a session and return its id."""
+        session_id = uuid.uuid4().hex
+        self._put('session_start', (session_id, time.time(), pool_address))
+        return session_id
+
+    def end_session(self, session_id):
+        self._put('session_end', (time.time(), session_id))
+
+    def record_spin(self, session_id, spin, bet, win, credits):
+        """
+        Queue a spin. spin is the dict from five_reel_value_gen.spin_reels_detailed();
+        credits is the balance after the win was added.
+        """
+        self._put('spin', (
+            session_id,
+            time.time(),
+            spin.get('block_height'),
+            ','.join(str(offset) for offset in spin.get('offsets', ())),
+            ''.join(f"{value:02x}" for value in spin.get('reel_bytes', ())),
+            ','.join(spin['icons']),
+            bet,
+            win,
+            credits,
+        ))
+
+    def record_payment(self, session_id, kind, amount, txid=None, address=None, status='broadcast'):
+        """Queue a buy-in or cash-out. amount is in whole DOGE, like the credits."""
+        self._put('payment', (session_id, time.time(), kind, address, amount, txid, status))
+
+    def flush(self):
+        """Block until every queued row is committed."""
+        self._queue.join()
+
+    def close(self):
+        if not self._running:
+            return
+        self.flush()
+        self._running = False
+        self._queue.put(None)
+        self._thread.join()
+
+    def spins_for_session(self, session_id):
+        with self._reader() as connection:
+            return connection.execute(
+                "SELECT timestamp, block_height, offsets, reel_bytes, icons, bet, win, credits "
+                "FROM spins WHERE session_id = ? ORDER BY timestamp", (session_id,)).fetchall()
+
+    def daily_summary(self, day):
+        """Return (spins, total_bet, total_win) for a local calendar day."""
+        start, end = day_bounds(day)
+        with self._reader() as connection:
+            return connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bet), 0), COALESCE(SUM(win), 0) "
+                "FROM spins WHERE timestamp >= ? AND timestamp < ?", (start, end)).fetchone()
+
+    def _reader(self):
+        # Readers get their own connection; WAL lets them run next to the writer
+        return contextlib.closing(sqlite3.connect(self.path))
+
+    def _put(self, kind, row):
+        if not self._running:
+            raise RuntimeError("Spin store is not started")
+        self._queue.put((kind, row))
+
+    def _run(self):
+        connection = connect(self.path)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._queue.task_done()
+                    return
+
+                # Take whatever else is already queued into the same transaction
+                batch = [item]
+                while len(batch) < self.max_batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        # Put the stop marker back so the loop ends after this batch
+                        self._queue.task_done()
+                        self._queue.put(None)
+                        break
+                    batch.append(item)
+
+                try:
+                    self._write(connection, batch)
+                except sqlite3.Error as e:
+                    print(f"Spin store write failed, {len(batch)} rows lost: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            connection.close()
+
+    def _write(self, connection, batch):
+        rows = {}
+        for kind, row in batch:
+            rows.setdefault(kind, []).append(row)
+        with connection:
+            for kind in STATEMENT_ORDER:
+                if kind in rows:
+                    connection.executemany(STATEMENTS[kind], rows[kind])
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    # Throughput check: queue spins as fast as the caller can and time until they are committed
+    path = os.path.join(tempfile.mkdtemp(), 'spins.db')
+    store = SpinStore(path)
+    store.start()
+    session_id = store.start_session('pool')
+    spin = {'icons': ['reel_icon_1.png'] * 5, 'block_height': 5000000, 'offsets': [0, 2, 4, 6, 8], 'reel_bytes': [1, 2, 3, 4, 5]}
+
+    count = 20000
+    start = time.perf_counter()
+    for i in range(count):
+        store.record_spin(session_id, spin, 3, i % 7, 1000 + i)
+    queued = time.perf_counter() - start
+    store.flush()
+    committed = time.perf_counter() - start
+    store.record_payment(session_id, 'buy_in', 100, txid='00' * 32, address='player')
+    store.end_session(session_id)
+    store.close()
+
+    print(f"Queued {count} spins in {queued * 1000:.1f} ms ({queued / count * 1e6:.1f} us per spin)")
+    print(f"Committed in {committed * 1000:.1f} ms ({count / committed:.0f} spins/s)")
+    print("Today:", store.daily_summary(datetime.now().date()))
+    print("Session spins:", len(store.spins_for_session(session_id)))
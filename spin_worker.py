@@ -0,0 +1,147 @@
+"""
+spin_worker.py
+
+One long-lived thread that fetches spins, handing each back as a future.
+
+submit() queues a request and returns a concurrent.futures.Future at once; the queue is bounded
+and a full queue raises SpinQueueFull instead of piling up work. The worker resolves the future
+with the spin_reels_detailed() dict, or with SpinTimeout if it could not be answered within
+its timeout, SpinFailed if the source had no result, or the source's exception. A request still
+waiting in the queue can be cancelled with future.cancel(). A spin that is already being fetched
+is bounded by the RPC router's call timeout. on_done(future) runs when a future completes,
+from the worker thread; the game uses it to post an event to the pygame queue.
+"""
+
+from concurrent.futures import Future
+import configparser
+import queue
+import threading
+import time
+
+# Load worker settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+MAX_PENDING = config.getint('spinworker', 'max_pending', fallback=4)
+SPIN_TIMEOUT_SECONDS = config.getfloat('spinworker', 'timeout_seconds', fallback=15)
+
+class SpinQueueFull(Exception):
+    """Too many spins are already waiting."""
+
+class SpinTimeout(Exception):
+    """The spin was not answered within its timeout."""
+
+class SpinFailed(Exception):
+    """The spin source returned no result."""
+
+class SpinWorker:
+    def __init__(self, spin_source, max_pending=MAX_PENDING, timeout=SPIN_TIMEOUT_SECONDS, on_done=None):
+        self.spin_source = spin_source
+        self.timeout = timeout
+        self.on_done = on_done
+        self._queue = queue.Queue(max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="spin-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Cancel the waiting requests and stop after the spin in progress."""
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait().cancel()
+            except queue.Empty:
+                break
+        if self._thread:
+            # Wake the worker if it is waiting for work
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, timeout=None, spin_source=None):
+        """
+        Queue a spin, from spin_source instead of the worker's own if given.
+        Returns its future; raises SpinQueueFull if max_pending are waiting.
+        """
+        future = Future()
+        future.spin_source = spin_source or self.spin_source
+        future.deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        if self.on_done is not None:
+            future.add_done_callback(self.on_done)
+        try:
+            self._queue.put_nowait(future)
+        except queue.Full:
+            raise SpinQueueFull(f"{self._queue.maxsize} spins already waiting") from None
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while not self._stop.is_set():
+            future = self._queue.get()
+            if future is None:
+                continue
+            # False if it was cancelled while queued
+            if not future.set_running_or_notify_cancel():
+                continue
+            if time.monotonic() > future.deadline:
+                future.set_exception(SpinTimeout("Spin timed out waiting in the queue"))
+                continue
+            try:
+                spin = future.spin_source()
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            if spin is None:
+                future.set_exception(SpinFailed("No spin result"))
+            elif time.monotonic() > future.deadline:
+                # Too late: the player has been told the spin failed
+                future.set_exception(SpinTimeout("Spin result arrived after the timeout"))
+            else:
+                future.set_result(spin)
+
+if __name__ == "__main__":
+    import random
+
+    # Dispatch overhead with an instant source
+    def instant_spin():
+        return {'icons': [f"reel_icon_{random.randint(1, 9)}.png" for _ in range(5)]}
+
+    worker = SpinWorker(instant_spin, max_pending=64)
+    worker.start()
+    count = 20000
+    start = time.perf_counter()
+    for _ in range(count):
+        worker.submit().result()
+    elapsed = time.perf_counter() - start
+    print(f"{count} spins through the worker: {elapsed / count * 1e6:.1f} us each")
+
+    # Timeouts, cancellation and a full queue with a slow source
+    slow = SpinWorker(lambda: time.sleep(0.2) or instant_spin(), max_pending=2, timeout=0.3)
+    slow.start()
+    first = slow.submit()
+    # Let the worker pick up the first one
+    time.sleep(0.05)
+    second, third = slow.submit(), slow.submit()
+    try:
+        slow.submit()
+    except SpinQueueFull as e:
+        print(f"Queue full: {e}")
+    third.cancel()
+    print(f"first: {first.result()['icons']}")
+    try:
+        second.result()
+    except SpinTimeout as e:
+        print(f"second: {e}")
+    print(f"third cancelled: {third.cancelled()}")
+    worker.stop()
+    slow.stop()
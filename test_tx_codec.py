@@ -0,0 +1,59 @@
+"""
+test_tx_codec.py
+
+Round-trip and size checks for tx_codec.py. Run with pytest; the benchmark stays in tx_codec's __main__.
+"""
+
+from io import BytesIO
+import random
+
+import pytest
+
+from tx_codec import (TxIn, TxOut, Transaction, create_script_pubkey, is_p2pkh_address,
+                      public_key_to_address, random_transaction, script_pubkey_to_address)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        tx = random_transaction(rng)
+        raw = tx.serialize()
+        decoded = Transaction.from_bytes(raw)
+        assert decoded == tx
+        assert decoded.serialize() == raw
+        assert Transaction.from_hex(tx.hex()) == tx
+
+@pytest.mark.parametrize('seed', range(5))
+def test_size_and_weight(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        tx = random_transaction(rng)
+        raw = tx.serialize()
+        assert tx.size() == len(raw)
+        assert tx.weight() == 4 * len(raw)
+        assert tx.vsize() == len(raw)
+
+def test_back_to_back_transactions_decode_from_one_stream():
+    rng = random.Random(0)
+    txs = [random_transaction(rng) for _ in range(50)]
+    stream = BytesIO(b''.join(tx.serialize() for tx in txs))
+    assert [Transaction.parse(stream) for _ in txs] == txs
+    assert stream.read() == b''
+
+def test_truncated_transaction_is_rejected():
+    raw = random_transaction(random.Random(1), max_inputs=3, max_outputs=3).serialize()
+    with pytest.raises(ValueError):
+        Transaction.from_bytes(raw[:-1])
+    with pytest.raises(ValueError):
+        Transaction.from_bytes(raw + b'\x00')
+
+def test_p2pkh_script_round_trip():
+    address = public_key_to_address(b'\x02' + bytes(32))
+    assert is_p2pkh_address(address)
+    assert script_pubkey_to_address(create_script_pubkey(address)) == address
+    assert TxOut.to_address(address, 1).address == address
+    assert script_pubkey_to_address(bytes(25)) is None
+
+def test_input_amount_is_not_serialized():
+    txin = TxIn('00' * 32, 1, bytes(107), amount=10**8, script_pubkey=bytes(25))
+    assert txin.size() == len(txin.serialize()) == 32 + 4 + 1 + 107 + 4
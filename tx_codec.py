@@ -0,0 +1,275 @@
+"""
+tx_codec.py
+
+Transaction types and the wire codec shared by buyIn.py, cashOut.py and tx_signing.py.
+
+Transactions are legacy (non-segwit) Dogecoin transactions. Inputs carry the amount and
+scriptPubKey of the UTXO they spend so they can be signed and fee-checked without another lookup.
+"""
+
+from decimal import Decimal
+from io import BytesIO
+import hashlib
+import struct
+import base58
+
+SEQUENCE_FINAL = 0xffffffff
+WITNESS_SCALE_FACTOR = 4
+
+# Base58 version byte of Dogecoin mainnet P2PKH addresses
+P2PKH_VERSION = 0x1E
+
+def varint(n):
+    if n < 0xfd:
+        return struct.pack('<B', n)
+    elif n <= 0xffff:
+        return b'\xfd' + struct.pack('<H', n)
+    elif n <= 0xffffffff:
+        return b'\xfe' + struct.pack('<I', n)
+    else:
+        return b'\xff' + struct.pack('<Q', n)
+
+def read_exact(stream, n):
+    data = stream.read(n)
+    if len(data) != n:
+        raise ValueError(f"Unexpected end of transaction data: wanted {n} bytes, got {len(data)}")
+    return data
+
+def read_varint(stream):
+    prefix = read_exact(stream, 1)[0]
+    if prefix < 0xfd:
+        return prefix
+    elif prefix == 0xfd:
+        return struct.unpack('<H', read_exact(stream, 2))[0]
+    elif prefix == 0xfe:
+        return struct.unpack('<I', read_exact(stream, 4))[0]
+    else:
+        return struct.unpack('<Q', read_exact(stream, 8))[0]
+
+def is_p2pkh_address(address, version=P2PKH_VERSION):
+    """True if address is a Base58Check P2PKH address with the given version byte."""
+    if not isinstance(address, str):
+        return False
+    try:
+        decoded = base58.b58decode_check(address)
+    except ValueError:
+        return False
+    return len(decoded) == 21 and decoded[0] == version
+
+def create_script_pubkey(address):
+    # Only P2PKH is built here; a P2SH hash in this script would pay an address nobody holds
+    if not is_p2pkh_address(address):
+        raise ValueError(f"Not a P2PKH address: {address!r}")
+    # Decode the address, the first byte is the version, the rest is the pubkey hash
+    pubkey_hash = base58.b58decode_check(address)[1:]
+    # Build the scriptPubKey
+    return (
+        b'\x76' +  # OP_DUP
+        b'\xa9' +  # OP_HASH160
+        bytes([len(pubkey_hash)]) +
+        pubkey_hash +
+        b'\x88' +  # OP_EQUALVERIFY
+        b'\xac'    # OP_CHECKSIG
+    )
+
+def script_pubkey_to_address(script_pubkey, version=P2PKH_VERSION):
+    """Return the P2PKH address paid by script_pubkey, or None for any other script."""
+    if len(script_pubkey) == 25 and script_pubkey[:3] == b'\x76\xa9\x14' and script_pubkey[23:] == b'\x88\xac':
+        return base58.b58encode_check(bytes([version]) + script_pubkey[3:23]).decode('utf-8')
+    return None
+
+def public_key_to_address(public_key_bytes, version=P2PKH_VERSION):
+    # RIPEMD-160 of the SHA256 of the public key, Base58Check encoded with the version byte
+    pubkey_hash = hashlib.new('ripemd160', hashlib.sha256(public_key_bytes).digest()).digest()
+    return base58.b58encode_check(bytes([version]) + pubkey_hash).decode('utf-8')
+
+class TxIn:
+    __slots__ = ('txid', 'vout', 'script_sig', 'sequence', 'amount', 'script_pubkey')
+
+    def __init__(self, txid, vout, script_sig=b'', sequence=SEQUENCE_FINAL, amount=None, script_pubkey=None):
+        self.txid = txid  # hex, big-endian as shown by the node
+        self.vout = vout
+        self.script_sig = script_sig
+        self.sequence = sequence
+        # Amount (satoshis) and scriptPubKey of the output being spent, not serialized
+        self.amount = amount
+        self.script_pubkey = script_pubkey
+
+    @classmethod
+    def from_utxo(cls, utxo):
+        """Build an input from a listunspent entry."""
+        return cls(
+            utxo['txid'],
+            utxo['vout'],
+            amount=int(Decimal(str(utxo['amount'])) * Decimal('1e8')),  # Convert DOGE to satoshis
+            script_pubkey=bytes.fromhex(utxo['scriptPubKey']),
+        )
+
+    @property
+    def outpoint(self):
+        return (self.txid, self.vout)
+
+    def serialize(self):
+        return (
+            bytes.fromhex(self.txid)[::-1] +
+            struct.pack('<I', self.vout) +
+            varint(len(self.script_sig)) + self.script_sig +
+            struct.pack('<I', self.sequence)
+        )
+
+    def size(self):
+        return 32 + 4 + len(varint(len(self.script_sig))) + len(self.script_sig) + 4
+
+    @classmethod
+    def parse(cls, stream):
+        txid = read_exact(stream, 32)[::-1].hex()
+        vout = struct.unpack('<I', read_exact(stream, 4))[0]
+        script_sig = read_exact(stream, read_varint(stream))
+        sequence = struct.unpack('<I', read_exact(stream, 4))[0]
+        return cls(txid, vout, script_sig, sequence)
+
+    def __eq__(self, other):
+        return isinstance(other, TxIn) and self.serialize() == other.serialize()
+
+    def __repr__(self):
+        return f"TxIn({self.txid}:{self.vout}, amount={self.amount})"
+
+class TxOut:
+    __slots__ = ('amount', 'script_pubkey')
+
+    def __init__(self, amount, script_pubkey):
+        self.amount = amount  # satoshis
+        self.script_pubkey = script_pubkey
+
+    @classmethod
+    def to_address(cls, address, amount):
+        return cls(amount, create_script_pubkey(address))
+
+    @property
+    def address(self):
+        return script_pubkey_to_address(self.script_pubkey)
+
+    def serialize(self):
+        return struct.pack('<Q', self.amount) + varint(len(self.script_pubkey)) + self.script_pubkey
+
+    def size(self):
+        return 8 + len(varint(len(self.script_pubkey))) + len(self.script_pubkey)
+
+    @classmethod
+    def parse(cls, stream):
+        amount = struct.unpack('<Q', read_exact(stream, 8))[0]
+        script_pubkey = read_exact(stream, read_varint(stream))
+        return cls(amount, script_pubkey)
+
+    def __eq__(self, other):
+        return isinstance(other, TxOut) and self.amount == other.amount and self.script_pubkey == other.script_pubkey
+
+    def __repr__(self):
+        return f"TxOut({self.address or self.script_pubkey.hex()}, amount={self.amount})"
+
+class Transaction:
+    __slots__ = ('version', 'inputs', 'outputs', 'locktime', 'fee')
+
+    def __init__(self, inputs=None, outputs=None, version=1, locktime=0, fee=None):
+        self.version = version
+        self.inputs = inputs if inputs is not None else []
+        self.outputs = outputs if outputs is not None else []
+        self.locktime = locktime
+        self.fee = fee  # satoshis, known when the inputs' amounts are known
+
+    def serialize(self):
+        parts = [struct.pack('<I', self.version), varint(len(self.inputs))]
+        parts.extend(txin.serialize() for txin in self.inputs)
+        parts.append(varint(len(self.outputs)))
+        parts.extend(txout.serialize() for txout in self.outputs)
+        parts.append(struct.pack('<I', self.locktime))
+        return b''.join(parts)
+
+    def hex(self):
+        return self.serialize().hex()
+
+    def txid(self):
+        return hashlib.sha256(hashlib.sha256(self.serialize()).digest()).digest()[::-1].hex()
+
+    def size(self):
+        """Serialized size in bytes, computed without serializing."""
+        return (
+            4 + 4 +
+            len(varint(len(self.inputs))) + sum(txin.size() for txin in self.inputs) +
+            len(varint(len(self.outputs))) + sum(txout.size() for txout in self.outputs)
+        )
+
+    def weight(self):
+        # Legacy transactions carry no witness data, so every byte counts four times
+        return self.size() * WITNESS_SCALE_FACTOR
+
+    def vsize(self):
+        return (self.weight() + WITNESS_SCALE_FACTOR - 1) // WITNESS_SCALE_FACTOR
+
+    @classmethod
+    def parse(cls, stream):
+        """Decode one transaction from a binary stream, leaving the stream after it."""
+        version = struct.unpack('<I', read_exact(stream, 4))[0]
+        inputs = [TxIn.parse(stream) for _ in range(read_varint(stream))]
+        outputs = [TxOut.parse(stream) for _ in range(read_varint(stream))]
+        locktime = struct.unpack('<I', read_exact(stream, 4))[0]
+        return cls(inputs, outputs, version, locktime)
+
+    @classmethod
+    def from_bytes(cls, data):
+        stream = BytesIO(data)
+        tx = cls.parse(stream)
+        if stream.read(1):
+            raise ValueError("Trailing data after transaction")
+        return tx
+
+    @classmethod
+    def from_hex(cls, raw_tx_hex):
+        return cls.from_bytes(bytes.fromhex(raw_tx_hex))
+
+    def __eq__(self, other):
+        return isinstance(other, Transaction) and self.serialize() == other.serialize()
+
+    def __repr__(self):
+        return f"Transaction({len(self.inputs)} inputs, {len(self.outputs)} outputs, {self.size()} bytes)"
+
+def random_transaction(rng, max_inputs=20, max_outputs=20):
+    """Random transaction for round-trip checks, with script lengths around the varint boundaries."""
+    script_lengths = [0, 1, 25, 107, 0xfc, 0xfd, 0x1000]
+
+    def random_script():
+        return bytes(rng.getrandbits(8) for _ in range(rng.choice(script_lengths)))
+
+    inputs = [
+        TxIn(rng.getrandbits(256).to_bytes(32, 'big').hex(), rng.getrandbits(32), random_script(), rng.getrandbits(32))
+        for _ in range(rng.randint(0, max_inputs))
+    ]
+    outputs = [TxOut(rng.getrandbits(64), random_script()) for _ in range(rng.randint(0, max_outputs))]
+    return Transaction(inputs, outputs, rng.getrandbits(32), rng.getrandbits(32))
+
+# Serialization benchmark; the round-trip checks are in test_tx_codec.py
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    rng = random.Random(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+
+    script_pubkey = bytes(25)
+    for num_inputs in (1, 10, 200, 1000):
+        tx = Transaction(
+            [TxIn(rng.getrandbits(256).to_bytes(32, 'big').hex(), 0, bytes(107)) for _ in range(num_inputs)],
+            [TxOut(100000000, script_pubkey) for _ in range(3)],
+        )
+        raw = tx.serialize()
+        rounds = max(1, 20000 // num_inputs)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            tx.serialize()
+        serialize_time = (time.perf_counter() - start) / rounds
+        start = time.perf_counter()
+        for _ in range(rounds):
+            Transaction.from_bytes(raw)
+        parse_time = (time.perf_counter() - start) / rounds
+        print(f"{num_inputs:5d} inputs, {len(raw):7d} bytes: "
+              f"serialize {serialize_time * 1e6:9.1f} us, parse {parse_time * 1e6:9.1f} us")
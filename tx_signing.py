@@ -0,0 +1,165 @@
+"""
+tx_signing.py
+
+Legacy SIGHASH_ALL signing for the P2PKH transactions built by buyIn.py and cashOut.py.
+
+The transaction is serialized once with empty scriptSigs. Each input's signature hash is
+then computed by splicing that input's script code into the shared buffer, so signing an
+n-input transaction no longer re-serializes the whole transaction n times.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import struct
+
+from secp256k1_signer import get_signer
+from tx_codec import varint
+
+SIGHASH_ALL = 1
+
+# Transactions with fewer inputs are always signed serially, a process pool does not pay off for them
+PARALLEL_SIGNING_THRESHOLD = 32
+
+# Process pools by worker count, kept alive between transactions
+_executors = {}
+
+class SighashPreimage:
+    """
+    Pre-encoded signing serialization of a transaction.
+
+    The version, outpoints, outputs and locktime are encoded once. The buffer holds every
+    input with an empty scriptSig, followed by the SIGHASH_ALL type.
+    """
+
+    def __init__(self, tx, sighash_type=SIGHASH_ALL):
+        buffer = bytearray()
+        buffer += struct.pack("<I", tx.version)
+        buffer += varint(len(tx.inputs))
+
+        # Offset of each input's (empty) scriptSig length byte
+        self.script_offsets = []
+        for txin in tx.inputs:
+            buffer += bytes.fromhex(txin.txid)[::-1]  # txid (little-endian)
+            buffer += struct.pack("<I", txin.vout)
+            self.script_offsets.append(len(buffer))
+            buffer += b'\x00'  # Empty scriptSig
+            buffer += struct.pack("<I", txin.sequence)
+
+        buffer += varint(len(tx.outputs))
+        for txout in tx.outputs:
+            buffer += txout.serialize()
+
+        buffer += struct.pack("<I", tx.locktime)
+        buffer += struct.pack("<I", sighash_type)
+
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+
+    def preimage(self, input_index, script_code):
+        """Return the full signing serialization for one input."""
+        offset = self.script_offsets[input_index]
+        preimage = bytearray(self.view[:offset])
+        preimage += varint(len(script_code)) + script_code
+        preimage += self.view[offset + 1:]
+        return preimage
+
+    def digest(self, input_index, script_code):
+        """Double SHA256 of the preimage, hashed straight from the shared buffer."""
+        offset = self.script_offsets[input_index]
+        sha = hashlib.sha256(self.view[:offset])
+        sha.update(varint(len(script_code)))
+        sha.update(script_code)
+        sha.update(self.view[offset + 1:])
+        return hashlib.sha256(sha.digest()).digest()
+
+def _sign_digests(privkey_bytes, backend, digests):
+    # Runs in a worker process, the signer is rebuilt there from the raw key
+    signer = get_signer(privkey_bytes, backend)
+    return [signer.sign_digest(digest) for digest in digests]
+
+def _get_executor(workers):
+    if workers not in _executors:
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _executors[workers]
+
+def sign_digests_parallel(privkey_bytes, backend, digests, workers=0):
+    """
+    Sign digests across a process pool, returning signatures in digest order.
+    RFC6979 nonces make the result identical to signing them one by one.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = -(-len(digests) // workers)
+    chunks = [digests[i:i + chunk_size] for i in range(0, len(digests), chunk_size)]
+
+    executor = _get_executor(workers)
+    results = executor.map(_sign_digests, [privkey_bytes] * len(chunks), [backend] * len(chunks), chunks)
+    return [signature for chunk in results for signature in chunk]
+
+def sign_transaction(tx, privkey_hex, backend=None, workers=None):
+    """
+    Sign every input with SIGHASH_ALL.
+
+    With workers set (0 means one per CPU) transactions of at least PARALLEL_SIGNING_THRESHOLD
+    inputs are signed in a process pool. Leave it unset when the calling script does work at
+    import time: pool workers may re-import the main module (slotGame1.1.py opens its window).
+    """
+    privkey_bytes = bytes.fromhex(privkey_hex)
+
+    # Get the signer for the private key
+    signer = get_signer(privkey_bytes, backend)
+    public_key_bytes = signer.public_key()  # Compressed public key
+
+    # For P2PKH, the script code is the scriptPubKey of the UTXO being spent
+    preimage = SighashPreimage(tx)
+    digests = [preimage.digest(index, txin.script_pubkey) for index, txin in enumerate(tx.inputs)]
+
+    # Sign the hashes
+    if workers is not None and workers != 1 and len(digests) >= PARALLEL_SIGNING_THRESHOLD:
+        signatures = sign_digests_parallel(privkey_bytes, signer.name, digests, workers)
+    else:
+        signatures = [signer.sign_digest(digest) for digest in digests]
+
+    for txin, signature in zip(tx.inputs, signatures):
+        signature += struct.pack("<B", SIGHASH_ALL)
+
+        # Build the scriptSig
+        txin.script_sig = (
+            varint(len(signature)) + signature +
+            varint(len(public_key_bytes)) + public_key_bytes
+        )
+
+    return tx
+
+# Serial vs. parallel signing benchmark
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from tx_codec import Transaction, TxIn, TxOut
+
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'ecdsa'
+    num_inputs = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    privkey_hex = hashlib.sha256(b'tx_signing benchmark').hexdigest()
+    script_pubkey = bytes.fromhex('76a914' + '00' * 20 + '88ac')
+
+    def build_transaction():
+        inputs = [
+            TxIn(hashlib.sha256(struct.pack('<I', i)).hexdigest(), 0, amount=100000000, script_pubkey=script_pubkey)
+            for i in range(num_inputs)
+        ]
+        return Transaction(inputs, [TxOut(num_inputs * 100000000 - 1000000, script_pubkey)])
+
+    start = time.perf_counter()
+    reference = sign_transaction(build_transaction(), privkey_hex, backend).serialize()
+    serial_time = time.perf_counter() - start
+    print(f"{backend}, {num_inputs} inputs, serial: {serial_time:.3f} s")
+
+    for workers in sorted({2, 4, os.cpu_count() or 1} - {1}):
+        # Warm the pool up so process start-up is not counted
+        sign_transaction(build_transaction(), privkey_hex, backend, workers)
+        start = time.perf_counter()
+        signed = sign_transaction(build_transaction(), privkey_hex, backend, workers).serialize()
+        elapsed = time.perf_counter() - start
+        assert signed == reference, "Parallel signing differs from serial signing"
+        print(f"{backend}, {num_inputs} inputs, {workers} workers: {elapsed:.3f} s ({serial_time / elapsed:.1f}x)")
@@ -0,0 +1,200 @@
+"""
+tx_tracker.py
+
+Follows broadcast transactions until they confirm or drop out.
+
+One asyncio task polls the node for all tracked transactions at once: a single getrawmempool,
+getblockcount and listsinceblock per round, however many transactions are in flight. Listeners
+are called whenever a transaction moves between pending, mempool, confirmed and dropped. Once a
+transaction is confirmed or dropped and the listeners have been told, it is forgotten, so a
+long-running tracker only holds the transactions still in flight.
+"""
+
+import asyncio
+import configparser
+import threading
+import time
+
+from five_reel_value_gen import initialize_rpc_connection
+
+# Load tracker settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+POLL_INTERVAL_SECONDS = config.getfloat('txtracker', 'poll_interval_seconds', fallback=15)
+REQUIRED_CONFIRMATIONS = config.getint('txtracker', 'required_confirmations', fallback=1)
+# A transaction missing from both mempool and chain for this long is reported as dropped
+DROP_AFTER_SECONDS = config.getfloat('txtracker', 'drop_after_minutes', fallback=30) * 60
+
+PENDING = 'pending'
+MEMPOOL = 'mempool'
+CONFIRMED = 'confirmed'
+DROPPED = 'dropped'
+
+class TrackedTransaction:
+    __slots__ = ('txid', 'label', 'status', 'confirmations', 'tracked_at', 'last_seen', 'start_height')
+
+    def __init__(self, txid, label, start_height=None):
+        self.txid = txid
+        self.label = label
+        self.status = PENDING
+        self.confirmations = 0
+        self.tracked_at = time.time()
+        self.last_seen = self.tracked_at
+        self.start_height = start_height
+
+    def __repr__(self):
+        return f"TrackedTransaction({self.txid}, {self.label}, {self.status}, {self.confirmations} confirmations)"
+
+class TxTracker:
+    def __init__(self, rpc_factory=initialize_rpc_connection, poll_interval=POLL_INTERVAL_SECONDS,
+                 required_confirmations=REQUIRED_CONFIRMATIONS, drop_after=DROP_AFTER_SECONDS):
+        self.rpc_factory = rpc_factory
+        self.poll_interval = poll_interval
+        self.required_confirmations = required_confirmations
+        self.drop_after = drop_after
+        self.transactions = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._tip_height = None
+        self._loop = None
+        self._wakeup = None
+        self._thread = None
+
+    def add_listener(self, callback):
+        """callback(tracked_transaction, old_status) is called on every status change."""
+        self._listeners.append(callback)
+
+    def track(self, txid, label=''):
+        """Start following a broadcast transaction. Safe to call from any thread."""
+        with self._lock:
+            if txid not in self.transactions:
+                self.transactions[txid] = TrackedTransaction(txid, label, self._tip_height)
+            tracked = self.transactions[txid]
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return tracked
+
+    def status(self, txid):
+        """Status of a transaction in flight, or None once it has settled or was never tracked."""
+        with self._lock:
+            tracked = self.transactions.get(txid)
+            return tracked.status if tracked else None
+
+    def running(self):
+        """True once run() or start_in_thread() has started polling."""
+        return self._thread is not None or self._loop is not None
+
+    def in_flight(self):
+        with self._lock:
+            return [tracked for tracked in self.transactions.values() if tracked.status in (PENDING, MEMPOOL)]
+
+    def _set_status(self, tracked, status):
+        if tracked.status == status:
+            return
+        old_status = tracked.status
+        tracked.status = status
+        for callback in self._listeners:
+            try:
+                callback(tracked, old_status)
+            except Exception as e:
+                print(f"Transaction tracker listener failed: {e}")
+
+    def _query_node(self, since_height):
+        # Runs in an executor thread, AuthServiceProxy is blocking
+        rpc_connection = self.rpc_factory()
+        height = rpc_connection.getblockcount()
+        mempool = set(rpc_connection.getrawmempool())
+        confirmations = {}
+        if since_height is not None:
+            since_hash = rpc_connection.getblockhash(max(0, since_height))
+            for entry in rpc_connection.listsinceblock(since_hash, 1, True)['transactions']:
+                confirmations[entry['txid']] = max(confirmations.get(entry['txid'], entry['confirmations']), entry['confirmations'])
+        return height, mempool, confirmations
+
+    async def poll_once(self):
+        with self._lock:
+            in_flight = [tracked for tracked in self.transactions.values() if tracked.status in (PENDING, MEMPOOL)]
+            start_heights = [tracked.start_height for tracked in in_flight if tracked.start_height is not None]
+        if not in_flight:
+            return
+
+        # Look back from the oldest height a transaction was tracked at (a few blocks for reorgs)
+        since_height = min(start_heights) - 6 if start_heights else self._tip_height
+        loop = asyncio.get_running_loop()
+        height, mempool, confirmations = await loop.run_in_executor(None, self._query_node, since_height)
+
+        now = time.time()
+        with self._lock:
+            self._tip_height = height
+            for tracked in in_flight:
+                if tracked.start_height is None:
+                    tracked.start_height = height
+                count = confirmations.get(tracked.txid, 0)
+                tracked.confirmations = max(count, 0)
+                if count < 0:
+                    # Conflicted: a double spend confirmed instead
+                    self._set_status(tracked, DROPPED)
+                elif count >= self.required_confirmations:
+                    self._set_status(tracked, CONFIRMED)
+                elif tracked.txid in mempool or count > 0:
+                    tracked.last_seen = now
+                    self._set_status(tracked, MEMPOOL)
+                elif now - tracked.last_seen >= self.drop_after:
+                    self._set_status(tracked, DROPPED)
+                if tracked.status in (CONFIRMED, DROPPED):
+                    del self.transactions[tracked.txid]
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Transaction tracker poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start_in_thread(self):
+        """Run the tracker on its own event loop in a daemon thread (for the pygame front end)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="tx-tracker", daemon=True)
+            self._thread.start()
+
+_default_tracker = None
+
+def default_tracker():
+    global _default_tracker
+    if _default_tracker is None:
+        _default_tracker = TxTracker()
+    return _default_tracker
+
+def record_broadcast(txid, label=''):
+    """
+    Hand a freshly broadcast transaction to the default tracker. Does nothing unless that tracker
+    is running: nothing would ever poll it, and it would be held forever.
+    """
+    tracker = _default_tracker
+    if txid and tracker is not None and tracker.running():
+        tracker.track(txid, label)
+
+# Follow the given txids until they settle
+if __name__ == "__main__":
+    import sys
+
+    tracker = default_tracker()
+    tracker.add_listener(lambda tracked, old_status: print(f"{tracked.txid}: {old_status} -> {tracked.status}"))
+    for txid in sys.argv[1:]:
+        tracker.track(txid)
+
+    async def main():
+        task = asyncio.create_task(tracker.run())
+        while tracker.in_flight():
+            await asyncio.sleep(1)
+        task.cancel()
+
+    asyncio.run(main())
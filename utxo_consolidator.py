@@ -0,0 +1,154 @@
+"""
+utxo_consolidator.py
+
+Background consolidation of the pool address's UTXOs.
+
+Every buy-in lands on the pool address as its own small output, so over time cash-outs have to
+sign ever larger input sets. The consolidator watches the pool's UTXOs and, while the cabinet is
+idle or fees are low, merges the small ones into a few larger outputs. It keeps each transaction
+under max_tx_size and never touches the UTXOs needed to cover pending payouts.
+
+By default idle is the only gate. fee_calculator.get_feerate never returns less than the
+configured feerate_per_kb, so a low_feerate_per_kb at or above that floor also lets it run
+while the cabinet is busy whenever the node's estimate is no higher; 0 turns this off.
+"""
+
+import configparser
+import threading
+import time
+
+import cashOut
+import fee_calculator
+import rpc_router
+from tx_codec import Transaction, TxOut
+from tx_signing import sign_transaction
+
+# Load consolidation settings from RPC.conf (all optional)
+config = configparser.ConfigParser()
+config.read('RPC.conf')
+
+MIN_UTXO_COUNT = config.getint('consolidation', 'min_utxo_count', fallback=50)
+CONSOLIDATE_BELOW = int(config.getfloat('consolidation', 'consolidate_below', fallback=100) * 1e8)  # satoshis
+OUTPUT_COUNT = config.getint('consolidation', 'output_count', fallback=2)
+MAX_TX_SIZE = config.getint('consolidation', 'max_tx_size', fallback=100000)  # bytes, Dogecoin's standard limit
+LOW_FEERATE = int(config.getfloat('consolidation', 'low_feerate_per_kb', fallback=0) * 1e8)  # satoshis per kB, 0 = idle only
+CHECK_INTERVAL_SECONDS = config.getfloat('consolidation', 'check_interval_minutes', fallback=10) * 60
+
+def max_inputs_for_size(num_outputs, max_tx_size=MAX_TX_SIZE):
+    """Largest input count whose transaction stays within max_tx_size."""
+    num_inputs = (max_tx_size - fee_calculator.estimate_tx_size(0, num_outputs)) // fee_calculator.P2PKH_INPUT_SIZE
+    while num_inputs > 0 and fee_calculator.estimate_tx_size(num_inputs, num_outputs) > max_tx_size:
+        num_inputs -= 1
+    return max(0, num_inputs)
+
+def plan_consolidation(utxos, reserve_satoshis, feerate_per_kb, min_utxo_count=MIN_UTXO_COUNT,
+                       consolidate_below=CONSOLIDATE_BELOW, output_count=OUTPUT_COUNT, max_tx_size=MAX_TX_SIZE):
+    """
+    Choose the UTXOs to merge. Returns (inputs, output_amounts, fee) or None if nothing is worth doing.
+
+    The largest UTXOs covering reserve_satoshis are held back for pending payouts. The smallest
+    of the rest, up to the size limit, are merged into output_count outputs of equal value.
+    """
+    if len(utxos) < min_utxo_count:
+        return None
+
+    # Hold back the largest UTXOs until the pending payouts are covered
+    by_value = sorted(utxos, key=lambda utxo: utxo.amount, reverse=True)
+    held = 0
+    while by_value and held < reserve_satoshis:
+        held += by_value.pop(0).amount
+
+    candidates = sorted((utxo for utxo in by_value if utxo.amount < consolidate_below), key=lambda utxo: utxo.amount)
+    inputs = candidates[:max_inputs_for_size(output_count, max_tx_size)]
+    if len(inputs) <= output_count:
+        return None
+
+    total_input = sum(utxo.amount for utxo in inputs)
+    fee = fee_calculator.calculate_fee(len(inputs), output_count, feerate_per_kb)
+    total_output = total_input - fee
+    if total_output < output_count * fee_calculator.DUST_THRESHOLD:
+        # Merging these would mostly pay miners
+        return None
+
+    output_amounts = [total_output // output_count] * output_count
+    output_amounts[0] += total_output - sum(output_amounts)
+    return inputs, output_amounts, fee
+
+class UtxoConsolidator:
+    def __init__(self, address=None, payout_queue=None, is_idle=None, interval=CHECK_INTERVAL_SECONDS,
+                 low_feerate=LOW_FEERATE, workers=None):
+        """
+        payout_queue, if given, is a payout_queue.PayoutQueue whose pending total is held back.
+        is_idle() tells whether the cabinet is idle. Without it the cabinet counts as idle whenever
+        the payout queue is empty.
+        """
+        self.address = address or cashOut.from_address
+        self.payout_queue = payout_queue
+        self.is_idle = is_idle
+        self.interval = interval
+        self.low_feerate = low_feerate
+        self.workers = workers
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _idle(self):
+        if self.is_idle is not None:
+            return self.is_idle()
+        return self.payout_queue is None or self.payout_queue.pending_count() == 0
+
+    def run_once(self):
+        """Consolidate if it is due. Returns the txid of the consolidation transaction, or None."""
+        rpc_connection = rpc_router.get_router(cashOut.rpc_url)
+        feerate_per_kb = fee_calculator.get_feerate(rpc_connection)
+        if not self._idle() and (not self.low_feerate or feerate_per_kb > self.low_feerate):
+            return None
+
+        reserve_satoshis = self.payout_queue.pending_total() if self.payout_queue else 0
+
+        with cashOut.utxo_lock:
+            utxos = cashOut.get_spendable_utxos(self.address)
+            plan = plan_consolidation(utxos, reserve_satoshis, feerate_per_kb)
+            if plan is None:
+                return None
+            inputs, output_amounts, fee = plan
+            cashOut.reserve_utxos(inputs)
+
+        tx = Transaction(inputs, [TxOut.to_address(self.address, amount) for amount in output_amounts], fee=fee)
+        print(f"Consolidating {len(inputs)} of {len(utxos)} UTXOs into {len(output_amounts)}, fee: {fee} satoshis")
+
+        try:
+            txid = cashOut.broadcast_transaction(sign_transaction(tx, cashOut.privkey_hex, workers=self.workers).hex(), 'consolidation')
+        except Exception:
+            cashOut.release_utxos(inputs)
+            raise
+
+        if not txid:
+            cashOut.release_utxos(inputs)
+        return txid
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="utxo-consolidator", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"UTXO consolidation failed: {e}")
+
+# Run one consolidation pass for the pool address
+if __name__ == "__main__":
+    consolidator = UtxoConsolidator(workers=0)
+    start = time.perf_counter()
+    txid = consolidator.run_once()
+    print(f"TXID: {txid}" if txid else "Nothing to consolidate.")
+    print(f"Took {time.perf_counter() - start:.2f} s")